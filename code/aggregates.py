@@ -0,0 +1,226 @@
+"""Maintain the summary tables the report pages read.
+
+    python code/aggregates.py [--season 2021] [match_id ...]
+
+With no arguments every summary row is rebuilt, and with just --season that
+season is. Given match ids as well, only the teams, players, referees and
+stadiums involved in those matches are recomputed, so refresh cost tracks
+the size of the change rather than the size of the goal log.
+"""
+import argparse
+import logging
+import time
+
+import db
+
+# Each statement recomputes the rows of one season (every season when
+# %(season)s is NULL) whose key is in %(keys)s (every key when it is NULL).
+def _in_scope(season_col, key_col):
+    return (f"(%(season)s::int IS NULL OR {season_col} = %(season)s::int) "
+            f"AND (%(keys)s::int[] IS NULL OR {key_col} = ANY(%(keys)s::int[]))")
+
+
+TEAM_MATCH = f"""
+    DELETE FROM Team_Match
+    WHERE {_in_scope("season", "match_id")};
+
+    INSERT INTO Team_Match
+    SELECT M.season, M.id, S.team_id, S.opponent_id, S.is_home, S.goals_for, S.goals_against,
+           CASE WHEN S.goals_for > S.goals_against THEN 'W'
+                WHEN S.goals_for = S.goals_against THEN 'D'
+                WHEN S.goals_for < S.goals_against THEN 'L' END,
+           M.stadium_id,
+           (SELECT MIN(OB.referee_id) FROM Officiated_by OB
+            WHERE OB.season = M.season AND OB.match_id = M.id),
+           M.match_date
+    FROM Matches_Held_at M
+    CROSS JOIN LATERAL (VALUES
+        (M.team1_id, M.team2_id, TRUE, M.h_score, M.a_score),
+        (M.team2_id, M.team1_id, FALSE, M.a_score, M.h_score)
+    ) S(team_id, opponent_id, is_home, goals_for, goals_against)
+    WHERE {_in_scope("M.season", "M.id")};
+"""
+
+TEAM_STATS = f"""
+    DELETE FROM team_season_stats
+    WHERE {_in_scope("season", "team_id")};
+
+    INSERT INTO team_season_stats
+    SELECT R.season, R.team_id,
+           R.matches, R.wins, R.draws, R.losses, R.home_wins, R.away_wins,
+           R.goals_for, R.goals_against, R.clean_sheets,
+           COALESCE(S.player_goals, 0), COALESCE(S.player_penalties, 0)
+    FROM (
+        SELECT TM.season, TM.team_id, COUNT(*) matches,
+               COUNT(*) FILTER (WHERE TM.result = 'W') wins,
+               COUNT(*) FILTER (WHERE TM.result = 'D') draws,
+               COUNT(*) FILTER (WHERE TM.result = 'L') losses,
+               COUNT(*) FILTER (WHERE TM.result = 'W' AND TM.is_home) home_wins,
+               COUNT(*) FILTER (WHERE TM.result = 'W' AND NOT TM.is_home) away_wins,
+               SUM(TM.goals_for) goals_for, SUM(TM.goals_against) goals_against,
+               COUNT(*) FILTER (WHERE TM.goals_against = 0) clean_sheets
+        FROM Team_Match TM
+        WHERE {_in_scope("TM.season", "TM.team_id")}
+        GROUP BY TM.season, TM.team_id
+    ) R
+    LEFT JOIN (
+        SELECT G.season, PT.team_id, COUNT(G.id) player_goals,
+               COUNT(G.id) FILTER (WHERE G.pen) player_penalties
+        FROM Goals_Scored G
+        INNER JOIN Player_Season_Team PT
+        ON PT.season = G.season AND PT.player_id = G.player_id
+        WHERE {_in_scope("G.season", "PT.team_id")}
+        GROUP BY G.season, PT.team_id
+    ) S ON S.season = R.season AND S.team_id = R.team_id;
+"""
+
+PLAYER_STATS = f"""
+    DELETE FROM player_season_stats
+    WHERE {_in_scope("season", "player_id")};
+
+    INSERT INTO player_season_stats
+    SELECT G.season, G.player_id, PT.team_id, COUNT(G.id),
+           COUNT(G.id) FILTER (WHERE G.pen),
+           COUNT(G.id) FILTER (WHERE G.winner),
+           COUNT(G.id) FILTER (WHERE G.equalizer),
+           COUNT(G.id) FILTER (WHERE G.own_goal),
+           COALESCE(H.hattricks, 0)
+    FROM Goals_Scored G
+    INNER JOIN Player_Season_Team PT
+    ON PT.season = G.season AND PT.player_id = G.player_id
+    LEFT JOIN (
+        SELECT X.season, X.player_id, SUM(X.goals / 3) hattricks
+        FROM (
+            SELECT season, player_id, COUNT(id) goals
+            FROM Goals_Scored
+            WHERE {_in_scope("season", "player_id")}
+            GROUP BY season, player_id, match_id
+            HAVING COUNT(id) >= 3
+        ) X
+        GROUP BY X.season, X.player_id
+    ) H ON H.season = G.season AND H.player_id = G.player_id
+    WHERE {_in_scope("G.season", "G.player_id")}
+    GROUP BY G.season, G.player_id, PT.team_id, H.hattricks;
+"""
+
+REFEREE_STATS = f"""
+    DELETE FROM referee_stats
+    WHERE {_in_scope("season", "referee_id")};
+
+    INSERT INTO referee_stats
+    SELECT OB.season, OB.referee_id, M.team1_id, COUNT(M.id),
+           COUNT(M.id) FILTER (WHERE M.h_score > M.a_score),
+           COUNT(M.id) FILTER (WHERE M.h_score < M.a_score),
+           COUNT(M.id) FILTER (WHERE M.h_score = M.a_score),
+           COALESCE(SUM(P.penalties), 0)
+    FROM Officiated_by OB
+    INNER JOIN Matches_Held_at M
+    ON M.season = OB.season AND M.id = OB.match_id
+    LEFT JOIN (
+        SELECT G.season, G.match_id, COUNT(G.id) FILTER (WHERE G.pen) penalties
+        FROM Goals_Scored G
+        WHERE (%(season)s::int IS NULL OR G.season = %(season)s::int)
+        AND (%(keys)s::int[] IS NULL OR (G.season, G.match_id) IN (
+            SELECT season, match_id FROM Officiated_by WHERE referee_id = ANY(%(keys)s::int[])
+        ))
+        GROUP BY G.season, G.match_id
+    ) P ON P.season = M.season AND P.match_id = M.id
+    WHERE {_in_scope("OB.season", "OB.referee_id")}
+    GROUP BY OB.season, OB.referee_id, M.team1_id;
+"""
+
+STADIUM_STATS = f"""
+    DELETE FROM stadium_stats
+    WHERE {_in_scope("season", "stadium_id")};
+
+    INSERT INTO stadium_stats
+    SELECT TM.season, TM.stadium_id, TM.team_id, COUNT(*),
+           SUM(TM.goals_for), SUM(TM.goals_against),
+           COUNT(*) FILTER (WHERE TM.result = 'W'),
+           COUNT(*) FILTER (WHERE TM.result = 'L'),
+           COUNT(*) FILTER (WHERE TM.result = 'D')
+    FROM Team_Match TM
+    WHERE TM.is_home
+    AND {_in_scope("TM.season", "TM.stadium_id")}
+    GROUP BY TM.season, TM.stadium_id, TM.team_id;
+"""
+
+# Keys of every summary row that depends on a given set of matches in a season
+AFFECTED_KEYS = """
+    SELECT
+        ARRAY(SELECT team1_id FROM Matches_Held_at
+              WHERE season = %(season)s AND id = ANY(%(matches)s::int[])
+              UNION SELECT team2_id FROM Matches_Held_at
+              WHERE season = %(season)s AND id = ANY(%(matches)s::int[])
+              UNION SELECT PT.team_id FROM Goals_Scored G
+                    INNER JOIN Player_Season_Team PT ON PT.season = G.season AND PT.player_id = G.player_id
+                    WHERE G.season = %(season)s AND G.match_id = ANY(%(matches)s::int[])) teams,
+        ARRAY(SELECT DISTINCT player_id FROM Goals_Scored
+              WHERE season = %(season)s AND match_id = ANY(%(matches)s::int[])) players,
+        ARRAY(SELECT DISTINCT referee_id FROM Officiated_by
+              WHERE season = %(season)s AND match_id = ANY(%(matches)s::int[])) referees,
+        ARRAY(SELECT DISTINCT stadium_id FROM Matches_Held_at
+              WHERE season = %(season)s AND id = ANY(%(matches)s::int[])) stadiums;
+"""
+
+REFRESHES = [
+    ("teams", TEAM_STATS),
+    ("players", PLAYER_STATS),
+    ("referees", REFEREE_STATS),
+    ("stadiums", STADIUM_STATS),
+]
+
+
+def affected_keys(cur, season, match_ids):
+    cur.execute(AFFECTED_KEYS, {"season": season, "matches": list(match_ids)})
+    return dict(zip([d[0] for d in cur.description], cur.fetchone()))
+
+
+def refresh(cur, season=None, match_ids=None, keys=None):
+    """Recompute the summary rows of ``season`` that depend on ``match_ids``.
+
+    With no ``match_ids`` the whole season is rebuilt, and with no
+    ``season`` every season is. ``keys`` may name extra team/player/
+    referee/stadium ids to recompute, e.g. those of rows that were deleted
+    and so can no longer be found from their match. Runs inside the
+    caller's transaction.
+    """
+    if match_ids is None:
+        targets = dict.fromkeys(name for name, _ in REFRESHES)
+    else:
+        targets = affected_keys(cur, season, match_ids)
+        for name, extra in (keys or {}).items():
+            targets[name] = sorted(set(targets[name]) | set(extra))
+
+    # The team and stadium refreshes read Team_Match, so bring it up to date first
+    cur.execute(TEAM_MATCH, {"season": season, "keys": None if match_ids is None else list(match_ids)})
+    for name, sql in REFRESHES:
+        if targets[name] is not None and not targets[name]:
+            continue
+        cur.execute(sql, {"season": season, "keys": targets[name]})
+    return targets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--season", type=int)
+    parser.add_argument("match_ids", nargs="*", type=int)
+    args = parser.parse_args()
+    if args.match_ids and args.season is None:
+        parser.error("match ids need --season")
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    conn = db.connect()
+    try:
+        with conn.cursor() as cur:
+            start = time.perf_counter()
+            db.set_change_season(cur, args.season)
+            refresh(cur, args.season, args.match_ids or None)
+        conn.commit()
+        logging.info("summary tables refreshed in %.3fs", time.perf_counter() - start)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
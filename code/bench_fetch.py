@@ -0,0 +1,82 @@
+"""Compare the row and COPY fetch paths of db.py.
+
+    python code/bench_fetch.py [--scale 1000] [--repeat 3]
+
+Each query is run by both paths in a fresh process, reporting rows/sec and
+peak memory: the Python heap peak from tracemalloc, and the growth of the
+process's peak RSS, which also covers buffers allocated outside Python
+(libpq, pyarrow). --scale repeats the goal log to get a larger result.
+"""
+import argparse
+import multiprocessing
+import resource
+import time
+import tracemalloc
+
+import db
+
+QUERIES = {
+    "players": "SELECT * FROM Players_Plays_In_Plays_for;",
+    "goals x scale": """
+        SELECT G.*, P.name, P.nationality, P.pos, M.match_date
+        FROM Goals_Scored G
+        INNER JOIN Players_Plays_In_Plays_for P ON G.player_id = P.id
+        INNER JOIN Matches_Held_at M ON M.season = G.season AND M.id = G.match_id
+        CROSS JOIN generate_series(1, %(scale)s) S;""",
+}
+
+FETCHERS = {
+    "rows": lambda sql, params: db._fetch(lambda conn, cur: cur.execute(sql, params)),
+    "copy": db.query_copy,
+}
+
+
+def _run(mode, sql, params, repeat, results):
+    fetch = FETCHERS[mode]
+    fetch("SELECT 1;", None)  # open the pool outside the measurement
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    tracemalloc.start()
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df = fetch(sql, params)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        del df
+    _, heap_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    rows = len(fetch(sql, params))
+    rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+    results.put((rows, best, heap_peak, rss_growth * 1024))
+
+
+def measure(mode, sql, params, repeat):
+    # A fresh process per measurement so one path's peak can't hide the other's
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    proc = ctx.Process(target=_run, args=(mode, sql, params, repeat, results))
+    proc.start()
+    result = results.get()
+    proc.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'query':<16}{'path':<6}{'rows':>10}{'seconds':>10}{'rows/sec':>12}"
+          f"{'heap MB':>10}{'rss MB':>10}")
+    for name, sql in QUERIES.items():
+        for mode in FETCHERS:
+            rows, seconds, heap, rss = measure(mode, sql, {"scale": args.scale}, args.repeat)
+            print(f"{name:<16}{mode:<6}{rows:>10}{seconds:>10.3f}{rows / seconds:>12,.0f}"
+                  f"{heap / 2**20:>10.1f}{rss / 2**20:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Time every report query on synthetic data sets of increasing size.
+
+    python code/bench_reports.py [--scale seasons=1] [--scale seasons=2,teams=40 ...]
+                                 [--repeat 3] [--output bench.json] [--baseline old.json]
+
+WARNING: this reloads the database configured in database.ini. Each
+--scale is a set of synth.py options. For each one the data set is
+generated and loaded, then every report is run with the parameters the app
+uses (the warm-up's job list) and timed three ways: cold (a result cache
+miss, as after a data change), exec (the best of --repeat runs straight
+against the database) and warm (a result cache hit). The bundled data/ is
+loaded again at the end unless --keep-data.
+
+The JSON report has every scale's row counts and per-report times, and for
+each report the exponent of its exec time against the number of goals
+across the scales; above --superlinear it is flagged. With --baseline,
+reports whose exec time at a scale grew by more than --tolerance over the
+baseline's are listed as regressions.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import cache
+import db
+import load_data
+import synth
+import warmup
+from queries import QUERIES, run_query
+
+DEFAULT_SCALES = ["seasons=1", "seasons=2,teams=40", "seasons=4,teams=80"]
+
+COUNTED = ["Matches_Held_at", "Goals_Scored", "Players_Plays_In_Plays_for", "Teams_Owner_Managed_Located"]
+
+log = logging.getLogger(__name__)
+
+
+def parse_scale(spec):
+    """'seasons=2,teams=40' -> {"seasons": 2, "teams": 40}"""
+    options = {}
+    for item in filter(None, spec.split(",")):
+        key, _, value = item.partition("=")
+        key = key.strip().replace("-", "_")
+        options[key] = float(value) if key == "goals_per_match" else int(value)
+    return options
+
+
+def load(paths):
+    start = time.perf_counter()
+    for i, (season, path) in enumerate(paths):
+        load_data.load(path, season, i > 0, os.path.join(load_data.CODE_DIR, "schema.sql"),
+                       os.path.join(load_data.CODE_DIR, "indexes.sql"))
+    return time.perf_counter() - start
+
+
+def _jobs():
+    seasons = run_query("seasons")["season"].tolist()
+    first = warmup._first_wave(seasons)
+    lists = {(name, *params.values()): run_query(name, **params) for name, params in first}
+    return first + warmup._second_wave(seasons, lists)
+
+
+def time_report(name, params, repeat):
+    """Cold, exec and warm seconds of one report call, and its row count."""
+    query = QUERIES[name]
+    values = [params[p] for p in query.params]
+    result_cache = cache.get_cache()
+
+    result_cache.invalidate()
+    start = time.perf_counter()
+    df = run_query(name, **params)
+    cold = time.perf_counter() - start
+
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        db.query_prepared(query.statement, query.prepared_sql, values)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    start = time.perf_counter()
+    run_query(name, **params)
+    warm = time.perf_counter() - start
+    return cold, best, warm, len(df)
+
+
+def bench_scale(spec, repeat, seed):
+    options = parse_scale(spec)
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        paths = synth.generate(tmp, seed=seed, **options)
+        generate_seconds = time.perf_counter() - start
+        load_seconds = load(paths)
+
+    rows = {t: int(db.query_db(f"SELECT COUNT(*) n FROM {t};")["n"][0]) for t in COUNTED}
+    reports = {}
+    for name, params in _jobs():
+        cold, exec_, warm, n = time_report(name, params, repeat)
+        stats = reports.setdefault(name, {"calls": 0, "cold_ms": 0.0, "exec_ms": 0.0, "warm_ms": 0.0, "rows": 0})
+        stats["calls"] += 1
+        stats["cold_ms"] += 1000 * cold
+        stats["exec_ms"] += 1000 * exec_
+        stats["warm_ms"] += 1000 * warm
+        stats["rows"] += n
+    for stats in reports.values():
+        for key in ("cold_ms", "exec_ms", "warm_ms"):
+            stats[key] /= stats["calls"]
+    log.info("%s: %d goals, loaded in %.1fs, %d reports", spec, rows["Goals_Scored"], load_seconds, len(reports))
+    return {"scale": spec, "options": options, "rows": rows, "generate_seconds": generate_seconds,
+            "load_seconds": load_seconds, "reports": reports}
+
+
+def growth(scales, superlinear):
+    """Per report, the exponent k of exec_ms ~ goals**k fitted across the scales."""
+    result = {}
+    sizes = np.log([s["rows"]["Goals_Scored"] for s in scales])
+    if len(scales) < 2 or np.ptp(sizes) == 0:
+        return result
+    for name in scales[0]["reports"]:
+        times = [s["reports"].get(name, {}).get("exec_ms") for s in scales]
+        if any(t is None or t <= 0 for t in times):
+            continue
+        exponent = float(np.polyfit(sizes, np.log(times), 1)[0])
+        result[name] = {"exponent": exponent, "superlinear": exponent > superlinear}
+    return result
+
+
+def regressions(scales, baseline, tolerance):
+    previous = {s["scale"]: s["reports"] for s in baseline["scales"]}
+    found = []
+    for scale in scales:
+        for name, stats in scale["reports"].items():
+            before = previous.get(scale["scale"], {}).get(name)
+            if before and stats["exec_ms"] > before["exec_ms"] * (1 + tolerance):
+                found.append({"scale": scale["scale"], "report": name, "baseline_ms": before["exec_ms"],
+                              "exec_ms": stats["exec_ms"], "ratio": stats["exec_ms"] / before["exec_ms"]})
+    return sorted(found, key=lambda r: -r["ratio"])
+
+
+def print_table(report, out=sys.stdout):
+    scales = report["scales"]
+    header = f"{'report':<38}" + "".join(f"{s['rows']['Goals_Scored']:>12,}" for s in scales) + f"{'exponent':>10}"
+    print(f"exec ms by number of goals\n{header}", file=out)
+    for name in sorted(scales[0]["reports"]):
+        fit = report["growth"].get(name)
+        print(f"{name:<38}" + "".join(f"{s['reports'].get(name, {}).get('exec_ms', float('nan')):>12.2f}"
+                                      for s in scales)
+              + (f"{fit['exponent']:>9.2f}{'*' if fit['superlinear'] else ' '}" if fit else ""), file=out)
+    for r in report.get("regressions", []):
+        print(f"regression: {r['report']} at {r['scale']} {r['baseline_ms']:.2f} -> {r['exec_ms']:.2f} ms",
+              file=out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", action="append", help="synth.py options, e.g. seasons=2,teams=40")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="an earlier JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--superlinear", type=float, default=1.2)
+    parser.add_argument("--keep-data", action="store_true", help="leave the last synthetic data set loaded")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    # The loader's per-table lines would drown out the benchmark's
+    logging.getLogger().handlers[0].addFilter(lambda record: record.name == __name__)
+
+    try:
+        scales = [bench_scale(spec, args.repeat, args.seed) for spec in args.scale or DEFAULT_SCALES]
+    finally:
+        if not args.keep_data:
+            load([(2021, os.path.join(load_data.ROOT_DIR, "data"))])
+    report = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "repeat": args.repeat,
+              "scales": scales, "growth": growth(scales, args.superlinear)}
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = regressions(scales, json.load(f), args.tolerance)
+
+    print_table(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
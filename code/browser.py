@@ -0,0 +1,117 @@
+"""Paginated access to whole tables for the Home page table browser.
+
+Pages are fetched with keyset pagination on the table's primary key, so
+each page is an index range scan of ``page_size`` rows however deep into
+the table it is, and neither the app nor the browser ever holds more than
+one page. The embedded backend's tables are already in memory and are
+paged by row position.
+"""
+import operator
+
+import pandas as pd
+
+import cache
+import db
+import embedded
+from queries import run_query
+
+FILTER_OPERATORS = ["=", "!=", "<", "<=", ">", ">=", "contains"]
+
+COMPARISONS = {
+    "=": operator.eq, "!=": operator.ne, "<": operator.lt,
+    "<=": operator.le, ">": operator.gt, ">=": operator.ge,
+}
+
+
+def quote_ident(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def table_columns(table):
+    return run_query("table_columns", table=table)["column_name"].tolist()
+
+
+def primary_key(table):
+    return run_query("table_primary_key", table=table)["column_name"].tolist()
+
+
+def estimated_rows(table):
+    """Row count from the planner statistics, without scanning the table."""
+    return int(run_query("table_estimated_rows", table=table)["estimate"][0])
+
+
+def _where(filters, key, after):
+    clauses, params = [], []
+    for column, op, value in filters:
+        if op == "contains":
+            clauses.append(f"CAST({quote_ident(column)} AS text) ILIKE '%%' || %s || '%%'")
+        else:
+            clauses.append(f"{quote_ident(column)} {op} %s")
+        params.append(value)
+    if after is not None:
+        clauses.append(f"({', '.join(map(quote_ident, key))}) > ({', '.join(['%s'] * len(key))})")
+        params.extend(after)
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+def _embedded_page(table, columns, filters, offset, limit):
+    df = embedded.get_engine().table(table)
+    keep = pd.Series(True, index=df.index)
+    for column, op, value in filters:
+        values = df[column]
+        if op == "contains":
+            keep &= values.astype(str).str.contains(value, case=False, regex=False)
+            continue
+        # Compare as the column's type, as Postgres does with an untyped literal
+        if values.dtype == bool:
+            value = value.lower() in ("t", "true", "y", "yes", "on", "1")
+        elif pd.api.types.is_numeric_dtype(values):
+            value = pd.to_numeric(value)
+        keep &= COMPARISONS[op](values, value)
+    return df.loc[keep, columns].iloc[offset:offset + limit].reset_index(drop=True)
+
+
+def fetch_page(table, columns=None, filters=(), after=None, page_size=100):
+    """Return the ``page_size`` rows that follow the key ``after``.
+
+    ``columns`` projects the result (the primary key is always included so
+    the next page can be requested), and ``filters`` is a list of
+    ``(column, operator, value)`` triples. Returns the page and the key to
+    pass as ``after`` for the next one, or None on the last page.
+    """
+    if table not in run_query("table_names")["relname"].tolist():
+        raise ValueError(f"unknown table {table!r}")
+    known = table_columns(table)
+    for column, op, _ in filters:
+        if column not in known or op not in FILTER_OPERATORS:
+            raise ValueError(f"invalid filter on {column!r}")
+
+    key = primary_key(table)
+    columns = [c for c in (columns or known) if c in known]
+    select = key + [c for c in columns if c not in key]
+    offset = (after or [0])[0]
+
+    if db.get_backend() == "embedded":
+        df = _embedded_page(table, select, filters, offset, page_size + 1)
+    else:
+        if key:
+            where, params = _where(filters, key, after)
+            order = ", ".join(map(quote_ident, key))
+            sql = (f"SELECT {', '.join(map(quote_ident, select))} FROM {quote_ident(table)}"
+                   f"{where} ORDER BY {order} LIMIT {int(page_size) + 1};")
+        else:
+            # No key to seek on: fall back to OFFSET, counting pages in ``after``
+            where, params = _where(filters, key, None)
+            sql = (f"SELECT {', '.join(map(quote_ident, select))} FROM {quote_ident(table)}"
+                   f"{where} OFFSET {int(offset)} LIMIT {int(page_size) + 1};")
+        df = cache.cached_query(sql, params)
+
+    # One extra row tells us whether there is a next page without a COUNT(*)
+    if len(df) <= page_size:
+        return df, None
+    df = df.iloc[:page_size]
+    if key:
+        next_after = next(df[key].iloc[-1:].itertuples(index=False, name=None))
+    else:
+        next_after = (offset + page_size,)
+    return df, next_after
@@ -0,0 +1,330 @@
+import hashlib
+import os
+import pickle
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+
+import db
+
+# Defaults for the optional [cache] section of database.ini
+CACHE_OPTIONS = {
+    "max_entries": 512,
+    "max_bytes": 256 * 1024 * 1024,
+    "ttl": 900,
+    "version_check": 5,
+    "shared_max_bytes": 1024 * 1024 * 1024,
+}
+
+
+def frame_size(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def tables_read(sql):
+    """Lower-cased names of the tables ``sql`` reads, or None if it reads the catalog.
+
+    Catalog queries (the table browser's) see schema changes that no data
+    counter records, so they are treated as depending on everything.
+    """
+    tables = {t.lower() for t in re.findall(r'\b(?:FROM|JOIN)\s+"?([A-Za-z_]\w*)', sql, re.IGNORECASE)}
+    if any(t.startswith("pg_") for t in tables):
+        return None
+    return frozenset(tables)
+
+
+def _moved(old, new):
+    """The (table, season) counters that differ between two version stamps.
+
+    None when the stamps are not per-table counters, i.e. everything moved.
+    """
+    if not isinstance(old, Mapping) or not isinstance(new, Mapping):
+        return None
+    return {key for key in old.keys() | new.keys() if old.get(key) != new.get(key)}
+
+
+def _affected(scope, moved):
+    if scope is None:
+        return True
+    tables, season = scope
+    return any(table in tables and (changed == 0 or season is None or changed == season)
+               for table, changed in moved)
+
+
+def changed(scope, old, new):
+    """Whether any change between version stamps ``old`` and ``new`` affects ``scope``."""
+    if old == new:
+        return False
+    moved = _moved(old, new)
+    return moved is None or _affected(scope, moved)
+
+
+class ResultCache:
+    """LRU cache of query results with TTL, a memory cap and version invalidation.
+
+    Entries are evicted least-recently-used first once either ``max_entries``
+    or ``max_bytes`` is exceeded, and expire ``ttl`` seconds after they were
+    stored. At most every ``version_check`` seconds the cache asks
+    ``version_fn`` for the current data-version stamp and, if it has moved
+    since the entries were computed, drops them. When the stamp maps
+    (table, season) pairs to counters, only entries whose scope (the tables
+    they read and the season they are for, if any) covers a moved counter
+    are dropped; entries stored without a scope are dropped on any change.
+
+    A ``shared`` SharedCache is consulted on a miss before computing, and
+    given every freshly computed result, so other processes can reuse it.
+
+    Cached DataFrames are shared between callers and must not be modified in place.
+    """
+
+    def __init__(self, max_entries, max_bytes, ttl, version_check, version_fn=None, shared=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.version_check = version_check
+        self.version_fn = version_fn
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self._bytes = 0
+        self._version = None
+        self._version_checked = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.invalidated = 0
+
+    @property
+    def version(self):
+        """The data-version stamp the entries were last checked against."""
+        return self._version
+
+    def check_version(self, force=False):
+        """Drop the entries the data has changed under since they were stored.
+
+        Asks ``version_fn`` at most every ``version_check`` seconds unless ``force``.
+        """
+        if self.version_fn is None:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._version_checked < self.version_check:
+                return
+            self._version_checked = now
+        # Ask for the stamp outside the lock so a slow database doesn't stall hits
+        version = self.version_fn()
+        with self._lock:
+            if version != self._version:
+                if self._version is not None:
+                    self.invalidate(_moved(self._version, version))
+                self._version = version
+
+    def _drop(self, key):
+        _, size, _, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key):
+        """Return ``(True, value)`` on a hit and ``(False, None)`` on a miss."""
+        self.check_version()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] < time.monotonic():
+                self._drop(key)
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[0]
+
+    def put(self, key, df, version=None, scope=None):
+        size = frame_size(df)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if version is not None and version != self._version:
+                # Computed against data that has since changed
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (df, size, time.monotonic() + self.ttl, scope)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute, scope=None):
+        hit, df = self.get(key)
+        if not hit:
+            version = self._version
+            df = None if self.shared is None else self.shared.get(key, version)
+            if df is None:
+                df = compute()
+                if self.shared is not None:
+                    self.shared.put(key, df, version, scope)
+            self.put(key, df, version, scope)
+        return df
+
+    def invalidate(self, moved=None):
+        """Drop the entries affected by the ``moved`` (table, season) counters, or all of them."""
+        with self._lock:
+            if moved is None:
+                stale = list(self._entries)
+            else:
+                stale = [key for key, entry in self._entries.items() if _affected(entry[3], moved)]
+            for key in stale:
+                self._drop(key)
+            self.invalidations += 1
+            self.invalidated += len(stale)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "invalidated": self.invalidated,
+                "data_version": (sum(self._version.values()) if isinstance(self._version, Mapping)
+                                 else self._version),
+                **({} if self.shared is None else self.shared.stats()),
+            }
+
+
+class SharedCache:
+    """Result cache in a SQLite file that every app process on a host can share.
+
+    Each entry holds a pickled DataFrame with the data-version stamp it was
+    computed at and its scope, and is written in a single transaction, so
+    readers see either the old entry or the new one. An entry is dropped
+    when it is read after a change affecting its scope (see changed()) or
+    after ``ttl`` seconds. Once the file's entries exceed ``max_bytes`` the
+    least recently read are evicted.
+
+    The file holds pickles, so it must only be writable by the app.
+    """
+
+    def __init__(self, path, max_bytes, ttl):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL;")
+            conn.execute("""CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY, meta BLOB, data BLOB, size INTEGER, accessed REAL, expires REAL)""")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);")
+
+    def _connect(self):
+        # One connection per thread; autocommit, with transactions begun explicitly
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        return conn
+
+    @staticmethod
+    def _key(key):
+        return hashlib.sha1(repr(key).encode()).hexdigest()
+
+    def get(self, key, version):
+        """The entry's DataFrame, or None if it is missing, expired or stale at ``version``."""
+        conn = self._connect()
+        key = self._key(key)
+        row = conn.execute("SELECT meta, expires FROM entries WHERE key = ?;", (key,)).fetchone()
+        now = time.time()
+        if row is not None:
+            stored, scope = pickle.loads(row[0])
+            if row[1] < now or changed(scope, stored, version):
+                conn.execute("DELETE FROM entries WHERE key = ?;", (key,))
+                row = None
+        data = None if row is None else conn.execute("SELECT data FROM entries WHERE key = ?;", (key,)).fetchone()
+        with self._lock:
+            # None here too if another process evicted it in between
+            if data is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        conn.execute("UPDATE entries SET accessed = ? WHERE key = ?;", (now, key))
+        return pickle.loads(data[0])
+
+    def put(self, key, df, version, scope):
+        data = pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            return
+        meta = pickle.dumps((version, scope), protocol=pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE;")
+        try:
+            conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?);",
+                         (self._key(key), meta, data, len(data), now, now + self.ttl))
+            excess = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries;").fetchone()[0] - self.max_bytes
+            if excess > 0:
+                evict = []
+                for old_key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed;"):
+                    if excess <= 0:
+                        break
+                    evict.append((old_key,))
+                    excess -= size
+                conn.executemany("DELETE FROM entries WHERE key = ?;", evict)
+            conn.execute("COMMIT;")
+        except BaseException:
+            conn.execute("ROLLBACK;")
+            raise
+
+    def stats(self):
+        entries, size = self._connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries;").fetchone()
+        with self._lock:
+            return {"shared_entries": entries, "shared_bytes": size,
+                    "shared_hits": self.hits, "shared_misses": self.misses}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                config = db.get_config(section="cache", optional=True)
+                settings = {k: int(config.get(k, default)) for k, default in CACHE_OPTIONS.items()}
+                shared_max_bytes = settings.pop("shared_max_bytes")
+                shared = None
+                if config.get("shared_path"):
+                    shared = SharedCache(config["shared_path"], shared_max_bytes, settings["ttl"])
+                # The embedded backend's data never changes under a running app
+                version_fn = db.data_version if db.get_backend() == "postgres" else None
+                _cache = ResultCache(version_fn=version_fn, shared=shared, **settings)
+    return _cache
+
+
+def freeze(params):
+    """Turn query parameters into a hashable cache key."""
+    if isinstance(params, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in params.items()))
+    if isinstance(params, (list, tuple)):
+        return tuple(freeze(v) for v in params)
+    return params
+
+
+def cached_query(sql: str, params=None):
+    """Run a query through the process-wide result cache."""
+    tables = tables_read(sql)
+    return get_cache().get_or_compute((sql, freeze(params)), lambda: db.query_db(sql, params),
+                                      None if tables is None else (tables, None))
@@ -0,0 +1,358 @@
+import atexit
+import io
+import threading
+import time
+from configparser import ConfigParser
+from contextlib import contextmanager
+from functools import lru_cache
+
+import pandas as pd
+import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
+import psycopg2.pool
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # decode COPY output with pandas' CSV parser instead
+    pa = None
+
+# Keys in the [postgresql] section that configure the pool rather than the
+# connection itself. Everything else is passed straight to psycopg2.connect.
+POOL_OPTIONS = {
+    "pool_minconn": 1,
+    "pool_maxconn": 10,
+    "pool_timeout": 30,
+    "pool_health_check": 30,
+    "pool_retries": 1,
+}
+
+# How query_db reads results: "rows" fetches tuples through the cursor, "copy"
+# streams the result as CSV through COPY ... TO STDOUT and parses it straight
+# into typed columns (see query_copy).
+FETCH_MODES = ("rows", "copy")
+
+# Errors after which a connection can no longer be trusted and is replaced.
+DISCONNECT_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+# Errors meaning a prepared statement is missing or its plan went stale after a
+# schema change; the statement is prepared again and the query retried.
+STALE_STATEMENT_ERRORS = (psycopg2.errors.InvalidSqlStatementName, psycopg2.errors.FeatureNotSupported)
+
+
+@lru_cache(maxsize=None)
+def _read_config(filename, section, optional):
+    parser = ConfigParser()
+    parser.read(filename)
+    if optional and not parser.has_section(section):
+        return {}
+    return {k: v for k, v in parser.items(section)}
+
+
+def get_config(filename="database.ini", section="postgresql", optional=False):
+    # Optional sections (e.g. [cache]) may be left out of database.ini entirely
+    return dict(_read_config(filename, section, optional))
+
+
+# Where report queries are answered, set by backend= in the optional [app]
+# section: Postgres, or the embedded engine over data/*.csv (see embedded.py).
+BACKENDS = ("postgres", "embedded")
+
+
+def get_backend():
+    backend = get_config(section="app", optional=True).get("backend", BACKENDS[0])
+    if backend not in BACKENDS:
+        raise ValueError(f"backend must be one of {', '.join(BACKENDS)}")
+    return backend
+
+
+class Connection(psycopg2.extensions.connection):
+    """Connection that remembers which statements it has prepared."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+
+class ConnectionPool:
+    """Thread-safe pool of long-lived connections.
+
+    Callers block for up to ``timeout`` seconds when every connection is in
+    use instead of failing immediately. Connections that have been idle for
+    longer than ``health_check`` seconds are pinged before being handed out,
+    and dead connections are replaced transparently.
+    """
+
+    def __init__(self, minconn, maxconn, timeout=30, health_check=30, **connect_kwargs):
+        self._pool = psycopg2.pool.ThreadedConnectionPool(
+            minconn, maxconn, connection_factory=Connection, **connect_kwargs
+        )
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._last_used = {}
+        self.timeout = timeout
+        self.health_check = health_check
+
+    def _healthy(self, conn):
+        if conn.closed:
+            return False
+        idle = time.monotonic() - self._last_used.get(id(conn), 0)
+        if idle < self.health_check:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except DISCONNECT_ERRORS:
+            return False
+
+    def getconn(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise psycopg2.pool.PoolError("timed out waiting for a database connection")
+        try:
+            conn = self._pool.getconn()
+            while not self._healthy(conn):
+                self._last_used.pop(id(conn), None)
+                self._pool.putconn(conn, close=True)
+                conn = self._pool.getconn()
+            return conn
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn, close=False):
+        try:
+            if close or conn.closed:
+                self._last_used.pop(id(conn), None)
+                self._pool.putconn(conn, close=True)
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+                self._pool.putconn(conn)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        conn = self.getconn()
+        close = False
+        try:
+            yield conn
+        except DISCONNECT_ERRORS:
+            close = True
+            raise
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self.putconn(conn, close=close or conn.closed)
+
+    def closeall(self):
+        self._pool.closeall()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _pool_settings():
+    db_info = get_config()
+    settings = {k: int(db_info.pop(k, default)) for k, default in POOL_OPTIONS.items()}
+    settings["fetch_mode"] = db_info.pop("fetch_mode", FETCH_MODES[0])
+    if settings["fetch_mode"] not in FETCH_MODES:
+        raise ValueError(f"fetch_mode must be one of {', '.join(FETCH_MODES)}")
+    return settings, db_info
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                settings, db_info = _pool_settings()
+                _pool = ConnectionPool(
+                    settings["pool_minconn"],
+                    settings["pool_maxconn"],
+                    timeout=settings["pool_timeout"],
+                    health_check=settings["pool_health_check"],
+                    **db_info,
+                )
+                atexit.register(_pool.closeall)
+    return _pool
+
+
+def connect():
+    """Open a dedicated, unpooled connection for loaders and other batch jobs."""
+    _, db_info = _pool_settings()
+    return psycopg2.connect(**db_info)
+
+
+def _read_rows(cur):
+    data = cur.fetchall()
+    column_names = [desc[0] for desc in cur.description]
+    return pd.DataFrame(data=data, columns=column_names)
+
+
+def _fetch(execute, read=_read_rows):
+    retries = _pool_settings()[0]["pool_retries"]
+
+    for attempt in range(retries + 1):
+        try:
+            with get_pool().connection() as conn:
+                with conn.cursor() as cur:
+                    execute(conn, cur)
+                    df = read(cur)
+
+                # End the transaction so the connection goes back to the pool clean
+                conn.commit()
+            break
+        except DISCONNECT_ERRORS:
+            # The broken connection has been dropped from the pool; retry on a fresh one
+            if attempt == retries:
+                raise
+
+    return df
+
+
+# Postgres type OIDs (pg_type.oid) of the result columns COPY output is decoded
+# into; anything else stays a string.
+_BOOL_OIDS = {16}
+_INT_OIDS = {20, 21, 23, 26}
+_FLOAT_OIDS = {700, 701, 1700}
+_DATE_OIDS = {1082}
+_TIMESTAMP_OIDS = {1114, 1184}
+
+
+def _arrow_type(oid):
+    if oid in _BOOL_OIDS:
+        return pa.bool_()
+    if oid in _INT_OIDS:
+        return pa.int64()
+    if oid in _FLOAT_OIDS:
+        return pa.float64()
+    if oid in _DATE_OIDS:
+        return pa.date32()
+    if oid in _TIMESTAMP_OIDS:
+        return pa.timestamp("us", tz="UTC" if oid == 1184 else None)
+    return pa.string()
+
+
+def decode_csv(data, description):
+    """Parse COPY ... (FORMAT csv) output into a DataFrame typed from ``description``.
+
+    Columns are decoded in bulk by pyarrow (or pandas' C parser when pyarrow
+    is not installed) instead of one Python object per cell. numeric comes
+    back as float64 rather than Decimal.
+    """
+    names = [desc[0] for desc in description]
+    # Positional names, since a result may repeat a column name
+    keys = [f"c{i}" for i in range(len(names))]
+
+    if pa is not None:
+        table = pa_csv.read_csv(
+            pa.BufferReader(data),
+            read_options=pa_csv.ReadOptions(column_names=keys),
+            convert_options=pa_csv.ConvertOptions(
+                column_types={k: _arrow_type(desc[1]) for k, desc in zip(keys, description)},
+                true_values=["t"],
+                false_values=["f"],
+                null_values=[""],
+                strings_can_be_null=True,
+                # COPY writes NULL unquoted and the empty string as ""
+                quoted_strings_can_be_null=False,
+            ),
+        )
+        df = table.to_pandas()
+    else:
+        dtypes = {k: "float64" if desc[1] in _FLOAT_OIDS else "object"
+                  for k, desc in zip(keys, description) if desc[1] not in _INT_OIDS | _BOOL_OIDS}
+        df = pd.read_csv(io.BytesIO(data), names=keys, dtype=dtypes, keep_default_na=False,
+                         na_values=[""], true_values=["t"], false_values=["f"],
+                         parse_dates=[k for k, desc in zip(keys, description)
+                                      if desc[1] in _DATE_OIDS | _TIMESTAMP_OIDS])
+
+    df.columns = names
+    return df
+
+
+def _read_copy(sql, params):
+    def read(cur):
+        query = cur.mogrify(sql, params).decode().strip().rstrip(";")
+        # Describe the result without running it, to learn the column types
+        cur.execute(f"SELECT * FROM ({query}) q LIMIT 0;")
+        description = cur.description
+        buffer = io.BytesIO()
+        cur.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv)", buffer)
+        return decode_csv(buffer.getbuffer(), description)
+
+    return read
+
+
+def query_copy(sql: str, params=None):
+    """Run the SELECT ``sql`` through COPY ... TO STDOUT and decode it column-wise."""
+    return _fetch(lambda conn, cur: None, _read_copy(sql, params))
+
+
+def query_db(sql: str, params=None):
+    if _pool_settings()[0]["fetch_mode"] == "copy":
+        return query_copy(sql, params)
+    return _fetch(lambda conn, cur: cur.execute(sql, params))
+
+
+def explain(sql: str, params=None):
+    """Run ``sql`` under EXPLAIN (ANALYZE, BUFFERS) and return the plan as text."""
+    plan = _fetch(lambda conn, cur: cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + sql, params))
+    return "\n".join(plan.iloc[:, 0])
+
+
+def _execute_prepared(conn, cur, name, sql, values):
+    if name not in conn.prepared:
+        cur.execute(f"PREPARE {name} AS {sql}")
+        conn.prepared.add(name)
+    if values:
+        cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(values))})", values)
+    else:
+        cur.execute(f"EXECUTE {name}")
+
+
+def query_prepared(name: str, sql: str, values=()):
+    """Run ``sql`` (with $1, $2, ... placeholders) as the prepared statement ``name``.
+
+    Each pooled connection prepares the statement the first time it runs it
+    and reuses the server-side plan afterwards.
+    """
+    def execute(conn, cur):
+        try:
+            _execute_prepared(conn, cur, name, sql, values)
+        except STALE_STATEMENT_ERRORS:
+            conn.rollback()
+            cur.execute("DEALLOCATE ALL")
+            conn.prepared.clear()
+            _execute_prepared(conn, cur, name, sql, values)
+
+    return _fetch(execute)
+
+
+def data_version():
+    """Return the current data-version stamp, or None if the schema predates it.
+
+    The stamp maps each (table name, season) row of Data_Version to its
+    counter, which triggers bump on every statement that changes the table.
+    Season 0 counts changes that were not confined to one season.
+    """
+    try:
+        df = query_db("SELECT table_name, season, version FROM Data_Version;")
+    except psycopg2.ProgrammingError:
+        return None
+    return {(table, int(season)): int(version)
+            for table, season, version in df.itertuples(index=False, name=None)}
+
+
+def set_change_season(cur, season):
+    """Count the rest of this transaction's changes against ``season`` only.
+
+    The result cache then keeps the cached reports of every other season.
+    ``None`` goes back to counting changes against every season.
+    """
+    cur.execute("SELECT set_config('app.season', %s, true);", ("" if season is None else str(season),))
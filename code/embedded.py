@@ -0,0 +1,740 @@
+"""Embedded report backend that answers the report queries from data/*.csv.
+
+Selected with ``backend=embedded`` in the ``[app]`` section of
+database.ini, for laptops and CI where no Postgres is reachable:
+
+    [app]
+    backend=embedded
+    data_dir=data
+    season=2021
+
+The CSVs are read once into NumPy columns. Team, player, match and other
+ids are mapped to dense row positions, so joins are array lookups and
+group-bys are ``np.bincount`` over those positions. The summary tables that
+code/aggregates.py maintains in Postgres are derived the same way. Every
+query in queries.QUERIES has a function here that returns the same columns
+in the same order. numeric results come back as floats rather than Decimal.
+"""
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+import db
+import load_data
+
+# Defaults for the [app] settings the embedded backend reads
+EMBEDDED_OPTIONS = {
+    "data_dir": os.path.join(load_data.ROOT_DIR, "data"),
+    "season": 2021,
+}
+
+BOOL_COLUMNS = {"pen", "winner", "equalizer", "own_goal", "captain"}
+
+
+def _lookup(ids):
+    """Array mapping each id to its row position, -1 for ids not present."""
+    index = np.full(ids.max() + 1 if len(ids) else 1, -1, dtype=np.int64)
+    index[ids] = np.arange(len(ids))
+    return index
+
+
+def _count(positions, size, weights=None):
+    return np.bincount(positions, weights=weights, minlength=size).astype(np.int64)
+
+
+def _group(*keys):
+    """Distinct combinations of the key columns and each row's group number."""
+    if len(keys) == 1:
+        unique, inverse = np.unique(keys[0], return_inverse=True)
+        return [unique], inverse.ravel()
+    unique, inverse = np.unique(np.column_stack(keys), axis=0, return_inverse=True)
+    return [unique[:, i] for i in range(len(keys))], inverse.ravel()
+
+
+def _round(x, digits):
+    # Postgres rounds halves away from zero, np.round to even
+    scale = 10.0 ** digits
+    return np.sign(x) * np.floor(np.abs(x) * scale + 0.5) / scale
+
+
+def _percent(part, whole):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 100 * _round(part / whole, 4)
+
+
+def _frame(columns, by=None, ascending=False, limit=None):
+    df = pd.DataFrame(columns)
+    if by is not None:
+        df = df.sort_values(by, ascending=ascending, kind="stable", ignore_index=True)
+    return df if limit is None else df.iloc[:limit]
+
+
+class Engine:
+    """The data set of one season, held as NumPy columns."""
+
+    def __init__(self, data_dir, season):
+        self.season = season
+        self.tables = {}
+        for filename, table, columns, converters, key in load_data.TABLES:
+            df = pd.read_csv(os.path.join(data_dir, filename), encoding="utf-8-sig",
+                             header=0, names=columns, converters=converters)
+            for column in converters:
+                df[column] = pd.to_numeric(df[column])
+            for column in BOOL_COLUMNS.intersection(columns):
+                df[column] = df[column].astype(bool)
+            if key is None:
+                df.insert(0, "season", season)
+            self.tables[table.lower()] = {c: df[c].to_numpy() for c in df.columns}
+        self._derive()
+
+    def table(self, name):
+        return pd.DataFrame(self.tables[name])
+
+    def _derive(self):
+        teams = self.tables["teams_owner_managed_located"]
+        players = self.tables["players_plays_in_plays_for"]
+        matches = self.tables["matches_held_at"]
+        goals = self.tables["goals_scored"]
+        officiated = self.tables["officiated_by"]
+
+        self.team_pos = _lookup(teams["id"])
+        self.player_pos = _lookup(players["id"])
+        self.match_pos = _lookup(matches["id"])
+        self.manager_pos = _lookup(self.tables["managers"]["id"])
+        self.stadium_pos = _lookup(self.tables["stadiums"]["id"])
+        self.referee_pos = _lookup(self.tables["referees"]["id"])
+        n_teams, n_players, n_matches = len(teams["id"]), len(players["id"]), len(matches["id"])
+
+        # Team_Match: both sides of every match
+        referee = np.full(n_matches, np.iinfo(np.int64).max)
+        np.minimum.at(referee, self.match_pos[officiated["match_id"]], officiated["referee_id"])
+        gf = np.concatenate([matches["h_score"], matches["a_score"]])
+        ga = np.concatenate([matches["a_score"], matches["h_score"]])
+        tm = self.tables["team_match"] = {
+            "season": np.concatenate([matches["season"]] * 2),
+            "match_id": np.concatenate([matches["id"]] * 2),
+            "team_id": np.concatenate([matches["team1_id"], matches["team2_id"]]),
+            "opponent_id": np.concatenate([matches["team2_id"], matches["team1_id"]]),
+            "is_home": np.repeat([True, False], n_matches),
+            "goals_for": gf,
+            "goals_against": ga,
+            "result": np.where(gf > ga, "W", np.where(gf == ga, "D", "L")),
+            "stadium_id": np.concatenate([matches["stadium_id"]] * 2),
+            "referee_id": np.concatenate([referee] * 2),
+            "match_date": np.concatenate([matches["match_date"]] * 2),
+        }
+
+        # team_season_stats, dense over teams
+        t = self.team_pos[tm["team_id"]]
+        win, draw, loss = tm["result"] == "W", tm["result"] == "D", tm["result"] == "L"
+        goal_team = self.team_pos[players["T_id"][self.player_pos[goals["player_id"]]]]
+        self.team_stats = {
+            "matches": _count(t, n_teams),
+            "wins": _count(t, n_teams, win),
+            "draws": _count(t, n_teams, draw),
+            "losses": _count(t, n_teams, loss),
+            "home_wins": _count(t, n_teams, win & tm["is_home"]),
+            "away_wins": _count(t, n_teams, win & ~tm["is_home"]),
+            "goals_for": _count(t, n_teams, tm["goals_for"]),
+            "goals_against": _count(t, n_teams, tm["goals_against"]),
+            "clean_sheets": _count(t, n_teams, tm["goals_against"] == 0),
+            "player_goals": _count(goal_team, n_teams),
+            "player_penalties": _count(goal_team, n_teams, goals["pen"]),
+        }
+
+        # player_season_stats, dense over players
+        p = self.player_pos[goals["player_id"]]
+        m = self.match_pos[goals["match_id"]]
+        per_match, counts = np.unique(p * n_matches + m, return_counts=True)
+        hat = counts >= 3
+        self.player_stats = {
+            "goals": _count(p, n_players),
+            "penalties": _count(p, n_players, goals["pen"]),
+            "winners": _count(p, n_players, goals["winner"]),
+            "equalizers": _count(p, n_players, goals["equalizer"]),
+            "own_goals": _count(p, n_players, goals["own_goal"]),
+            "hattricks": _count(per_match[hat] // n_matches, n_players, counts[hat] // 3),
+        }
+
+        # referee_stats, one row per referee and home team
+        m = self.match_pos[officiated["match_id"]]
+        h, a = matches["h_score"][m], matches["a_score"][m]
+        penalties = _count(self.match_pos[goals["match_id"]], n_matches, goals["pen"])
+        (ref, home), g = _group(officiated["referee_id"], matches["team1_id"][m])
+        self.referee_stats = {
+            "referee_id": ref,
+            "home_team_id": home,
+            "matches": _count(g, len(ref)),
+            "home_wins": _count(g, len(ref), h > a),
+            "home_losses": _count(g, len(ref), h < a),
+            "home_draws": _count(g, len(ref), h == a),
+            "penalties": _count(g, len(ref), penalties[m]),
+        }
+
+        # stadium_stats, one row per stadium and home team
+        home_rows = tm["is_home"]
+        (stadium, home), g = _group(tm["stadium_id"][home_rows], tm["team_id"][home_rows])
+        result = tm["result"][home_rows]
+        self.stadium_stats = {
+            "stadium_id": stadium,
+            "home_team_id": home,
+            "matches": _count(g, len(stadium)),
+            "home_goals": _count(g, len(stadium), tm["goals_for"][home_rows]),
+            "away_goals": _count(g, len(stadium), tm["goals_against"][home_rows]),
+            "home_wins": _count(g, len(stadium), result == "W"),
+            "away_wins": _count(g, len(stadium), result == "L"),
+            "draws": _count(g, len(stadium), result == "D"),
+        }
+
+    # Lookups shared by the reports
+
+    def _team_column(self, column, team_ids):
+        return self.tables["teams_owner_managed_located"][column][self.team_pos[team_ids]]
+
+    def _scorers(self):
+        """Positions of the players with a player_season_stats row, and their team names."""
+        players = self.tables["players_plays_in_plays_for"]
+        p = np.flatnonzero(self.player_stats["goals"] > 0)
+        return p, self._team_column("name", players["T_id"][p])
+
+    def _standings(self, column):
+        standings = self.tables["standings_pertain_to"]
+        return self._team_column("name", standings["T_id"]), standings[column]
+
+    def run(self, name, **params):
+        df = REPORTS[name](self, **params)
+        if params.get("season", self.season) != self.season:
+            # Only one season is loaded; any other has no rows
+            return df.iloc[:0]
+        return df
+
+
+REPORTS = {}
+
+
+def report(fn):
+    REPORTS[fn.__name__] = fn
+    return fn
+
+
+# Home
+
+@report
+def seasons(e):
+    return _frame({"season": [e.season], "label": [f"{e.season}-{(e.season + 1) % 100:02d}"]})
+
+
+@report
+def table_names(e):
+    return _frame({"relname": list(e.tables)})
+
+
+@report
+def table_columns(e, table):
+    return _frame({"column_name": list(e.tables[table])})
+
+
+@report
+def table_primary_key(e, table):
+    # Tables are browsed by row position
+    return _frame({"column_name": []})
+
+
+@report
+def table_estimated_rows(e, table):
+    return _frame({"estimate": [len(next(iter(e.tables[table].values())))]})
+
+
+# Teams
+
+@report
+def goals_scored_by_teams(e, season):
+    team, gf = e._standings("gf")
+    return _frame({"team": team, "goals_scored": gf}, "goals_scored")
+
+
+@report
+def goals_conceded_by_teams(e, season):
+    team, ga = e._standings("ga")
+    return _frame({"team": team, "goals_conceded": ga}, "goals_conceded")
+
+
+@report
+def teams_with_fewest_losses(e, season):
+    team, losses = e._standings("losses")
+    return _frame({"team": team, "losses": losses}, "losses", ascending=True)
+
+
+@report
+def season_cities(e, season):
+    standings = e.tables["standings_pertain_to"]
+    return _frame({"city": np.unique(e._team_column("city", standings["T_id"]))})
+
+
+@report
+def top_scoring_teams_in_city(e, season, city):
+    standings = e.tables["standings_pertain_to"]
+    keep = e._team_column("city", standings["T_id"]) == city
+    team, gf = e._standings("gf")
+    return _frame({"team": team[keep], "goals_scored": gf[keep]}, "goals_scored")
+
+
+@report
+def derby_goals(e, season):
+    tm = e.tables["team_match"]
+    home = tm["is_home"]
+    goals = (tm["goals_for"] + tm["goals_against"])[home]
+    derby = e._team_column("city", tm["team_id"][home]) == e._team_column("city", tm["opponent_id"][home])
+    return _frame({
+        "total_derby_goals": [goals[derby].sum()],
+        "derby_goals_per_match": [_round(goals[derby].mean(), 2)],
+        "total_non_derby_goals": [goals[~derby].sum()],
+        "non_derby_goals_per_match": [_round(goals[~derby].mean(), 2)],
+    })
+
+
+@report
+def team_penalties(e, season):
+    s = e.team_stats
+    t = np.flatnonzero((s["matches"] > 0) & (s["player_goals"] > 0))
+    teams = e.tables["teams_owner_managed_located"]
+    return _frame({
+        "team": teams["name"][t],
+        "num_penalties": s["player_penalties"][t],
+        "totalgoals": s["player_goals"][t].astype(float),
+        "percentage_penalties": _percent(s["player_penalties"][t], s["player_goals"][t]),
+    }, "percentage_penalties")
+
+
+@report
+def clean_sheets(e, season):
+    s = e.team_stats
+    t = np.flatnonzero(s["matches"] > 0)
+    teams = e.tables["teams_owner_managed_located"]
+    return _frame({
+        "team": teams["name"][t],
+        "cleansheets": s["clean_sheets"][t],
+        "totalmatches": s["matches"][t],
+        "cleansheetpercentage": _percent(s["clean_sheets"][t], s["matches"][t]),
+    }, "cleansheets")
+
+
+@report
+def season_matches(e, season):
+    matches = e.tables["matches_held_at"]
+    order = np.lexsort((matches["id"], matches["match_date"]))
+    return _frame({
+        "id": matches["id"][order],
+        "match_date": pd.to_datetime(matches["match_date"][order]).date,
+        "home_team": e._team_column("name", matches["team1_id"][order]),
+        "away_team": e._team_column("name", matches["team2_id"][order]),
+        "h_score": matches["h_score"][order],
+        "a_score": matches["a_score"][order],
+    })
+
+
+@report
+def final_standings(e, season):
+    standings = e.tables["standings_pertain_to"]
+    return _frame({
+        "team": e._team_column("name", standings["T_id"]),
+        **{c: standings[c] for c in ["pld", "wins", "draws", "losses", "gf", "ga", "points"]},
+    }, "points")
+
+
+# Players
+
+@report
+def head_to_head_matches(e):
+    matches = e.tables["matches_held_at"]
+    order = np.lexsort((matches["id"], matches["season"], matches["match_date"]))
+    return _frame({
+        "season": matches["season"][order],
+        "id": matches["id"][order],
+        "match_date": pd.to_datetime(matches["match_date"][order]).date,
+        "home_id": matches["team1_id"][order],
+        "home_team": e._team_column("name", matches["team1_id"][order]),
+        "away_id": matches["team2_id"][order],
+        "away_team": e._team_column("name", matches["team2_id"][order]),
+        "h_score": matches["h_score"][order],
+        "a_score": matches["a_score"][order],
+        "stadium": e.tables["stadiums"]["name"][e.stadium_pos[matches["stadium_id"][order]]],
+    })
+
+
+@report
+def season_goals(e, season):
+    players = e.tables["players_plays_in_plays_for"]
+    matches = e.tables["matches_held_at"]
+    goals = e.tables["goals_scored"]
+    m = e.match_pos[goals["match_id"]]
+    team = players["T_id"][e.player_pos[goals["player_id"]]]
+    # Goals by players whose team isn't in the match have no Team_Match row
+    g = np.flatnonzero((team == matches["team1_id"][m]) | (team == matches["team2_id"][m]))
+    g = g[np.lexsort((goals["id"][g], goals["goal_time"][g], goals["match_id"][g]))]
+    m, team = m[g], team[g]
+    return _frame({
+        "match_id": goals["match_id"][g],
+        "player_id": goals["player_id"][g],
+        "player": players["name"][e.player_pos[goals["player_id"][g]]],
+        "team": e._team_column("name", team),
+        "opponent": e._team_column("name", np.where(team == matches["team1_id"][m],
+                                                    matches["team2_id"][m], matches["team1_id"][m])),
+        **{c: goals[c][g] for c in ["goal_time", "pen", "own_goal", "winner", "equalizer"]},
+    })
+
+
+@report
+def season_team_names(e, season):
+    t = np.flatnonzero(e.team_stats["matches"] > 0)
+    return _frame({"name": np.sort(e.tables["teams_owner_managed_located"]["name"][t])})
+
+
+def _scorer_frame(e, p, team, columns, by, ascending=False, limit=None):
+    players = e.tables["players_plays_in_plays_for"]
+    return _frame({"player": players["name"][p], "team": team, **columns}, by, ascending, limit)
+
+
+@report
+def top_goal_scorers(e, season, teams):
+    p, team = e._scorers()
+    keep = np.isin(team, list(teams))
+    return _scorer_frame(e, p[keep], team[keep], {"goals": e.player_stats["goals"][p[keep]]}, "goals")
+
+
+@report
+def hattricks(e, season):
+    p, team = e._scorers()
+    keep = e.player_stats["hattricks"][p] > 0
+    return _scorer_frame(e, p[keep], team[keep], {"hattricks": e.player_stats["hattricks"][p[keep]]},
+                         "hattricks")
+
+
+@report
+def position_names(e, position):
+    positions = e.tables["positions"]
+    return _frame({"pos": positions["pos"][positions["pos_type"] == position]})
+
+
+@report
+def scorers_by_position_and_nationality(e, season, position, positions):
+    players = e.tables["players_plays_in_plays_for"]
+    table = e.tables["positions"]
+    p, _ = e._scorers()
+    types = dict(zip(table["pos"], table["pos_type"]))
+    pos = players["pos"][p]
+    keep = np.isin(pos, list(positions)) & (np.array([types.get(x) for x in pos]) == position)
+    p = p[keep]
+    (country,), g = _group(players["nationality"][p])
+    return _frame({
+        "country": country,
+        "goalscoringplayers": _count(g, len(country)),
+        "totalgoalsscoredbyposition": _count(g, len(country), e.player_stats["goals"][p]),
+    }, "totalgoalsscoredbyposition")
+
+
+def _share_of_goals(e, column, count_name, percent_name):
+    p, team = e._scorers()
+    keep = e.player_stats["goals"][p] > 1
+    p, team = p[keep], team[keep]
+    part, goals = e.player_stats[column][p], e.player_stats["goals"][p]
+    return _scorer_frame(e, p, team, {
+        count_name: part,
+        "totalgoals": goals.astype(float),
+        percent_name: _percent(part, goals),
+    }, count_name, limit=20)
+
+
+@report
+def most_winners(e, season):
+    return _share_of_goals(e, "winners", "cntwinners", "winnerpercentage")
+
+
+@report
+def most_equalizers(e, season):
+    return _share_of_goals(e, "equalizers", "cntequalizers", "equalizerpercentage")
+
+
+def _scorers_by_age(e, keep_age):
+    players = e.tables["players_plays_in_plays_for"]
+    p, team = e._scorers()
+    keep = keep_age(players["age"][p])
+    p, team = p[keep], team[keep]
+    return _scorer_frame(e, p, team, {
+        "age": players["age"][p],
+        "totalgoals": e.player_stats["goals"][p].astype(float),
+    }, ["totalgoals", "age"])
+
+
+@report
+def scorers_above_age(e, season, age):
+    return _scorers_by_age(e, lambda ages: ages >= age)
+
+
+@report
+def scorers_below_age(e, season, age):
+    return _scorers_by_age(e, lambda ages: ages <= age)
+
+
+@report
+def captain_goals(e, season):
+    p, team = e._scorers()
+    keep = e.tables["players_plays_in_plays_for"]["captain"][p]
+    return _scorer_frame(e, p[keep], team[keep], {"goals": e.player_stats["goals"][p[keep]]}, "goals")
+
+
+@report
+def career_top_scorers(e):
+    p, team = e._scorers()
+    return _scorer_frame(e, p, team, {
+        "seasons": np.ones(len(p), dtype=np.int64),
+        "goals": e.player_stats["goals"][p],
+    }, "goals", limit=50)
+
+
+# Search and player profiles
+
+@report
+def search_names(e):
+    players = e.tables["players_plays_in_plays_for"]
+    teams = e.tables["teams_owner_managed_located"]
+    referees = e.tables["referees"]
+    df = pd.concat([
+        _frame({"kind": "player", "id": players["id"], "name": players["name"],
+                "detail": e._team_column("name", players["T_id"])}),
+        _frame({"kind": "team", "id": teams["id"], "name": teams["name"], "detail": teams["city"]}),
+        _frame({"kind": "referee", "id": referees["id"], "name": referees["name"],
+                "detail": referees["nationality"]}),
+    ])
+    return df.sort_values(["kind", "id"], kind="stable", ignore_index=True)
+
+
+def _player_rows(e, player):
+    """Row position of the player with id ``player``, as an array of zero or one."""
+    if 0 <= player < len(e.player_pos) and e.player_pos[player] >= 0:
+        return e.player_pos[[player]]
+    return np.array([], dtype=np.int64)
+
+
+@report
+def player_profile(e, player):
+    players = e.tables["players_plays_in_plays_for"]
+    positions = e.tables["positions"]
+    pos_type = dict(zip(positions["pos"], positions["pos_type"]))
+    p = _player_rows(e, player)
+    return _frame({
+        "name": players["name"][p],
+        "team": e._team_column("name", players["T_id"][p]),
+        "position": players["pos"][p],
+        "pos_type": [pos_type[pos] for pos in players["pos"][p]],
+        "jersey_number": players["jersey_number"][p],
+        "age": players["age"][p],
+        "nationality": players["nationality"][p],
+        "foot": [foot.strip() for foot in players["foot"][p]],
+        **{c: players[c][p] for c in ["captain", "appearances", "substitutions", "goals", "penalties",
+                                      "yellow_cards", "red_cards"]},
+    })
+
+
+@report
+def player_seasons(e, player):
+    p = _player_rows(e, player)
+    # player_season_stats only has rows for players who scored
+    p = p[e.player_stats["goals"][p] > 0]
+    return _frame({"season": np.full(len(p), e.season),
+                   **{c: e.player_stats[c][p] for c in ["goals", "penalties", "winners", "equalizers",
+                                                        "own_goals", "hattricks"]}})
+
+
+@report
+def player_goals(e, player):
+    players = e.tables["players_plays_in_plays_for"]
+    matches = e.tables["matches_held_at"]
+    goals = e.tables["goals_scored"]
+    g = np.flatnonzero(goals["player_id"] == player)
+    m = e.match_pos[goals["match_id"][g]]
+    team = players["T_id"][_player_rows(e, player)]
+    home = matches["team1_id"][m] == (team[0] if len(team) else -1)
+    order = np.lexsort((goals["goal_time"][g], matches["match_date"][m]))
+    g, m, home = g[order], m[order], home[order]
+    return _frame({
+        "season": goals["season"][g],
+        "match_date": pd.to_datetime(matches["match_date"][m]).date,
+        "opponent": e._team_column("name", np.where(home, matches["team2_id"][m], matches["team1_id"][m])),
+        "home": home,
+        **{c: goals[c][g] for c in ["goal_time", "pen", "own_goal", "winner", "equalizer"]},
+    })
+
+
+# Managers
+
+@report
+def manager_wins_by_nationality(e, season):
+    standings = e.tables["standings_pertain_to"]
+    managers = e.tables["managers"]
+    team = e._team_column("name", standings["T_id"])
+    m = e.manager_pos[e._team_column("manager_id", standings["T_id"])]
+    wins = standings["wins"]
+    percent = _percent(wins, wins + standings["losses"] + standings["draws"])
+    names = managers["name"][m]
+    (nationality,), g = _group(managers["nationality"][m])
+    order = np.argsort(names, kind="stable")
+    labels = [[] for _ in nationality]
+    for i in order:
+        labels[g[i]].append(f"{names[i]} ({team[i]})")
+    return _frame({
+        "manager_nationality": nationality,
+        "managers": [", ".join(x) for x in labels],
+        "total_wins": _count(g, len(nationality), wins),
+        "average_win_percentage": np.bincount(g, percent) / np.bincount(g),
+    }, "average_win_percentage")
+
+
+@report
+def manager_compatriots(e):
+    managers = e.tables["managers"]
+    teams = e.tables["teams_owner_managed_located"]
+    players = e.tables["players_plays_in_plays_for"]
+    # One row per team, for the manager who manages it
+    m = e.manager_pos[teams["manager_id"]]
+    t = e.team_pos[players["T_id"]]
+    compatriots = _count(t, len(m), players["nationality"] == managers["nationality"][m[t]])
+    return _frame({
+        "id": managers["id"][m],
+        "manager_name": managers["name"][m],
+        "team": teams["name"],
+        "nationality": managers["nationality"][m],
+        "cnt_compatriot_players": compatriots,
+        "compatriot_player_percentage": _percent(compatriots, _count(t, len(m))),
+    }, "compatriot_player_percentage")
+
+
+@report
+def manager_home_away_wins(e, season):
+    managers = e.tables["managers"]
+    teams = e.tables["teams_owner_managed_located"]
+    s = e.team_stats
+    t = np.flatnonzero(s["matches"] > 0)
+    m = e.manager_pos[teams["manager_id"][t]]
+    return _frame({
+        "id": managers["id"][m],
+        "manager_name": managers["name"][m],
+        "team": teams["name"][t],
+        "homewins": s["home_wins"][t],
+        "awaywins": s["away_wins"][t],
+    }, ["homewins", "awaywins"])
+
+
+# Stadiums
+
+def _stadium_frame(e, columns, by):
+    s = e.stadium_stats
+    stadiums = e.tables["stadiums"]
+    return _frame({
+        "stadium_name": stadiums["name"][e.stadium_pos[s["stadium_id"]]],
+        "team": e._team_column("name", s["home_team_id"]),
+        **columns,
+    }, by)
+
+
+@report
+def stadium_goals(e, season):
+    s = e.stadium_stats
+    return _stadium_frame(e, {
+        "home_goals": s["home_goals"],
+        "away_goals": s["away_goals"],
+        "total_goals_scored": s["home_goals"] + s["away_goals"],
+    }, "total_goals_scored")
+
+
+@report
+def stadium_home_wins(e, season):
+    s = e.stadium_stats
+    return _stadium_frame(e, {
+        "homewinpercentage": _percent(s["home_wins"], s["matches"]),
+        "homelosspercentage": _percent(s["away_wins"], s["matches"]),
+        "homedrawpercentage": _percent(s["draws"], s["matches"]),
+    }, "homewinpercentage")
+
+
+@report
+def stadium_away_wins(e, season):
+    s = e.stadium_stats
+    return _stadium_frame(e, {
+        "awaywinpercentage": _percent(s["away_wins"], s["matches"]),
+        "awaylosspercentage": _percent(s["home_wins"], s["matches"]),
+        "awaydrawpercentage": _percent(s["draws"], s["matches"]),
+    }, "awaywinpercentage")
+
+
+# Referees
+
+def _per_referee(e, column):
+    s = e.referee_stats
+    (referee,), g = _group(s["referee_id"])
+    return referee, _count(g, len(referee), s[column])
+
+
+@report
+def referee_home_wins(e, season):
+    referees = e.tables["referees"]
+    referee, matches = _per_referee(e, "matches")
+    r = e.referee_pos[referee]
+    return _frame({
+        "referee_name": referees["name"][r],
+        "nationality": referees["nationality"][r],
+        "nummatches": matches,
+        "homewinpercentage": _percent(_per_referee(e, "home_wins")[1], matches),
+        "homelosspercentage": _percent(_per_referee(e, "home_losses")[1], matches),
+        "homedrawpercentage": _percent(_per_referee(e, "home_draws")[1], matches),
+    }, "homewinpercentage")
+
+
+@report
+def referee_penalties(e, season):
+    referees = e.tables["referees"]
+    referee, matches = _per_referee(e, "matches")
+    penalties = _per_referee(e, "penalties")[1]
+    return _frame({
+        "referee_name": referees["name"][e.referee_pos[referee]],
+        "nummatches": matches,
+        "numpenalties": penalties,
+        "numpenaltiespercentage": _percent(penalties, matches),
+    }, "numpenaltiespercentage")
+
+
+@report
+def season_referee_names(e, season):
+    referees = e.tables["referees"]
+    return _frame({"name": np.unique(referees["name"][e.referee_pos[e.referee_stats["referee_id"]]])})
+
+
+@report
+def referee_home_teams(e, season, referee):
+    s = e.referee_stats
+    referees = e.tables["referees"]
+    keep = referees["name"][e.referee_pos[s["referee_id"]]] == referee
+    return _frame({
+        "hometeam": e._team_column("name", s["home_team_id"][keep]),
+        "cntmatch": s["matches"][keep],
+        "homewins": s["home_wins"][keep],
+        "homelosses": s["home_losses"][keep],
+        "homedraws": s["home_draws"][keep],
+    }, "cntmatch")
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                config = db.get_config(section="app", optional=True)
+                _engine = Engine(config.get("data_dir", EMBEDDED_OPTIONS["data_dir"]),
+                                 int(config.get("season", EMBEDDED_OPTIONS["season"])))
+    return _engine
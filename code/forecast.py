@@ -0,0 +1,286 @@
+"""Season forecasts by Monte Carlo simulation of the remaining fixtures.
+
+    python code/forecast.py --season 2021 --as-of 2022-01-01 [--simulations 20000] [--workers N]
+    python code/forecast.py --season 2021 --as-of 2022-01-01 --bench
+
+Each team's attack and defence strengths are fitted to the goals scored and
+conceded in the matches played so far: the home side of a match scores a
+Poisson number of goals with mean home_rate * attack[home] * defence[away],
+and the away side likewise with away_rate. The fixtures of the double
+round-robin that haven't been played are then sampled for many seasons at
+once as NumPy arrays, added to the current table and ranked, giving each
+team's chances of the title, the top four and relegation. The simulations
+run in fixed-size chunks across a process pool, each chunk with its own
+seed spawned from --seed, so the result depends on the seed but not on the
+number of workers. --bench reports simulations per second per worker.
+"""
+import argparse
+import datetime
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import cache
+import db
+from queries import QUERIES, run_query
+
+# Defaults for the [forecast] section of database.ini; workers=0 uses every core
+FORECAST_OPTIONS = {
+    "simulations": 20000,
+    "workers": 0,
+}
+
+# Simulations per task. Seeds are spawned per chunk, so changing the number of
+# workers doesn't change the result.
+CHUNK = 2000
+
+# Sampled scores per batch within a chunk
+BATCH_GOALS = 1_000_000
+
+# Goals per match at strength 1, until a match has been played
+DEFAULT_HOME_RATE = 1.5
+DEFAULT_AWAY_RATE = 1.2
+
+# Each strength starts from this many goals' worth of an average team, so a
+# few early results don't make a team look unbeatable
+PRIOR_GOALS = 2.0
+
+TOP = 4
+RELEGATED = 3
+
+log = logging.getLogger(__name__)
+
+
+def fit_strengths(home, away, h_score, a_score, n_teams, iterations=50):
+    """Attack and defence per team and the home and away rates, fitted to played matches.
+
+    ``home`` and ``away`` are team positions and ``h_score`` and
+    ``a_score`` the goals of each played match. The strengths are scaled so
+    the mean attack and the mean defence are 1.
+    """
+    attack = np.ones(n_teams)
+    defence = np.ones(n_teams)
+    if len(home) == 0:
+        return attack, defence, DEFAULT_HOME_RATE, DEFAULT_AWAY_RATE
+    h_score = np.asarray(h_score, dtype=np.float64)
+    a_score = np.asarray(a_score, dtype=np.float64)
+    scored = np.bincount(home, h_score, n_teams) + np.bincount(away, a_score, n_teams)
+    conceded = np.bincount(home, a_score, n_teams) + np.bincount(away, h_score, n_teams)
+    home_rate, away_rate = h_score.mean(), a_score.mean()
+    for _ in range(iterations):
+        # Goals each team would have scored (conceded) at attack (defence) 1
+        expected = (np.bincount(home, home_rate * defence[away], n_teams) +
+                    np.bincount(away, away_rate * defence[home], n_teams))
+        attack = (scored + PRIOR_GOALS) / (expected + PRIOR_GOALS)
+        attack /= attack.mean()
+        expected = (np.bincount(home, away_rate * attack[away], n_teams) +
+                    np.bincount(away, home_rate * attack[home], n_teams))
+        defence = (conceded + PRIOR_GOALS) / (expected + PRIOR_GOALS)
+        defence /= defence.mean()
+        home_rate = h_score.sum() / (attack[home] * defence[away]).sum()
+        away_rate = a_score.sum() / (attack[away] * defence[home]).sum()
+    return attack, defence, home_rate, away_rate
+
+
+def remaining_fixtures(n_teams, home, away):
+    """Home and away positions of the double round-robin's fixtures not in ``home``, ``away``."""
+    played = np.zeros((n_teams, n_teams), dtype=bool)
+    played[home, away] = True
+    np.fill_diagonal(played, True)
+    return np.nonzero(~played)
+
+
+def simulate(lam_home, lam_away, home, away, base, simulations, seed):
+    """Sample ``simulations`` seasons of the remaining fixtures.
+
+    ``base`` holds every team's current points, goal difference and goals
+    scored as rows. Returns the number of times each team finished in each
+    position (teams x positions) and the sum of each team's final points.
+    """
+    rng = np.random.default_rng(seed)
+    n_teams = base.shape[1]
+    # One-hot fixture -> team matrices, so a season's totals are a matrix product
+    at_home = np.zeros((len(home), n_teams))
+    at_home[np.arange(len(home)), home] = 1
+    away_side = np.zeros((len(away), n_teams))
+    away_side[np.arange(len(away)), away] = 1
+
+    counts = np.zeros((n_teams, n_teams), dtype=np.int64)
+    total_points = np.zeros(n_teams)
+    # Bounds the sampled goals held at once in big leagues
+    batch = max(1, BATCH_GOALS // max(len(home), 1))
+    for done in range(0, simulations, batch):
+        size = min(batch, simulations - done)
+        h = rng.poisson(lam_home, size=(size, len(home))).astype(np.float64)
+        a = rng.poisson(lam_away, size=(size, len(away))).astype(np.float64)
+        draw = h == a
+        points = base[0] + (3 * (h > a) + draw) @ at_home + (3 * (a > h) + draw) @ away_side
+        gd = base[1] + (h - a) @ at_home + (a - h) @ away_side
+        gf = base[2] + h @ at_home + a @ away_side
+
+        # Ranked on points, goal difference, goals scored, then name as in standings.py
+        key = ((points * 4000 + gd + 2000) * 4000 + gf) * n_teams + (n_teams - 1 - np.arange(n_teams))
+        order = np.argsort(-key, axis=1)
+        for p in range(n_teams):
+            counts[:, p] += np.bincount(order[:, p], minlength=n_teams)
+        total_points += points.sum(axis=0)
+    return counts, total_points
+
+
+def _chunks(simulations, seed):
+    sizes = [CHUNK] * (simulations // CHUNK) + ([simulations % CHUNK] if simulations % CHUNK else [])
+    return list(zip(sizes, np.random.SeedSequence(seed).spawn(len(sizes))))
+
+
+_executor = None
+_executor_workers = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(workers):
+    """A process pool of ``workers``, kept between forecasts so each doesn't pay for spawning."""
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            # spawn, so no worker inherits the pool's connections
+            _executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+            _executor_workers = workers
+        return _executor
+
+
+def run_simulations(lam_home, lam_away, home, away, base, simulations, seed=0, workers=None):
+    """simulate() over ``simulations`` seasons in chunks, on a process pool unless ``workers`` is 1."""
+    chunks = _chunks(simulations, seed)
+    args = (lam_home, lam_away, home, away, base)
+    if workers == 1 or len(chunks) == 1:
+        results = [simulate(*args, size, chunk_seed) for size, chunk_seed in chunks]
+    else:
+        executor = _get_executor(workers or os.cpu_count())
+        results = list(executor.map(simulate, *zip(*[(*args, size, chunk_seed) for size, chunk_seed in chunks])))
+    return sum(r[0] for r in results), sum(r[1] for r in results)
+
+
+def forecast(matches, teams, as_of=None, simulations=None, seed=0, workers=None):
+    """Title, top-four and relegation chances of ``teams`` from the matches played by ``as_of``.
+
+    ``matches`` is a frame like the season_matches query's. Without
+    ``as_of`` every match in it counts as played.
+    """
+    start = time.perf_counter()
+    simulations = simulations or get_options()["simulations"]
+    teams = sorted(teams)
+    index = {team: i for i, team in enumerate(teams)}
+    if as_of is not None:
+        matches = matches[pd.to_datetime(matches["match_date"]).dt.date <= as_of]
+    home = np.array([index[t] for t in matches["home_team"]], dtype=np.int64)
+    away = np.array([index[t] for t in matches["away_team"]], dtype=np.int64)
+    h = matches["h_score"].to_numpy(dtype=np.int64)
+    a = matches["a_score"].to_numpy(dtype=np.int64)
+
+    n = len(teams)
+    base = np.zeros((3, n))
+    for team, gf, ga in ((home, h, a), (away, a, h)):
+        base[0] += np.bincount(team, 3 * (gf > ga) + (gf == ga), n)
+        base[1] += np.bincount(team, gf - ga, n)
+        base[2] += np.bincount(team, gf, n)
+    played = np.bincount(home, minlength=n) + np.bincount(away, minlength=n)
+
+    attack, defence, home_rate, away_rate = fit_strengths(home, away, h, a, n)
+    fixture_home, fixture_away = remaining_fixtures(n, home, away)
+    lam_home = home_rate * attack[fixture_home] * defence[fixture_away]
+    lam_away = away_rate * attack[fixture_away] * defence[fixture_home]
+    counts, points = run_simulations(lam_home, lam_away, fixture_home, fixture_away, base,
+                                     simulations, seed, workers)
+
+    df = pd.DataFrame({
+        "team": teams,
+        "played": played,
+        "points": base[0].astype(np.int64),
+        "attack": attack,
+        "defence": defence,
+        "expected_points": points / simulations,
+        "expected_position": counts @ np.arange(1, n + 1) / simulations,
+        "title": 100 * counts[:, 0] / simulations,
+        "top_4": 100 * counts[:, :TOP].sum(axis=1) / simulations,
+        "relegation": 100 * counts[:, n - RELEGATED:].sum(axis=1) / simulations,
+    }).sort_values(["expected_points", "team"], ascending=[False, True], ignore_index=True)
+    df.attrs.update(simulations=simulations, remaining=len(fixture_home), seconds=time.perf_counter() - start)
+    return df
+
+
+def get_options():
+    config = db.get_config(section="forecast", optional=True)
+    return {k: int(config.get(k, default)) for k, default in FORECAST_OPTIONS.items()}
+
+
+def get_forecast(season, as_of=None, simulations=None, seed=0):
+    """forecast() of ``season`` through the result cache, recomputed when the season's matches change."""
+    options = get_options()
+    simulations = simulations or options["simulations"]
+    tables = QUERIES["season_matches"].tables | QUERIES["final_standings"].tables
+
+    def compute():
+        matches = run_query("season_matches", season=season)
+        teams = set(run_query("final_standings", season=season)["team"])
+        teams |= set(matches["home_team"]) | set(matches["away_team"])
+        return forecast(matches, teams, as_of, simulations, seed, options["workers"] or None)
+
+    key = ("season_forecast", cache.freeze([season, None if as_of is None else as_of.isoformat(), simulations, seed]))
+    return cache.get_cache().get_or_compute(key, compute, (tables, season))
+
+
+def bench(season, as_of, simulations, seed, max_workers):
+    """Simulations per second with 1, 2, 4, ... workers, and per worker."""
+    matches = run_query("season_matches", season=season)
+    teams = set(matches["home_team"]) | set(matches["away_team"])
+    rows = []
+    workers = 1
+    while True:
+        forecast(matches, teams, as_of, CHUNK * workers, seed, workers)  # start the pool's processes
+        df = forecast(matches, teams, as_of, simulations, seed, workers)
+        rate = simulations / df.attrs["seconds"]
+        rows.append({"workers": workers, "seconds": df.attrs["seconds"], "simulations_per_second": rate,
+                     "per_worker": rate / workers})
+        if workers >= max_workers:
+            break
+        workers = min(2 * workers, max_workers)
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--season", type=int, required=True)
+    parser.add_argument("--as-of", type=datetime.date.fromisoformat,
+                        help="count only the matches played by this date (default: all of them)")
+    parser.add_argument("--simulations", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--bench", action="store_true", help="time the simulation with 1, 2, 4, ... workers")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    simulations = args.simulations or get_options()["simulations"]
+    pd.set_option("display.width", 200)
+    if args.bench:
+        print(bench(args.season, args.as_of, simulations, args.seed, args.workers or os.cpu_count())
+              .to_string(index=False, float_format="{:.2f}".format))
+        return
+    matches = run_query("season_matches", season=args.season)
+    teams = set(run_query("final_standings", season=args.season)["team"])
+    teams |= set(matches["home_team"]) | set(matches["away_team"])
+    df = forecast(matches, teams, args.as_of, simulations, args.seed, args.workers)
+    print(df.to_string(index=False, float_format="{:.2f}".format))
+    log.info("%d simulations of %d remaining fixtures in %.2fs", df.attrs["simulations"],
+             df.attrs["remaining"], df.attrs["seconds"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Goal counts in any window of minutes, per team, player and match.
+
+Goals_Scored records the minute of every goal. GoalTiming loads a season's
+goals once into integer arrays and keeps, for each team scoring, team
+conceding, player and match, a cumulative count of its goals up to every
+minute, split by kind (all goals, penalties, own goals, winners and
+equalizers). The count in any window is then the difference of two
+columns, whatever the window's width. Stoppage time is recorded as the
+last minute of the half, so a window ending at MAX_MINUTE includes it.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from queries import run_query
+
+MAX_MINUTE = 90
+
+KINDS = ["goals", "pen", "own_goal", "winner", "equalizer"]
+
+# The usual quarter-hour breakdown, label -> (first, last) minute
+WINDOWS = {
+    "0-15": (0, 15),
+    "16-30": (16, 30),
+    "31-45+": (31, 45),
+    "46-60": (46, 60),
+    "61-75": (61, 75),
+    "76-90+": (76, MAX_MINUTE),
+}
+
+
+class GoalTiming:
+    """Cumulative per-minute goal counts of one season.
+
+    ``cumulative[by][k, K, m]`` holds the number of goals of kind
+    ``KINDS[K]`` for key ``k`` scored before minute ``m``, where ``by`` is
+    "team" (the scoring team), "conceded" (the conceding team), "player" or
+    "match". An own goal counts for the opponent of the player's team.
+    """
+
+    def __init__(self, goals, teams=None):
+        minutes = np.clip(goals["goal_time"].to_numpy(dtype=np.int64), 0, MAX_MINUTE)
+        own_goal = goals["own_goal"].to_numpy(dtype=bool)
+        scoring = np.where(own_goal, goals["opponent"], goals["team"])
+        conceding = np.where(own_goal, goals["team"], goals["opponent"])
+        if teams is None:
+            teams = set(goals["team"]) | set(goals["opponent"])
+        self.teams = np.asarray(sorted(teams), dtype=object)
+        team_index = {team: i for i, team in enumerate(self.teams)}
+
+        player_ids, player_pos, player_rows = np.unique(goals["player_id"].to_numpy(dtype=np.int64),
+                                                        return_index=True, return_inverse=True)
+        self.players = pd.DataFrame({"player": goals["player"].to_numpy()[player_pos],
+                                     "team": goals["team"].to_numpy()[player_pos]},
+                                    index=pd.Index(player_ids, name="player_id"))
+        self.matches, match_rows = np.unique(goals["match_id"].to_numpy(dtype=np.int64), return_inverse=True)
+
+        flags = np.column_stack([np.ones(len(goals), dtype=bool)] +
+                                [goals[kind].to_numpy(dtype=bool) for kind in KINDS[1:]])
+        self.cumulative = {
+            "team": _cumulative(np.array([team_index[t] for t in scoring], dtype=np.int64),
+                                len(self.teams), minutes, flags),
+            "conceded": _cumulative(np.array([team_index[t] for t in conceding], dtype=np.int64),
+                                    len(self.teams), minutes, flags),
+            "player": _cumulative(player_rows.ravel(), len(player_ids), minutes, flags),
+            "match": _cumulative(match_rows.ravel(), len(self.matches), minutes, flags),
+        }
+
+    def counts(self, by, first, last, kind="goals"):
+        """Goals of ``kind`` from minute ``first`` to ``last`` inclusive, per key of ``by``."""
+        first = min(max(first, 0), MAX_MINUTE + 1)
+        last = min(max(last, first - 1), MAX_MINUTE)
+        cumulative = self.cumulative[by][:, KINDS.index(kind)]
+        return cumulative[:, last + 1] - cumulative[:, first]
+
+    def windows(self, by, windows=None, kind="goals"):
+        """A frame of the keys of ``by`` with a column of counts per window (label -> (first, last))."""
+        if by == "player":
+            df = self.players.reset_index()
+        elif by == "match":
+            df = pd.DataFrame({"match_id": self.matches})
+        else:
+            df = pd.DataFrame({"team": self.teams})
+        for label, (first, last) in (WINDOWS if windows is None else windows).items():
+            df[label] = self.counts(by, first, last, kind)
+        return df
+
+
+def _cumulative(keys, n_keys, minutes, flags):
+    """(n_keys, len(KINDS), MAX_MINUTE + 2) running counts, with a leading zero column."""
+    width = MAX_MINUTE + 2
+    cells = keys * width + minutes + 1
+    counts = np.stack([np.bincount(cells, weights=flags[:, k], minlength=n_keys * width)
+                       for k in range(len(KINDS))], axis=1).astype(np.int64)
+    return np.cumsum(counts.reshape(n_keys, width, len(KINDS)).transpose(0, 2, 1), axis=2)
+
+
+_timings = {}
+_timings_lock = threading.Lock()
+
+
+def get_timing(season):
+    """The season's GoalTiming, rebuilt whenever the cached season_goals result changes."""
+    goals = run_query("season_goals", season=season)
+    with _timings_lock:
+        cached = _timings.get(season)
+        if cached is not None and cached[0] is goals:
+            return cached[1]
+    teams = run_query("season_team_names", season=season)["name"].tolist()
+    timing = GoalTiming(goals, set(teams) | set(goals["team"]) | set(goals["opponent"]))
+    with _timings_lock:
+        _timings[season] = (goals, timing)
+    return timing
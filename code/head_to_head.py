@@ -0,0 +1,191 @@
+"""Head-to-head records between every pair of teams, across all seasons.
+
+HeadToHead holds dense team x team arrays built from the whole match log:
+the row team's wins, draws and goals against the column team, and the date,
+score and stadium of their last meeting. Losses and goals conceded are the
+transposes, so the arrays hold a fixed handful of int32 cells per pair of
+teams however many seasons the log spans (about 2 MB for 300 clubs). A
+pair's record or a whole matrix is read off the arrays. When the match log
+changes, refresh() applies only the matches that were added, rescored or
+removed.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from queries import run_query
+
+STATS = ["played", "wins", "draws", "losses", "goals_for", "goals_against", "goal_difference", "points"]
+
+
+class HeadToHead:
+    """Records of the row team against the column team, indexed as ``teams``.
+
+    ``wins[i, j]``, ``draws[i, j]`` and ``goals[i, j]`` count team ``i``'s
+    results and goals against team ``j``. For their last meeting,
+    ``last_day[i, j]`` is its date in days since 1970 (-1 if they never
+    met), ``last_goals[i, j]`` team ``i``'s goals in it, ``last_home[i, j]``
+    whether ``i`` was at home and ``last_stadium[i, j]`` the position of its
+    stadium in ``stadiums``.
+    """
+
+    def __init__(self):
+        self.team_ids = np.zeros(0, dtype=np.int64)
+        self.teams = np.zeros(0, dtype=object)
+        self.stadiums = []
+        self._index = {}
+        self._by_name = {}
+        self._stadium_index = {}
+        self.wins = self._matrix(0)
+        self.draws = self._matrix(0)
+        self.goals = self._matrix(0)
+        self.last_day = self._matrix(-1)
+        self.last_goals = self._matrix(0)
+        self.last_stadium = self._matrix(-1)
+        self.last_home = np.zeros((0, 0), dtype=bool)
+        self.matches = None
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_matches(cls, matches):
+        """Build from a frame like the head_to_head_matches query's."""
+        head_to_head = cls()
+        head_to_head.refresh(matches)
+        return head_to_head
+
+    def _matrix(self, fill):
+        n = len(self.teams)
+        return np.full((n, n), fill, dtype=np.int32)
+
+    def _grow(self, matches):
+        """Add rows and columns for the teams and stadiums in ``matches`` not seen before."""
+        new = {}
+        for ids, names in (("home_id", "home_team"), ("away_id", "away_team")):
+            for team_id, name in zip(matches[ids].tolist(), matches[names].tolist()):
+                if team_id not in self._index:
+                    new.setdefault(team_id, name)
+        for stadium in matches["stadium"].tolist():
+            if stadium not in self._stadium_index:
+                self._stadium_index[stadium] = len(self.stadiums)
+                self.stadiums.append(stadium)
+        if not new:
+            return
+        for team_id, name in new.items():
+            self._index[team_id] = self._by_name[name] = len(self._index)
+        self.team_ids = np.append(self.team_ids, list(new))
+        self.teams = np.append(self.teams, np.array(list(new.values()), dtype=object))
+        pad = ((0, len(new)), (0, len(new)))
+        for name, fill in (("wins", 0), ("draws", 0), ("goals", 0), ("last_day", -1), ("last_goals", 0),
+                           ("last_stadium", -1), ("last_home", False)):
+            setattr(self, name, np.pad(getattr(self, name), pad, constant_values=fill))
+
+    def _positions(self, matches):
+        home = np.array([self._index[t] for t in matches["home_id"].tolist()], dtype=np.int64)
+        away = np.array([self._index[t] for t in matches["away_id"].tolist()], dtype=np.int64)
+        return home, away
+
+    def _apply(self, matches, sign):
+        home, away = self._positions(matches)
+        h = matches["h_score"].to_numpy(dtype=np.int32)
+        a = matches["a_score"].to_numpy(dtype=np.int32)
+        for team, opponent, gf, ga in ((home, away, h, a), (away, home, a, h)):
+            np.add.at(self.wins, (team, opponent), sign * (gf > ga))
+            np.add.at(self.draws, (team, opponent), sign * (gf == ga))
+            np.add.at(self.goals, (team, opponent), sign * gf)
+
+    def _set_last(self, pairs):
+        """Recompute the last meeting of each unordered pair in ``pairs`` from the match log."""
+        n = len(self.teams)
+        home, away = self._positions(self.matches)
+        keys = np.minimum(home, away) * n + np.maximum(home, away)
+        rows = np.flatnonzero(np.isin(keys, pairs))
+        # The log is in date order, so a pair's last meeting is its last row
+        _, last = np.unique(keys[rows][::-1], return_index=True)
+        rows = rows[len(rows) - 1 - last]
+
+        lo, hi = pairs // n, pairs % n
+        for name, fill in (("last_day", -1), ("last_goals", 0), ("last_stadium", -1), ("last_home", False)):
+            getattr(self, name)[lo, hi] = getattr(self, name)[hi, lo] = fill
+        home, away = home[rows], away[rows]
+        day = pd.to_datetime(self.matches["match_date"].to_numpy()[rows]).to_numpy().astype("datetime64[D]")
+        stadium = np.array([self._stadium_index[s] for s in self.matches["stadium"].to_numpy()[rows]],
+                           dtype=np.int32)
+        self.last_day[home, away] = self.last_day[away, home] = day.astype(np.int64)
+        self.last_stadium[home, away] = self.last_stadium[away, home] = stadium
+        self.last_goals[home, away] = self.matches["h_score"].to_numpy()[rows]
+        self.last_goals[away, home] = self.matches["a_score"].to_numpy()[rows]
+        self.last_home[home, away] = True
+        self.last_home[away, home] = False
+
+    def refresh(self, matches):
+        """Bring the arrays up to date with ``matches``, applying only the rows that changed."""
+        with self._lock:
+            if matches is self.matches:
+                return
+            columns = list(matches.columns)
+            old = self.matches if self.matches is not None else matches.iloc[:0]
+            # Rows identical in both logs cancel out, leaving the old and new versions of the rest
+            diff = pd.concat([old.assign(_sign=-1), matches.assign(_sign=1)], ignore_index=True)
+            diff = diff.drop_duplicates(subset=columns, keep=False)
+            self._grow(diff)
+            removed, added = diff[diff["_sign"] < 0], diff[diff["_sign"] > 0]
+            self._apply(removed, -1)
+            self._apply(added, 1)
+            self.matches = matches
+
+            home, away = self._positions(diff)
+            n = len(self.teams)
+            self._set_last(np.unique(np.minimum(home, away) * n + np.maximum(home, away)))
+
+    def _team(self, name):
+        try:
+            return self._by_name[name]
+        except KeyError:
+            raise KeyError(f"no matches of {name!r}") from None
+
+    def pair(self, team, opponent):
+        """``team``'s record against ``opponent`` and their last meeting, as a dict."""
+        with self._lock:
+            i, j = self._team(team), self._team(opponent)
+            wins, draws, losses = int(self.wins[i, j]), int(self.draws[i, j]), int(self.wins[j, i])
+            record = {"played": wins + draws + losses, "wins": wins, "draws": draws, "losses": losses,
+                      "goals_for": int(self.goals[i, j]), "goals_against": int(self.goals[j, i]),
+                      "last_date": None, "last_score": None, "last_home": None, "last_stadium": None}
+            if self.last_day[i, j] >= 0:
+                record.update(last_date=np.datetime64(int(self.last_day[i, j]), "D").item(),
+                              last_score=f"{self.last_goals[i, j]}-{self.last_goals[j, i]}",
+                              last_home=bool(self.last_home[i, j]),
+                              last_stadium=self.stadiums[self.last_stadium[i, j]])
+            return record
+
+    def matrix(self, stat, teams=None):
+        """``stat`` (one of STATS) of every row team against every column team, in name order.
+
+        ``teams`` restricts the matrix to some of the teams.
+        """
+        with self._lock:
+            names = sorted(self._by_name if teams is None else [t for t in teams if t in self._by_name])
+            idx = np.array([self._by_name[t] for t in names], dtype=np.int64)
+            sub = np.ix_(idx, idx)
+            wins, draws, goals = self.wins[sub], self.draws[sub], self.goals[sub]
+        values = {
+            "played": lambda: wins + draws + wins.T,
+            "wins": lambda: wins,
+            "draws": lambda: draws,
+            "losses": lambda: wins.T,
+            "goals_for": lambda: goals,
+            "goals_against": lambda: goals.T,
+            "goal_difference": lambda: goals - goals.T,
+            "points": lambda: 3 * wins + draws,
+        }[stat]()
+        return pd.DataFrame(values, index=pd.Index(names, name="team"), columns=names)
+
+
+_head_to_head = HeadToHead()
+
+
+def get_head_to_head():
+    """The HeadToHead, brought up to date whenever the cached head_to_head_matches result changes."""
+    _head_to_head.refresh(run_query("head_to_head_matches"))
+    return _head_to_head
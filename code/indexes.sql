@@ -0,0 +1,21 @@
+-- Secondary indexes for the foreign keys the reports join on. Built after the
+-- bulk load so COPY doesn't have to maintain them row by row.
+
+create index if not exists goals_scored_player_id_idx on Goals_Scored (player_id);
+create index if not exists goals_scored_match_id_idx on Goals_Scored (match_id);
+
+create index if not exists officiated_by_referee_id_idx on Officiated_by (referee_id);
+
+create index if not exists players_t_id_idx on Players_Plays_In_Plays_for (T_id);
+create index if not exists players_pos_idx on Players_Plays_In_Plays_for (pos);
+
+create index if not exists matches_team1_id_idx on Matches_Held_at (team1_id);
+create index if not exists matches_team2_id_idx on Matches_Held_at (team2_id);
+create index if not exists matches_stadium_id_idx on Matches_Held_at (stadium_id);
+
+create index if not exists teams_play_matches_team1_id_idx on Teams_Play_Matches (team1_id);
+create index if not exists teams_play_matches_team2_id_idx on Teams_Play_Matches (team2_id);
+
+create index if not exists team_match_team_id_idx on Team_Match (team_id);
+
+create index if not exists player_season_stats_player_id_idx on player_season_stats (player_id);
@@ -0,0 +1,492 @@
+"""Ingest live match and goal events into the database.
+
+    python code/ingest.py serve [--file events.jsonl | --listen host:port]
+    python code/ingest.py replay --season 2021 [--as-season 2099] [--rate 500]
+                                 [--out events.jsonl | --connect host:port]
+
+serve reads JSON events, one per line, from a file (stdin by default) or
+from any number of TCP connections, and writes them in batches: each batch
+is one transaction that upserts its matches and goals, refreshes the
+summary rows of just the teams, players, referees and stadiums they touch,
+and counts its changes against its season, so the app's cache only drops
+that season's reports on the tables that changed. A batch is written once
+it holds batch_size events or its oldest event has waited max_wait seconds.
+An event that breaks a constraint (say, a goal by an unknown player) fails
+its batch, which is then written again in halves until only the offending
+events are left out. They are rejected and appended to the dead_letter file
+if one is set.
+
+A match event carries a row of Matches_Held_at plus its referee_id, and is
+sent at kick-off and again with the final score:
+
+    {"type": "match", "season": 2021, "id": 1, "team1_id": 4, "team2_id": 8,
+     "h_score": 0, "a_score": 0, "match_date": "2021-08-13", "captain1_id": 75,
+     "captain2_id": 147, "stadium_id": 4, "referee_id": 1}
+
+A goal event carries a row of Goals_Scored and, optionally, the score after it:
+
+    {"type": "goal", "season": 2021, "id": 1, "match_id": 1, "player_id": 72,
+     "goal_time": 22, "pen": false, "winner": false, "equalizer": false,
+     "own_goal": false, "h_score": 1, "a_score": 0}
+
+Events may also carry sent_at (Unix time), from which the time to commit
+is measured. replay stands in for a live feed by sending a loaded season's
+matches as such events, a match day at a time in kick-off, goal and
+full-time order.
+"""
+import argparse
+import json
+import logging
+import queue
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import deque
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+import aggregates
+import db
+
+# Defaults for the optional [ingest] section of database.ini
+INGEST_OPTIONS = {
+    "batch_size": 500,
+    "max_wait": 0.25,
+    "latency_window": 10000,
+    "dead_letter": "",
+}
+
+# Errors an event's own values can cause, as opposed to a lost connection;
+# a batch failing with one is split to find the events to reject
+EVENT_ERRORS = (psycopg2.DataError, psycopg2.IntegrityError)
+
+MATCH_FIELDS = ["season", "id", "team1_id", "team2_id", "h_score", "a_score", "match_date",
+                "captain1_id", "captain2_id", "stadium_id"]
+GOAL_FIELDS = ["season", "id", "pen", "goal_time", "winner", "equalizer", "own_goal",
+               "player_id", "match_id"]
+REQUIRED = {"match": MATCH_FIELDS + ["referee_id"], "goal": GOAL_FIELDS}
+
+UPSERT_MATCHES = f"""
+    INSERT INTO Matches_Held_at ({", ".join(MATCH_FIELDS)}) VALUES %s
+    ON CONFLICT (season, id) DO UPDATE SET
+    {", ".join(f"{c} = EXCLUDED.{c}" for c in MATCH_FIELDS[2:])};"""
+
+# A re-sent match may name a different referee, which replaces the one on record
+DELETE_OFFICIALS = """
+    DELETE FROM Officiated_by
+    WHERE season = %(season)s AND match_id = ANY(%(matches)s::int[]);"""
+
+INSERT_OFFICIALS = """
+    INSERT INTO Officiated_by (season, match_id, referee_id) VALUES %s
+    ON CONFLICT DO NOTHING;"""
+
+INSERT_PAIRINGS = """
+    INSERT INTO Teams_Play_Matches (season, match_id, team1_id, team2_id) VALUES %s
+    ON CONFLICT DO NOTHING;"""
+
+# A season fed live may have no squads loaded; its scorers count for the team they play for now
+ADD_SQUAD_MEMBERS = """
+    INSERT INTO Player_Season_Team (season, player_id, team_id)
+    SELECT %(season)s, id, T_id FROM Players_Plays_In_Plays_for
+    WHERE id = ANY(%(players)s::int[])
+    ON CONFLICT DO NOTHING;"""
+
+UPSERT_GOALS = f"""
+    INSERT INTO Goals_Scored ({", ".join(GOAL_FIELDS)}) VALUES %s
+    ON CONFLICT (season, id) DO UPDATE SET
+    {", ".join(f"{c} = EXCLUDED.{c}" for c in GOAL_FIELDS[2:])};"""
+
+UPDATE_SCORES = """
+    UPDATE Matches_Held_at M SET h_score = V.h_score, a_score = V.a_score
+    FROM (VALUES %s) V(season, id, h_score, a_score)
+    WHERE M.season = V.season AND M.id = V.id;"""
+
+# Goals being corrected may have moved from another match
+GOAL_MATCHES = """
+    SELECT DISTINCT match_id FROM Goals_Scored
+    WHERE season = %(season)s AND id = ANY(%(goals)s::int[]);"""
+
+log = logging.getLogger(__name__)
+
+
+def parse_event(line):
+    """Decode one line of the feed, raising ValueError if it is not a valid event."""
+    event = json.loads(line)
+    if not isinstance(event, dict) or event.get("type") not in REQUIRED:
+        raise ValueError("event type must be one of " + ", ".join(REQUIRED))
+    missing = [f for f in REQUIRED[event["type"]] if f not in event]
+    if missing:
+        raise ValueError(f"{event['type']} event is missing {', '.join(missing)}")
+    return event
+
+
+class IngestStats:
+    """Running totals for a serve run: throughput and the time from send to commit."""
+
+    def __init__(self, window):
+        self.events = 0
+        self.rejected = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.write_seconds = 0.0
+        self.refresh_seconds = 0.0
+        self.first_received = None
+        self.last_commit = None
+        # Recent send-to-commit times of events that carried sent_at
+        self.lags = deque(maxlen=window)
+
+    def summary(self):
+        lags = sorted(self.lags)
+        elapsed = (self.last_commit - self.first_received) if self.last_commit else 0.0
+        return {
+            "events": self.events,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "events_per_second": self.events / elapsed if elapsed else 0.0,
+            "mean_batch": self.events / self.batches if self.batches else 0.0,
+            "write_seconds": self.write_seconds,
+            "refresh_seconds": self.refresh_seconds,
+            "lag_p50_ms": 1000 * lags[len(lags) // 2] if lags else None,
+            "lag_p95_ms": 1000 * lags[int(len(lags) * 0.95)] if lags else None,
+            "lag_max_ms": 1000 * lags[-1] if lags else None,
+        }
+
+
+class Ingester:
+    """Writes events taken from a queue in batches, one transaction per batch.
+
+    Sources put ``(line, received_at)`` on the queue, and None once they are
+    exhausted.
+    """
+
+    def __init__(self, conn, batch_size, max_wait, latency_window, dead_letter=None):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.dead_letter = dead_letter
+        self.stats = IngestStats(latency_window)
+        self._seasons = set()
+
+    def run(self, lines):
+        done = False
+        while not done:
+            batch = []
+            deadline = None
+            while len(batch) < self.batch_size:
+                timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+                try:
+                    item = lines.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    done = True
+                    break
+                line, received = item
+                if self.stats.first_received is None:
+                    self.stats.first_received = received
+                try:
+                    batch.append(parse_event(line))
+                except ValueError as e:
+                    self.stats.rejected += 1
+                    log.warning("rejected event %r: %s", line[:200], e)
+                    continue
+                if deadline is None:
+                    deadline = time.monotonic() + self.max_wait
+            if batch:
+                self.write(batch)
+        return self.stats.summary()
+
+    def write(self, events):
+        """Apply ``events`` and refresh the summary rows they affect, in one transaction.
+
+        If an event's values make the transaction fail, the two halves of
+        ``events`` are written separately, down to single events, which are
+        rejected.
+        """
+        try:
+            self._write(events)
+        except EVENT_ERRORS as e:
+            if len(events) == 1:
+                self._reject(events[0], e)
+                return
+            log.warning("batch of %d events failed (%s), writing it in halves", len(events),
+                        str(e).splitlines()[0])
+            middle = len(events) // 2
+            self.write(events[:middle])
+            self.write(events[middle:])
+        except Exception:
+            self.stats.failed_batches += 1
+            log.exception("batch of %d events failed and was dropped", len(events))
+
+    def _reject(self, event, error):
+        self.stats.rejected += 1
+        log.warning("rejected event %s: %s", json.dumps(event, default=str)[:200], str(error).splitlines()[0])
+        if self.dead_letter:
+            with open(self.dead_letter, "a") as f:
+                f.write(json.dumps(event, default=str) + "\n")
+
+    def _write(self, events):
+        start = time.perf_counter()
+        by_season = {}
+        for event in events:
+            by_season.setdefault(event["season"], []).append(event)
+        refresh_seconds = 0.0
+        try:
+            with self.conn.cursor() as cur:
+                for season, season_events in by_season.items():
+                    if season not in self._seasons:
+                        # Before the season is set: a new season changes every season's list
+                        cur.execute("SELECT create_season(%s);", (season,))
+                    db.set_change_season(cur, season)
+                    match_ids, keys = self._apply(cur, season, season_events)
+                    t = time.perf_counter()
+                    aggregates.refresh(cur, season, match_ids, keys)
+                    refresh_seconds += time.perf_counter() - t
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        self._seasons.update(by_season)
+
+        committed = time.time()
+        stats = self.stats
+        stats.events += len(events)
+        stats.batches += 1
+        stats.write_seconds += time.perf_counter() - start - refresh_seconds
+        stats.refresh_seconds += refresh_seconds
+        stats.last_commit = committed
+        lags = [committed - e["sent_at"] for e in events if "sent_at" in e]
+        stats.lags.extend(lags)
+        log.info("%5d events  %4d seasons  write %.3fs  refresh %.3fs  lag %s",
+                 len(events), len(by_season), time.perf_counter() - start - refresh_seconds,
+                 refresh_seconds, f"{max(lags):.3f}s" if lags else "-")
+
+    def _apply(self, cur, season, events):
+        matches = {}
+        goals = {}
+        scores = {}
+        # Later events for the same match or goal supersede earlier ones
+        for event in events:
+            if event["type"] == "match":
+                matches[event["id"]] = event
+                scores[event["id"]] = (event["h_score"], event["a_score"])
+            else:
+                goals[event["id"]] = event
+                if "h_score" in event and "a_score" in event:
+                    scores[event["match_id"]] = (event["h_score"], event["a_score"])
+
+        match_ids = set(matches) | {g["match_id"] for g in goals.values()}
+        if goals:
+            cur.execute(GOAL_MATCHES, {"season": season, "goals": list(goals)})
+            match_ids.update(row[0] for row in cur.fetchall())
+        # Whoever the rows named before this batch changes them needs refreshing too
+        before = aggregates.affected_keys(cur, season, match_ids)
+
+        if matches:
+            rows = [[m[c] for c in MATCH_FIELDS] for m in matches.values()]
+            for row in rows:
+                row[4:6] = scores[row[1]]
+            execute_values(cur, UPSERT_MATCHES, rows)
+            cur.execute(DELETE_OFFICIALS, {"season": season, "matches": list(matches)})
+            execute_values(cur, INSERT_OFFICIALS, [(season, m["id"], m["referee_id"]) for m in matches.values()])
+            execute_values(cur, INSERT_PAIRINGS, [(season, m["id"], m["team1_id"], m["team2_id"])
+                                                  for m in matches.values()])
+        if goals:
+            cur.execute(ADD_SQUAD_MEMBERS, {"season": season,
+                                            "players": sorted({g["player_id"] for g in goals.values()})})
+            execute_values(cur, UPSERT_GOALS, [[g[c] for c in GOAL_FIELDS] for g in goals.values()])
+        rescored = [(season, match_id, h, a) for match_id, (h, a) in scores.items() if match_id not in matches]
+        if rescored:
+            execute_values(cur, UPDATE_SCORES, rescored)
+        return sorted(match_ids), before
+
+
+def get_options():
+    config = db.get_config(section="ingest", optional=True)
+    return {
+        "batch_size": int(config.get("batch_size", INGEST_OPTIONS["batch_size"])),
+        "max_wait": float(config.get("max_wait", INGEST_OPTIONS["max_wait"])),
+        "latency_window": int(config.get("latency_window", INGEST_OPTIONS["latency_window"])),
+        "dead_letter": config.get("dead_letter", INGEST_OPTIONS["dead_letter"]) or None,
+    }
+
+
+def _read_file(path, lines):
+    f = sys.stdin if path == "-" else open(path)
+    try:
+        for line in f:
+            if line.strip():
+                lines.put((line, time.time()))
+    finally:
+        if f is not sys.stdin:
+            f.close()
+        lines.put(None)
+
+
+def _listen(address, lines):
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                if line.strip():
+                    lines.put((line.decode(), time.time()))
+
+    server = socketserver.ThreadingTCPServer(address, Handler)
+    server.daemon_threads = True
+    log.info("listening on %s:%d", *server.server_address)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def _address(value):
+    host, _, port = value.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def serve(args):
+    options = get_options()
+    if args.batch_size:
+        options["batch_size"] = args.batch_size
+    lines = queue.Queue()
+    if args.listen:
+        source = threading.Thread(target=_listen, args=(_address(args.listen), lines), daemon=True)
+    else:
+        source = threading.Thread(target=_read_file, args=(args.file, lines), daemon=True)
+    source.start()
+
+    conn = db.connect()
+    ingester = Ingester(conn, **options)
+    try:
+        summary = ingester.run(lines)
+    except KeyboardInterrupt:
+        summary = ingester.stats.summary()
+    finally:
+        conn.close()
+    log.info("%s", json.dumps(summary, indent=2))
+    return summary
+
+
+REPLAY_MATCHES = """
+    SELECT M.season, M.id, M.team1_id, M.team2_id, M.h_score, M.a_score, M.match_date,
+           M.captain1_id, M.captain2_id, M.stadium_id,
+           (SELECT MIN(OB.referee_id) FROM Officiated_by OB
+            WHERE OB.season = M.season AND OB.match_id = M.id) referee_id
+    FROM Matches_Held_at M
+    WHERE M.season = %(season)s
+    ORDER BY M.match_date, M.id;"""
+
+REPLAY_GOALS = """
+    SELECT G.season, G.id, G.pen, G.goal_time, G.winner, G.equalizer, G.own_goal,
+           G.player_id, G.match_id, PT.team_id
+    FROM Goals_Scored G
+    INNER JOIN Player_Season_Team PT
+    ON PT.season = G.season AND PT.player_id = G.player_id
+    WHERE G.season = %(season)s
+    ORDER BY G.goal_time, G.id;"""
+
+
+def replay_events(season, as_season=None):
+    """Yield a loaded season's matches as feed events, a match day at a time."""
+    conn = db.connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(REPLAY_MATCHES, {"season": season})
+            columns = [d[0] for d in cur.description]
+            matches = [dict(zip(columns, row)) for row in cur.fetchall()]
+            cur.execute(REPLAY_GOALS, {"season": season})
+            columns = [d[0] for d in cur.description]
+            goals = [dict(zip(columns, row)) for row in cur.fetchall()]
+    finally:
+        conn.close()
+
+    goals_by_match = {}
+    for goal in goals:
+        goals_by_match.setdefault(goal["match_id"], []).append(goal)
+    days = {}
+    for match in matches:
+        match["match_date"] = match["match_date"].isoformat()
+        if as_season is not None:
+            match["season"] = as_season
+        days.setdefault(match["match_date"], []).append(match)
+
+    for day in days.values():
+        for match in day:
+            yield {"type": "match", **match, "h_score": 0, "a_score": 0}
+        # The day's matches are played side by side, so interleave their goals by minute
+        running = {match["id"]: [0, 0] for match in day}
+        home = {match["id"]: match["team1_id"] for match in day}
+        day_goals = sorted((g for m in day for g in goals_by_match.get(m["id"], [])),
+                           key=lambda g: (g["goal_time"], g["id"]))
+        for goal in day_goals:
+            score = running[goal["match_id"]]
+            score[(goal.pop("team_id") == home[goal["match_id"]]) == goal["own_goal"]] += 1
+            if as_season is not None:
+                goal["season"] = as_season
+            yield {"type": "goal", **goal, "h_score": score[0], "a_score": score[1]}
+        for match in day:
+            yield {"type": "match", **match}
+
+
+def replay(args):
+    if args.connect:
+        sock = socket.create_connection(_address(args.connect))
+        out = sock.makefile("w")
+    else:
+        sock = None
+        out = sys.stdout if args.out == "-" else open(args.out, "w")
+    start = time.perf_counter()
+    sent = 0
+    try:
+        for event in replay_events(args.season, args.as_season):
+            if args.rate:
+                # Hold to the requested rate on average rather than per event
+                delay = start + sent / args.rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            event["sent_at"] = time.time()
+            out.write(json.dumps(event) + "\n")
+            if args.rate:
+                out.flush()
+            sent += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if sock is not None:
+            sock.close()
+    log.info("sent %d events in %.3fs", sent, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="write events from a file or socket")
+    source = serve_parser.add_mutually_exclusive_group()
+    source.add_argument("--file", default="-", help="JSON-lines file, - for stdin")
+    source.add_argument("--listen", help="accept events on host:port instead")
+    serve_parser.add_argument("--batch-size", type=int)
+    serve_parser.set_defaults(run=serve)
+
+    replay_parser = commands.add_parser("replay", help="send a loaded season as a live feed")
+    replay_parser.add_argument("--season", type=int, default=2021)
+    replay_parser.add_argument("--as-season", type=int,
+                               help="send the events as this season, e.g. to replay into an empty one")
+    replay_parser.add_argument("--rate", type=float, default=0,
+                               help="events per second, 0 for as fast as possible")
+    target = replay_parser.add_mutually_exclusive_group()
+    target.add_argument("--out", default="-", help="JSON-lines file, - for stdout")
+    target.add_argument("--connect", help="send to a serve --listen on host:port instead")
+    replay_parser.set_defaults(run=replay)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""Load the data/*.csv files into Postgres.
+
+    python code/load_data.py [--data-dir data] [--season 2021] [--append]
+
+Recreates the schema, streams every CSV through COPY FROM STDIN, builds the
+join indexes from code/indexes.sql and the summary tables, and refreshes
+planner statistics.
+
+Each data directory holds one season. With --append the schema is kept:
+teams, players and the other shared tables are upserted, and the season's
+partitions are replaced, leaving every other season untouched. Each
+player's team in the season is kept in Player_Season_Team, since an
+upsert leaves Players_Plays_In_Plays_for with the latest season's team.
+"""
+import argparse
+import csv
+import logging
+import os
+import time
+
+import aggregates
+import db
+
+CODE_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(CODE_DIR)
+
+
+def parse_amount(value):
+    # Net worths use Indian digit grouping, e.g. "10,70,00,00,000.00"
+    return value.replace(",", "")
+
+
+# (csv file, table, columns in CSV order, per-column converters, key), in foreign
+# key order. Shared tables are upserted on their key; seasonal tables (key None)
+# get a season column and are replaced a season at a time.
+TABLES = [
+    ("Managers.csv", "Managers", ["id", "name", "age", "nationality"], {}, ["id"]),
+    ("Referees.csv", "Referees", ["id", "name", "nationality"], {}, ["id"]),
+    ("Positions.csv", "Positions", ["pos", "pos_type"], {}, ["pos"]),
+    ("Stadiums.csv", "Stadiums", ["id", "name", "address"], {}, ["id"]),
+    ("Teams_Owner_Managed_Located.csv", "Teams_Owner_Managed_Located",
+     ["id", "name", "establishment_year", "city", "titles", "owner_id", "owner_name",
+      "owner_age", "owner_net_worth", "manager_id", "stadium_id"],
+     {"owner_net_worth": parse_amount}, ["id"]),
+    ("Standings_Pertain_To.csv", "Standings_Pertain_to",
+     ["id", "pld", "wins", "draws", "losses", "gf", "ga", "points", "T_id"], {}, None),
+    ("Players_Plays_In_Plays_for.csv", "Players_Plays_In_Plays_for",
+     ["id", "name", "age", "nationality", "jersey_number", "foot", "pos", "captain", "T_id",
+      "appearances", "substitutions", "goals", "penalties", "yellow_cards", "red_cards"], {}, ["id"]),
+    ("Matches_Held_At.csv", "Matches_Held_at",
+     ["id", "team1_id", "team2_id", "h_score", "a_score", "match_date",
+      "captain1_id", "captain2_id", "stadium_id"], {}, None),
+    ("Officiated_by.csv", "Officiated_by", ["match_id", "referee_id"], {}, None),
+    ("Teams_Play_Matches.csv", "Teams_Play_Matches", ["match_id", "team1_id", "team2_id"], {}, None),
+    ("Goals_Scored.csv", "Goals_Scored",
+     ["id", "pen", "goal_time", "winner", "equalizer", "own_goal", "player_id", "match_id"], {}, None),
+]
+
+# Season partitions, children before parents so they can be dropped in order
+PARTITIONED = ["Team_Match", "Goals_Scored", "Teams_Play_Matches", "Officiated_by", "Matches_Held_at"]
+
+
+class CsvStream:
+    """File-like object that yields a cleaned CSV to COPY one chunk at a time.
+
+    The source file is read row by row (with any BOM stripped by the
+    utf-8-sig codec), so memory use does not grow with the file size.
+    ``extra`` values (e.g. the season) are appended to every row.
+    """
+
+    def __init__(self, path, columns, converters, extra=()):
+        self._file = open(path, newline="", encoding="utf-8-sig")
+        self._reader = csv.reader(self._file)
+        header = next(self._reader)
+        if len(header) + len(extra) != len(columns):
+            raise ValueError(f"{path}: expected {len(columns) - len(extra)} columns, found {len(header)}")
+        self._convert = [(i, converters[c]) for i, c in enumerate(columns) if c in converters]
+        self._buffer = _LineBuffer()
+        self._writer = csv.writer(self._buffer, lineterminator="\n")
+        self._extra = list(extra)
+        self.rows = 0
+
+    def read(self, size=8192):
+        while len(self._buffer) < size:
+            row = next(self._reader, None)
+            if row is None:
+                break
+            for i, convert in self._convert:
+                row[i] = convert(row[i])
+            self._writer.writerow(row + self._extra)
+            self.rows += 1
+        return self._buffer.take(size)
+
+    def close(self):
+        self._file.close()
+
+
+class _LineBuffer:
+    def __init__(self):
+        self._parts = []
+        self._size = 0
+
+    def write(self, s):
+        self._parts.append(s)
+        self._size += len(s)
+
+    def __len__(self):
+        return self._size
+
+    def take(self, size):
+        data = "".join(self._parts)
+        head, tail = data[:size], data[size:]
+        self._parts = [tail] if tail else []
+        self._size = len(tail)
+        return head
+
+
+def run_sql_file(cur, path):
+    with open(path) as f:
+        cur.execute(f.read())
+
+
+def copy_table(cur, path, table, columns, converters, extra=()):
+    stream = CsvStream(path, columns, converters, extra)
+    try:
+        cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", stream)
+    finally:
+        stream.close()
+    return stream.rows
+
+
+def upsert_table(cur, path, table, columns, converters, key):
+    # COPY into a scratch table, then merge so rows from earlier seasons survive
+    cur.execute(f"CREATE TEMP TABLE staging (LIKE {table}) ON COMMIT DROP;")
+    rows = copy_table(cur, path, "staging", columns, converters)
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in columns if c not in key)
+    cur.execute(f"""INSERT INTO {table} ({', '.join(columns)})
+                    SELECT {', '.join(columns)} FROM staging
+                    ON CONFLICT ({', '.join(key)}) DO UPDATE SET {updates};
+                    DROP TABLE staging;""")
+    return rows
+
+
+def load_squads(cur, path, season):
+    """Record the team each player in the season's players file played for, in Player_Season_Team."""
+    _, table, columns, converters, _ = next(t for t in TABLES if t[1] == "Players_Plays_In_Plays_for")
+    cur.execute(f"CREATE TEMP TABLE squads (LIKE {table}) ON COMMIT DROP;")
+    rows = copy_table(cur, path, "squads", columns, converters)
+    cur.execute("""INSERT INTO Player_Season_Team (season, player_id, team_id)
+                   SELECT %s, id, T_id FROM squads;
+                   DROP TABLE squads;""", (season,))
+    return rows
+
+
+def replace_season(cur, season):
+    for table in PARTITIONED:
+        cur.execute(f"DROP TABLE IF EXISTS {table}_{season};")
+    cur.execute("DELETE FROM Standings_Pertain_to WHERE season = %s;", (season,))
+    cur.execute("DELETE FROM Player_Season_Team WHERE season = %s;", (season,))
+    cur.execute("SELECT create_season(%s);", (season,))
+
+
+def load(data_dir, season, append, schema_path, index_path):
+    conn = db.connect()
+    try:
+        with conn.cursor() as cur:
+            start = time.perf_counter()
+            if not append:
+                run_sql_file(cur, schema_path)
+            replace_season(cur, season)
+
+            # Under wal_level=minimal, tables created in this transaction are filled without WAL
+            for filename, table, columns, converters, key in TABLES:
+                t = time.perf_counter()
+                path = os.path.join(data_dir, filename)
+                if append:
+                    # Other seasons' cached reports stay valid unless a shared table changes
+                    db.set_change_season(cur, season if key is None else None)
+                if key is None:
+                    rows = copy_table(cur, path, table, columns + ["season"], converters, [season])
+                elif append:
+                    rows = upsert_table(cur, path, table, columns, converters, key)
+                else:
+                    rows = copy_table(cur, path, table, columns, converters)
+                logging.info("%-30s %7d rows  %.3fs", table, rows, time.perf_counter() - t)
+
+            t = time.perf_counter()
+            if append:
+                db.set_change_season(cur, season)
+            rows = load_squads(cur, os.path.join(data_dir, "Players_Plays_In_Plays_for.csv"), season)
+            logging.info("%-30s %7d rows  %.3fs", "Player_Season_Team", rows, time.perf_counter() - t)
+
+            t = time.perf_counter()
+            run_sql_file(cur, index_path)
+            logging.info("indexes built in %.3fs", time.perf_counter() - t)
+
+            t = time.perf_counter()
+            if append:
+                db.set_change_season(cur, season)
+            aggregates.refresh(cur, season)
+            logging.info("summary tables built in %.3fs", time.perf_counter() - t)
+        conn.commit()
+
+        # ANALYZE after commit so the statistics cover the committed data
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("ANALYZE;")
+        logging.info("season %s loaded in %.3fs", season, time.perf_counter() - start)
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data-dir", default=os.path.join(ROOT_DIR, "data"))
+    parser.add_argument("--season", type=int, default=2021,
+                        help="year the season in --data-dir starts in")
+    parser.add_argument("--append", action="store_true",
+                        help="keep the existing schema and other seasons")
+    parser.add_argument("--schema", default=os.path.join(CODE_DIR, "schema.sql"))
+    parser.add_argument("--indexes", default=os.path.join(CODE_DIR, "indexes.sql"))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    load(args.data_dir, args.season, args.append, args.schema, args.indexes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Per-report query instrumentation for the Admin page.
+
+run_query records the wall time, rows, result size and cache hit or miss of
+every named report. A sampled fraction of cache misses is run again under
+EXPLAIN (ANALYZE, BUFFERS) and the plan kept, so slow reports can be
+diagnosed from the app.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+import pandas as pd
+
+import db
+
+# Defaults for the optional [metrics] section of database.ini
+METRICS_OPTIONS = {
+    "explain_sample": 0.0,
+    "explain_keep": 20,
+    "latency_window": 500,
+}
+
+log = logging.getLogger(__name__)
+
+
+class ReportStats:
+    def __init__(self, window):
+        self.calls = 0
+        self.hits = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.last_error = None
+        # Recent latencies, for percentiles that follow the current load
+        self.latencies = deque(maxlen=window)
+
+
+class Metrics:
+    """Thread-safe registry of per-report statistics and sampled plans."""
+
+    def __init__(self, explain_sample=0.0, explain_keep=20, latency_window=500):
+        self.explain_sample = explain_sample
+        self.latency_window = latency_window
+        self.plans = deque(maxlen=explain_keep)
+        self._reports = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, rows=None, nbytes=None, hit=False, error=None):
+        with self._lock:
+            stats = self._reports.get(name)
+            if stats is None:
+                stats = self._reports[name] = ReportStats(self.latency_window)
+            stats.calls += 1
+            stats.total_seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            stats.latencies.append(seconds)
+            if error is not None:
+                stats.errors += 1
+                stats.last_error = repr(error)
+                return
+            stats.hits += hit
+            stats.rows = rows
+            if nbytes is not None:
+                stats.bytes = nbytes
+
+    def should_explain(self):
+        return self.explain_sample > 0 and random.random() < self.explain_sample
+
+    def explain(self, name, sql, params):
+        """Run ``sql`` under EXPLAIN (ANALYZE, BUFFERS) and keep the plan."""
+        try:
+            plan = db.explain(sql, params)
+        except Exception:
+            log.exception("EXPLAIN of %s failed", name)
+            return
+        self.plans.appendleft({
+            "report": name,
+            "params": {k: str(v) for k, v in params.items()},
+            "captured_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "plan": plan,
+        })
+
+    def summary(self):
+        """One row per report, slowest mean first."""
+        with self._lock:
+            rows = []
+            for name, s in self._reports.items():
+                latencies = sorted(s.latencies)
+                rows.append({
+                    "report": name,
+                    "calls": s.calls,
+                    "hits": s.hits,
+                    "misses": s.calls - s.hits - s.errors,
+                    "hit_ratio": s.hits / s.calls,
+                    "errors": s.errors,
+                    "mean_ms": 1000 * s.total_seconds / s.calls,
+                    "p50_ms": 1000 * latencies[len(latencies) // 2],
+                    "p95_ms": 1000 * latencies[int(len(latencies) * 0.95)],
+                    "max_ms": 1000 * s.max_seconds,
+                    "rows": s.rows,
+                    "bytes": s.bytes,
+                    "last_error": s.last_error,
+                })
+        columns = ["report", "calls", "hits", "misses", "hit_ratio", "errors", "mean_ms",
+                   "p50_ms", "p95_ms", "max_ms", "rows", "bytes", "last_error"]
+        return pd.DataFrame(rows, columns=columns).sort_values("mean_ms", ascending=False, ignore_index=True)
+
+    def to_json(self):
+        return json.dumps({
+            "reports": self.summary().to_dict("records"),
+            "plans": list(self.plans),
+        }, indent=2, default=str)
+
+    def reset(self):
+        with self._lock:
+            self._reports.clear()
+            self.plans.clear()
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                config = db.get_config(section="metrics", optional=True)
+                _metrics = Metrics(
+                    explain_sample=float(config.get("explain_sample", METRICS_OPTIONS["explain_sample"])),
+                    explain_keep=int(config.get("explain_keep", METRICS_OPTIONS["explain_keep"])),
+                    latency_window=int(config.get("latency_window", METRICS_OPTIONS["latency_window"])),
+                )
+    return _metrics
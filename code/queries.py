@@ -0,0 +1,569 @@
+"""Registry of the named report queries behind every page.
+
+Queries take bound parameters instead of having values formatted into the
+SQL, so each one is planned once per connection as a server-side prepared
+statement and cached on (query name, parameter values).
+"""
+import re
+import time
+
+import cache
+import db
+import embedded
+import metrics
+import snapshots
+
+
+class Query:
+    """A named report query.
+
+    ``sql`` uses psycopg2 ``%(name)s`` placeholders. ``params`` lists the
+    parameter names in the order they are bound to the prepared statement.
+    ``tables`` are the tables it reads, which decide which data changes drop
+    its cached results (None for catalog queries, which any change drops).
+    """
+
+    def __init__(self, name, params, sql):
+        self.name = name
+        self.params = tuple(params)
+        self.sql = sql
+        self.statement = f"q_{name}"
+        self.tables = cache.tables_read(sql)
+        self.prepared_sql = re.sub(
+            r"%\((\w+)\)s", lambda m: f"${self.params.index(m.group(1)) + 1}", sql
+        )
+
+
+QUERIES = {q.name: q for q in [
+    # Home
+    Query("seasons", [], """
+        SELECT season, label FROM Seasons ORDER BY season DESC;"""),
+
+    Query("table_names", [], """
+        SELECT relname FROM pg_class
+        WHERE relkind IN ('r', 'p') AND NOT relispartition AND relname !~ '^(pg_|sql_)';"""),
+
+    Query("table_columns", ["table"], """
+        SELECT attname column_name FROM pg_attribute
+        WHERE attrelid = %(table)s::regclass AND attnum > 0 AND NOT attisdropped
+        ORDER BY attnum;"""),
+
+    Query("table_primary_key", ["table"], """
+        SELECT A.attname column_name
+        FROM pg_index I
+        CROSS JOIN LATERAL unnest(I.indkey) WITH ORDINALITY K(attnum, n)
+        INNER JOIN pg_attribute A
+        ON A.attrelid = I.indrelid AND A.attnum = K.attnum
+        WHERE I.indrelid = %(table)s::regclass AND I.indisprimary
+        ORDER BY K.n;"""),
+
+    # Sum the leaf tables only: once ANALYZEd, a partitioned parent has an estimate of its own that
+    # already covers its partitions, and before that it has none
+    Query("table_estimated_rows", ["table"], """
+        SELECT COALESCE(SUM(GREATEST(C.reltuples, 0)), 0)::bigint estimate
+        FROM pg_class C
+        WHERE C.relkind = 'r'
+        AND (C.oid = %(table)s::regclass
+             OR C.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %(table)s::regclass));"""),
+
+    # Teams
+    Query("goals_scored_by_teams", ["season"], """
+        SELECT T.name team, S.gf goals_scored
+        FROM Standings_Pertain_to S
+        INNER JOIN Teams_Owner_Managed_Located T
+        ON S.T_id = T.id
+        WHERE S.season = %(season)s
+        ORDER BY S.gf DESC;"""),
+
+    Query("goals_conceded_by_teams", ["season"], """
+        SELECT T.name team, S.ga goals_conceded
+        FROM Standings_Pertain_to S
+        INNER JOIN Teams_Owner_Managed_Located T
+        ON S.T_id = T.id
+        WHERE S.season = %(season)s
+        ORDER BY S.ga DESC;"""),
+
+    Query("teams_with_fewest_losses", ["season"], """
+        SELECT T.name team, S.losses
+        FROM Standings_Pertain_to S
+        INNER JOIN Teams_Owner_Managed_Located T
+        ON S.T_id = T.id
+        WHERE S.season = %(season)s
+        ORDER BY S.losses;"""),
+
+    Query("season_cities", ["season"], """
+        SELECT DISTINCT T.city
+        FROM Standings_Pertain_to S
+        INNER JOIN Teams_Owner_Managed_Located T
+        ON S.T_id = T.id
+        WHERE S.season = %(season)s
+        ORDER BY T.city;"""),
+
+    Query("top_scoring_teams_in_city", ["season", "city"], """
+        SELECT T.name team, S.gf goals_scored
+        FROM Standings_Pertain_to S
+        INNER JOIN Teams_Owner_Managed_Located T
+        ON S.T_id = T.id
+        WHERE S.season = %(season)s
+        AND T.city = %(city)s
+        ORDER BY S.gf DESC;"""),
+
+    Query("derby_goals", ["season"], """
+        SELECT SUM(X.goals) FILTER (WHERE X.derby) total_Derby_Goals,
+        ROUND(AVG(X.goals) FILTER (WHERE X.derby), 2) Derby_Goals_per_match,
+        SUM(X.goals) FILTER (WHERE NOT X.derby) total_Non_Derby_Goals,
+        ROUND(AVG(X.goals) FILTER (WHERE NOT X.derby), 2) Non_Derby_Goals_per_match
+        FROM
+        (
+            SELECT TM.goals_for + TM.goals_against goals, H.city = A.city derby
+            FROM Team_Match TM
+            INNER JOIN Teams_Owner_Managed_Located H
+            ON TM.team_id = H.id
+            INNER JOIN Teams_Owner_Managed_Located A
+            ON TM.opponent_id = A.id
+            WHERE TM.season = %(season)s
+            AND TM.is_home
+        ) X;"""),
+
+    Query("team_penalties", ["season"], """
+        SELECT T.name team, S.player_penalties num_Penalties,
+        CAST(S.player_goals as decimal) totalGoals,
+        100*ROUND(S.player_penalties/CAST(S.player_goals as decimal), 4) percentage_Penalties
+        FROM team_season_stats S
+        INNER JOIN Teams_Owner_Managed_Located T
+        ON S.team_id = T.id
+        WHERE S.season = %(season)s
+        AND S.player_goals > 0
+        ORDER BY percentage_Penalties DESC;"""),
+
+    Query("clean_sheets", ["season"], """
+        SELECT T.name Team, S.clean_sheets CleanSheets, S.matches TotalMatches,
+        100*ROUND(S.clean_sheets/CAST(S.matches as decimal), 4) CleanSheetPercentage
+        FROM team_season_stats S
+        INNER JOIN Teams_Owner_Managed_Located T
+        ON S.team_id = T.id
+        WHERE S.season = %(season)s
+        AND S.matches > 0
+        ORDER BY CleanSheets DESC;"""),
+
+    Query("season_matches", ["season"], """
+        SELECT M.id, M.match_date, H.name home_team, A.name away_team, M.h_score, M.a_score
+        FROM Matches_Held_at M
+        INNER JOIN Teams_Owner_Managed_Located H
+        ON M.team1_id = H.id
+        INNER JOIN Teams_Owner_Managed_Located A
+        ON M.team2_id = A.id
+        WHERE M.season = %(season)s
+        ORDER BY M.match_date, M.id;"""),
+
+    Query("final_standings", ["season"], """
+        SELECT T.name team, S.pld, S.wins, S.draws, S.losses, S.gf, S.ga, S.points
+        FROM Standings_Pertain_to S
+        INNER JOIN Teams_Owner_Managed_Located T
+        ON S.T_id = T.id
+        WHERE S.season = %(season)s
+        ORDER BY S.points DESC;"""),
+
+    Query("head_to_head_matches", [], """
+        SELECT M.season, M.id, M.match_date, M.team1_id home_id, H.name home_team,
+               M.team2_id away_id, A.name away_team, M.h_score, M.a_score, S.name stadium
+        FROM Matches_Held_at M
+        INNER JOIN Teams_Owner_Managed_Located H
+        ON M.team1_id = H.id
+        INNER JOIN Teams_Owner_Managed_Located A
+        ON M.team2_id = A.id
+        INNER JOIN Stadiums S
+        ON M.stadium_id = S.id
+        WHERE M.h_score IS NOT NULL AND M.a_score IS NOT NULL
+        ORDER BY M.match_date, M.season, M.id;"""),
+
+    Query("season_goals", ["season"], """
+        SELECT G.match_id, P.id player_id, P.name player, T.name team, O.name opponent,
+               G.goal_time, G.pen, G.own_goal, G.winner, G.equalizer
+        FROM Goals_Scored G
+        INNER JOIN Players_Plays_In_Plays_for P
+        ON G.player_id = P.id
+        INNER JOIN Player_Season_Team PT
+        ON PT.season = G.season AND PT.player_id = G.player_id
+        INNER JOIN Team_Match TM
+        ON TM.season = G.season AND TM.match_id = G.match_id AND TM.team_id = PT.team_id
+        INNER JOIN Teams_Owner_Managed_Located T
+        ON TM.team_id = T.id
+        INNER JOIN Teams_Owner_Managed_Located O
+        ON TM.opponent_id = O.id
+        WHERE G.season = %(season)s
+        ORDER BY G.match_id, G.goal_time, G.id;"""),
+
+    # Players
+    Query("season_team_names", ["season"], """
+        SELECT T.name
+        FROM team_season_stats S
+        INNER JOIN Teams_Owner_Managed_Located T
+        ON S.team_id = T.id
+        WHERE S.season = %(season)s
+        ORDER BY T.name;"""),
+
+    Query("top_goal_scorers", ["season", "teams"], """
+        SELECT P.name Player, T.name Team, S.goals Goals
+        FROM player_season_stats S
+        INNER JOIN Players_Plays_in_Plays_for P
+        ON S.player_id = P.id
+        INNER JOIN Teams_Owner_Managed_Located T
+        ON S.team_id = T.id
+        WHERE S.season = %(season)s
+        AND T.name = ANY(%(teams)s)
+        ORDER BY Goals DESC;"""),
+
+    Query("hattricks", ["season"], """
+        SELECT P.name Player, T.name Team, S.hattricks Hattricks
+        FROM player_season_stats S
+        INNER JOIN Players_Plays_in_Plays_for P
+        ON S.player_id = P.id
+        INNER JOIN Teams_Owner_Managed_Located T
+        ON S.team_id = T.id
+        WHERE S.season = %(season)s
+        AND S.hattricks > 0
+        ORDER BY Hattricks DESC;"""),
+
+    Query("position_names", ["position"], """
+        SELECT pos FROM Positions WHERE pos_type = %(position)s;"""),
+
+    Query("scorers_by_position_and_nationality", ["season", "position", "positions"], """
+        SELECT P.nationality country, COUNT(S.player_id) goalScoringPlayers,
+        SUM(S.goals) totalGoalsScoredByPosition
+        FROM player_season_stats S
+        INNER JOIN Players_Plays_in_Plays_for P
+        ON S.player_id = P.id
+        INNER JOIN Positions Pos
+        ON P.pos = Pos.pos
+        WHERE S.season = %(season)s
+        AND Pos.pos_type = %(position)s
+        AND Pos.pos = ANY(%(positions)s)
+        GROUP BY country
+        ORDER BY totalGoalsScoredByPosition DESC;"""),
+
+    Query("most_winners", ["season"], """
+        SELECT P.name player, T.name team, S.winners cntWinners,
+        CAST(S.goals AS decimal) totalGoals,
+        100*ROUND(S.winners/CAST(S.goals AS decimal), 4) winnerPercentage
+        FROM player_season_stats S
+        INNER JOIN Players_Plays_In_Plays_for P
+        ON S.player_id = P.id
+        INNER JOIN Teams_Owner_Managed_Located T
+        ON S.team_id = T.id
+        WHERE S.season = %(season)s
+        AND S.goals > 1
+        ORDER BY cntWinners DESC
+        LIMIT 20;"""),
+
+    Query("most_equalizers", ["season"], """
+        SELECT P.name player, T.name team, S.equalizers cntEqualizers,
+        CAST(S.goals AS decimal) totalGoals,
+        100*ROUND(S.equalizers/CAST(S.goals AS decimal), 4) equalizerPercentage
+        FROM player_season_stats S
+        INNER JOIN Players_Plays_In_Plays_for P
+        ON S.player_id = P.id
+        INNER JOIN Teams_Owner_Managed_Located T
+        ON S.team_id = T.id
+        WHERE S.season = %(season)s
+        AND S.goals > 1
+        ORDER BY cntEqualizers DESC
+        LIMIT 20;"""),
+
+    Query("scorers_above_age", ["season", "age"], """
+        SELECT P.name player, T.name team, P.age, CAST(S.goals AS decimal) totalGoals
+        FROM player_season_stats S
+        INNER JOIN Players_Plays_In_Plays_for P
+        ON S.player_id = P.id
+        INNER JOIN Teams_Owner_Managed_Located T
+        ON S.team_id = T.id
+        WHERE S.season = %(season)s
+        AND P.age >= %(age)s
+        ORDER BY totalGoals DESC,  P.age DESC;"""),
+
+    Query("scorers_below_age", ["season", "age"], """
+        SELECT P.name player, T.name team, P.age, CAST(S.goals AS decimal) totalGoals
+        FROM player_season_stats S
+        INNER JOIN Players_Plays_In_Plays_for P
+        ON S.player_id = P.id
+        INNER JOIN Teams_Owner_Managed_Located T
+        ON S.team_id = T.id
+        WHERE S.season = %(season)s
+        AND P.age <= %(age)s
+        ORDER BY totalGoals DESC,  P.age DESC;"""),
+
+    Query("captain_goals", ["season"], """
+        SELECT P.name Player, T.name Team, S.goals Goals
+        FROM player_season_stats S
+        INNER JOIN Players_Plays_in_Plays_for P
+        ON S.player_id = P.id
+        INNER JOIN Teams_Owner_Managed_Located T
+        ON S.team_id = T.id
+        WHERE S.season = %(season)s
+        AND P.captain is TRUE
+        ORDER BY Goals DESC;"""),
+
+    Query("career_top_scorers", [], """
+        SELECT P.name Player, T.name Team, COUNT(S.season) Seasons, SUM(S.goals) Goals
+        FROM player_season_stats S
+        INNER JOIN Players_Plays_in_Plays_for P
+        ON S.player_id = P.id
+        INNER JOIN (
+            SELECT DISTINCT ON (player_id) player_id, team_id
+            FROM player_season_stats
+            ORDER BY player_id, season DESC
+        ) L
+        ON S.player_id = L.player_id
+        INNER JOIN Teams_Owner_Managed_Located T
+        ON L.team_id = T.id
+        GROUP BY S.player_id, P.name, T.name
+        ORDER BY Goals DESC
+        LIMIT 50;"""),
+
+    # Search and player profiles; every lookup is by primary key or an indexed id
+    Query("search_names", [], """
+        SELECT 'player' kind, P.id, P.name, T.name detail
+        FROM Players_Plays_In_Plays_for P
+        INNER JOIN Teams_Owner_Managed_Located T
+        ON P.T_id = T.id
+        UNION ALL
+        SELECT 'team', id, name, city FROM Teams_Owner_Managed_Located
+        UNION ALL
+        SELECT 'referee', id, name, nationality FROM Referees
+        ORDER BY kind, id;"""),
+
+    Query("player_profile", ["player"], """
+        SELECT P.name, T.name team, P.pos position, PO.pos_type, P.jersey_number, P.age,
+               P.nationality, TRIM(P.foot) foot, P.captain, P.appearances, P.substitutions,
+               P.goals, P.penalties, P.yellow_cards, P.red_cards
+        FROM Players_Plays_In_Plays_for P
+        INNER JOIN Teams_Owner_Managed_Located T
+        ON P.T_id = T.id
+        INNER JOIN Positions PO
+        ON P.pos = PO.pos
+        WHERE P.id = %(player)s;"""),
+
+    Query("player_seasons", ["player"], """
+        SELECT S.season, S.goals, S.penalties, S.winners, S.equalizers, S.own_goals, S.hattricks
+        FROM player_season_stats S
+        WHERE S.player_id = %(player)s
+        ORDER BY S.season;"""),
+
+    Query("player_goals", ["player"], """
+        SELECT G.season, M.match_date, O.name opponent, TM.is_home home, G.goal_time,
+               G.pen, G.own_goal, G.winner, G.equalizer
+        FROM Goals_Scored G
+        INNER JOIN Player_Season_Team PT
+        ON PT.season = G.season AND PT.player_id = G.player_id
+        INNER JOIN Matches_Held_at M
+        ON M.season = G.season AND M.id = G.match_id
+        INNER JOIN Team_Match TM
+        ON TM.season = G.season AND TM.match_id = G.match_id AND TM.team_id = PT.team_id
+        INNER JOIN Teams_Owner_Managed_Located O
+        ON TM.opponent_id = O.id
+        WHERE G.player_id = %(player)s
+        ORDER BY G.season, M.match_date, G.goal_time;"""),
+
+    # Managers
+    Query("manager_wins_by_nationality", ["season"], """
+        SELECT X.nationality Manager_Nationality,
+        STRING_AGG (
+                        X.name||' ('||X.team||')',
+                        ', '
+                        ORDER BY
+                        X.name
+                ) managers,
+        SUM(wins) total_wins,
+        AVG(win_percentage) average_win_percentage
+        FROM
+        (
+            SELECT M.id, M.name, M.nationality, T.id T_id, T.name team, S.wins,
+            100*ROUND(CAST(S.wins AS decimal)/CAST(S.wins + S.losses + S.draws AS decimal),4) win_percentage
+            FROM Managers M
+            INNER JOIN Teams_Owner_Managed_Located T
+            ON M.id = T.manager_id
+            INNER JOIN Standings_Pertain_to S
+            ON T.id = S.T_id
+            WHERE S.season = %(season)s
+        ) X
+        GROUP BY X.nationality
+        ORDER BY AVG(win_percentage) DESC;"""),
+
+    Query("manager_compatriots", [], """
+        SELECT Y.id, Y.manager_name, Y.team, Y.nationality,
+        COALESCE(X.cnt_compatriot_players, 0) cnt_compatriot_players,
+        100*ROUND(CAST(COALESCE(X.cnt_compatriot_players,0) AS decimal)/CAST(Y.cnt_players AS decimal),4) compatriot_player_percentage
+        FROM
+        (
+            SELECT M.id, M.name manager_name, T.name team, M.nationality, COUNT(P.id) cnt_compatriot_players
+            FROM Managers M
+            LEFT OUTER JOIN Teams_Owner_Managed_Located T
+            ON M.id = T.manager_id
+            LEFT OUTER JOIN Players_Plays_In_Plays_for P
+            ON T.id = P.T_id
+            WHERE M.nationality = p.Nationality
+            GROUP BY M.id, M.name, T.name, M.nationality
+        ) X
+        RIGHT OUTER JOIN
+        (
+            SELECT M.id, M.name manager_name, T.name team, M.nationality, COUNT(P.id) cnt_players
+            FROM Managers M
+            LEFT OUTER JOIN Teams_Owner_Managed_Located T
+            ON M.id = T.manager_id
+            LEFT OUTER JOIN Players_Plays_In_Plays_for P
+            ON T.id = P.T_id
+            GROUP BY M.id, M.name, T.name, M.nationality
+        ) Y
+        ON X.id = Y.id
+        AND X.manager_name = Y.manager_name
+        AND X.team = Y.team
+        AND X.nationality = Y.nationality
+        ORDER BY compatriot_player_percentage DESC;"""),
+
+    Query("manager_home_away_wins", ["season"], """
+        SELECT M.id, M.name manager_name, T.name team, S.home_wins homeWins, S.away_wins awayWins
+        FROM team_season_stats S
+        INNER JOIN Teams_Owner_Managed_Located T
+        ON S.team_id = T.id
+        INNER JOIN Managers M
+        ON T.manager_id = M.id
+        WHERE S.season = %(season)s
+        AND S.matches > 0
+        ORDER BY homeWins DESC, awayWins DESC;"""),
+
+    # Stadiums
+    Query("stadium_goals", ["season"], """
+        SELECT St.name stadium_name, T.name team,
+        SS.home_goals, SS.away_goals, SS.home_goals + SS.away_goals total_goals_scored
+        FROM stadium_stats SS
+        INNER JOIN Stadiums St
+        ON SS.stadium_id = St.id
+        INNER JOIN Teams_Owner_Managed_Located T
+        ON SS.home_team_id = T.id
+        WHERE SS.season = %(season)s
+        ORDER BY total_goals_scored DESC;"""),
+
+    Query("stadium_home_wins", ["season"], """
+        SELECT St.name stadium_name, T.name team,
+        100*ROUND(SS.home_wins/CAST(SS.matches AS decimal), 4) homeWinPercentage,
+        100*ROUND(SS.away_wins/CAST(SS.matches AS decimal), 4) homeLossPercentage,
+        100*ROUND(SS.draws/CAST(SS.matches AS decimal), 4) homeDrawPercentage
+        FROM stadium_stats SS
+        INNER JOIN Stadiums St
+        ON SS.stadium_id = St.id
+        INNER JOIN Teams_Owner_Managed_Located T
+        ON SS.home_team_id = T.id
+        WHERE SS.season = %(season)s
+        ORDER BY homeWinPercentage DESC;"""),
+
+    Query("stadium_away_wins", ["season"], """
+        SELECT St.name stadium_name, T.name team,
+        100*ROUND(SS.away_wins/CAST(SS.matches AS decimal), 4) awayWinPercentage,
+        100*ROUND(SS.home_wins/CAST(SS.matches AS decimal), 4) awayLossPercentage,
+        100*ROUND(SS.draws/CAST(SS.matches AS decimal), 4) awayDrawPercentage
+        FROM stadium_stats SS
+        INNER JOIN Stadiums St
+        ON SS.stadium_id = St.id
+        INNER JOIN Teams_Owner_Managed_Located T
+        ON SS.home_team_id = T.id
+        WHERE SS.season = %(season)s
+        ORDER BY awayWinPercentage DESC;"""),
+
+    # Referees
+    Query("referee_home_wins", ["season"], """
+        SELECT R.name referee_name, R.nationality, SUM(RS.matches) numMatches,
+        100*ROUND(SUM(RS.home_wins)/CAST(SUM(RS.matches) AS decimal), 4) homeWinPercentage,
+        100*ROUND(SUM(RS.home_losses)/CAST(SUM(RS.matches) AS decimal), 4) homeLossPercentage,
+        100*ROUND(SUM(RS.home_draws)/CAST(SUM(RS.matches) AS decimal), 4) homeDrawPercentage
+        FROM referee_stats RS
+        INNER JOIN Referees R
+        ON RS.referee_id = R.id
+        WHERE RS.season = %(season)s
+        GROUP BY R.id, R.name, R.nationality
+        ORDER BY homeWinPercentage DESC;"""),
+
+    Query("referee_penalties", ["season"], """
+        SELECT R.name referee_name, SUM(RS.matches) numMatches,
+        SUM(RS.penalties) numPenalties,
+        100*ROUND(SUM(RS.penalties)/CAST(SUM(RS.matches) AS decimal), 4) numPenaltiesPercentage
+        FROM referee_stats RS
+        INNER JOIN Referees R
+        ON RS.referee_id = R.id
+        WHERE RS.season = %(season)s
+        GROUP BY R.id, R.name, R.nationality
+        ORDER BY numPenaltiesPercentage DESC;"""),
+
+    Query("season_referee_names", ["season"], """
+        SELECT DISTINCT R.name
+        FROM referee_stats RS
+        INNER JOIN Referees R
+        ON RS.referee_id = R.id
+        WHERE RS.season = %(season)s
+        ORDER BY R.name;"""),
+
+    Query("referee_home_teams", ["season", "referee"], """
+        SELECT H.name HomeTeam, RS.matches cntMatch,
+        RS.home_wins homeWins,
+        RS.home_losses homeLosses,
+        RS.home_draws homeDraws
+        FROM referee_stats RS
+        INNER JOIN Referees R
+        ON RS.referee_id = R.id
+        INNER JOIN Teams_Owner_Managed_Located H
+        ON RS.home_team_id = H.id
+        WHERE RS.season = %(season)s
+        AND R.name = %(referee)s
+        ORDER BY cntMatch DESC;"""),
+]}
+
+
+def compute_query(name, **params):
+    """Run the registered query ``name`` on the configured backend, bypassing every cache."""
+    query = QUERIES[name]
+    values = [params[p] for p in query.params]
+    if db.get_backend() == "embedded":
+        return embedded.get_engine().run(name, **dict(zip(query.params, values)))
+    return db.query_prepared(query.statement, query.prepared_sql, values)
+
+
+def run_query(name, **params):
+    """Run the registered query ``name`` through the result cache.
+
+    The query is answered by Postgres or, with ``backend=embedded``, by the
+    engine in embedded.py, unless there is an up-to-date snapshot of it from
+    render.py. Every call is recorded in the metrics registry, and a sampled
+    fraction of cache misses also has its plan captured.
+    """
+    query = QUERIES[name]
+    values = [params[p] for p in query.params]
+    report_metrics = metrics.get_metrics()
+    computed = False
+    scope = None if query.tables is None else (query.tables, params.get("season"))
+
+    embedded_backend = db.get_backend() == "embedded"
+
+    def compute():
+        nonlocal computed
+        computed = True
+        store = snapshots.get_store()
+        if store is not None:
+            df = store.lookup(name, values, scope, result_cache.version)
+            if df is not None:
+                return df
+        return compute_query(name, **dict(zip(query.params, values)))
+
+    result_cache = cache.get_cache()
+    start = time.perf_counter()
+    try:
+        df = result_cache.get_or_compute((name, cache.freeze(values)), compute, scope)
+    except Exception as e:
+        report_metrics.record(name, time.perf_counter() - start, error=e)
+        raise
+    elapsed = time.perf_counter() - start
+
+    # Sizing a frame walks its strings, so only do it for fresh results
+    report_metrics.record(name, elapsed, rows=len(df), hit=not computed,
+                          nbytes=cache.frame_size(df) if computed else None)
+    if computed and not embedded_backend and report_metrics.should_explain():
+        report_metrics.explain(name, query.sql, dict(zip(query.params, values)))
+    return df
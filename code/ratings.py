@@ -0,0 +1,232 @@
+"""Elo-style team ratings over the match log of every season.
+
+RatingEngine walks the matches in date order. The home side gets
+HOME_ADVANTAGE rating points when its expected score is worked out, and the
+rating change is scaled up for wider winning margins, as in the World
+Football Elo ratings. A team's rating moves SEASON_REGRESSION of the way
+back to INITIAL before its first match of each season. Every match's
+ratings before it and its rating change are kept in compact arrays, one row
+per match. That is enough for any team's rating after any match, and for
+each match's expected result. When the match log grows, refresh() rates
+only the new matches. If an earlier match was added or rescored, only the
+rows from it on are rated again.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from queries import run_query
+
+INITIAL = 1500.0
+K = 20.0
+HOME_ADVANTAGE = 60.0
+SEASON_REGRESSION = 0.2
+
+
+def expected_score(rating, opponent, home=True):
+    """The expected score (1 a win, 0.5 a draw) of a team rated ``rating`` against ``opponent``."""
+    advantage = HOME_ADVANTAGE if home else -HOME_ADVANTAGE
+    return 1 / (1 + 10 ** ((opponent - rating - advantage) / 400))
+
+
+def margin_weight(goal_difference):
+    gd = abs(goal_difference)
+    return 1.0 if gd <= 1 else 1.5 if gd == 2 else (11 + gd) / 8
+
+
+class RatingEngine:
+    """Ratings of the teams in ``teams``, with one history row per rated match.
+
+    Row ``r`` of the history holds the match's season, id, day (days since
+    1970), home and away team positions and score, both teams' ratings
+    before it (``home_before``, ``away_before``) and the home team's rating
+    change ``delta``, which the away team lost. column() reads them.
+    """
+
+    _INT_COLUMNS = ["season", "match_id", "day", "home", "away", "h_score", "a_score"]
+    _FLOAT_COLUMNS = ["home_before", "away_before", "delta"]
+
+    def __init__(self):
+        self.teams = []
+        self._index = {}
+        self._ratings = []
+        self._seasons = []
+        self.n = 0
+        self._columns = {c: np.zeros(0, dtype=np.int32) for c in self._INT_COLUMNS}
+        self._columns.update({c: np.zeros(0, dtype=np.float64) for c in self._FLOAT_COLUMNS})
+        self.matches = None
+        self._lock = threading.RLock()
+
+    def column(self, name, n=None):
+        """The history column ``name`` (see the class docstring) over its first ``n`` rows, default all."""
+        return self._columns[name][:self.n if n is None else n]
+
+    def _latest(self, n):
+        """Each team's rating and season after its last match among the first ``n`` rows."""
+        rating = np.full(len(self.teams), INITIAL)
+        season = np.full(len(self.teams), -1, dtype=np.int64)
+        home, away, delta = self.column("home", n), self.column("away", n), self.column("delta", n)
+        teams = np.concatenate([home, away])
+        after = np.concatenate([self.column("home_before", n) + delta, self.column("away_before", n) - delta])
+        rows = np.concatenate([np.arange(n), np.arange(n)])
+        # A team's last row, of the rows sorted by team and then row
+        order = np.lexsort((rows, teams))
+        last = order[np.r_[teams[order][1:] != teams[order][:-1], True]] if n else order
+        rating[teams[last]] = after[last]
+        season[teams[last]] = np.concatenate([self.column("season", n)] * 2)[last]
+        return rating, season
+
+    def _team(self, team_id, name):
+        i = self._index.get(team_id)
+        if i is None:
+            i = self._index[team_id] = len(self.teams)
+            self.teams.append(name)
+            self._ratings.append(INITIAL)
+            self._seasons.append(None)
+        return i
+
+    def _positions(self, matches):
+        """The home and away team positions of ``matches``, adding teams not seen before."""
+        ids = np.concatenate([matches["home_id"].to_numpy(dtype=np.int64),
+                              matches["away_id"].to_numpy(dtype=np.int64)])
+        names = np.concatenate([matches["home_team"].to_numpy(dtype=object),
+                                matches["away_team"].to_numpy(dtype=object)])
+        unique, first, inverse = np.unique(ids, return_index=True, return_inverse=True)
+        # New teams in order of their first match, so positions don't depend on id order
+        for i in np.argsort(first, kind="stable").tolist():
+            self._team(int(unique[i]), names[first[i]])
+        positions = np.array([self._index[t] for t in unique.tolist()], dtype=np.int64)[inverse.ravel()]
+        return positions[:len(matches)], positions[len(matches):]
+
+    def add_match(self, season, match_id, day, home, away, h_score, a_score):
+        """Rate one match played after every match rated so far; ``home`` and ``away`` are team positions."""
+        if self.n == len(self._columns["season"]):
+            # Grow by doubling, so appending stays O(1) amortized
+            for name, column in self._columns.items():
+                self._columns[name] = np.resize(column, max(2 * len(column), 1024))
+        for team in (home, away):
+            if self._seasons[team] is not None and self._seasons[team] != season:
+                self._ratings[team] = INITIAL + (1 - SEASON_REGRESSION) * (self._ratings[team] - INITIAL)
+            self._seasons[team] = season
+        rh, ra = self._ratings[home], self._ratings[away]
+        result = 1.0 if h_score > a_score else 0.5 if h_score == a_score else 0.0
+        delta = K * margin_weight(h_score - a_score) * (result - expected_score(rh, ra))
+        self._ratings[home] = rh + delta
+        self._ratings[away] = ra - delta
+        row = (season, match_id, day, home, away, h_score, a_score, rh, ra, delta)
+        for name, value in zip(self._INT_COLUMNS + self._FLOAT_COLUMNS, row):
+            self._columns[name][self.n] = value
+        self.n += 1
+
+    def _truncate(self, n):
+        """Forget every row from ``n`` on, putting each team's rating back to what it was after row ``n - 1``."""
+        rating, season = self._latest(n)
+        self.n = n
+        self._ratings = rating.tolist()
+        self._seasons = [None if s < 0 else s for s in season.tolist()]
+
+    def refresh(self, matches):
+        """Bring the ratings up to date with ``matches``, a frame like head_to_head_matches'.
+
+        Only the rows from the first one that differs from the log rated so
+        far are rated again.
+        """
+        with self._lock:
+            if matches is self.matches:
+                return
+            home, away = self._positions(matches)
+            new = {
+                "season": matches["season"].to_numpy(),
+                "match_id": matches["id"].to_numpy(),
+                "day": pd.to_datetime(matches["match_date"]).to_numpy().astype("datetime64[D]").astype(np.int64),
+                "home": home,
+                "away": away,
+                "h_score": matches["h_score"].to_numpy(),
+                "a_score": matches["a_score"].to_numpy(),
+            }
+            common = min(self.n, len(matches))
+            differs = np.zeros(common, dtype=bool)
+            for name, values in new.items():
+                differs |= self.column(name, common) != values[:common]
+            first = int(np.argmax(differs)) if differs.any() else common
+            if first < self.n:
+                self._truncate(first)
+            for row in zip(*(values[first:].tolist() for values in new.values())):
+                self.add_match(*row)
+            self.matches = matches
+
+    def ratings(self, date=None):
+        """Every team's rating after its last match on or before ``date`` (default: its latest)."""
+        with self._lock:
+            n = self.n if date is None else int(np.searchsorted(self.column("day"), _day(date), side="right"))
+            rating, _ = self._latest(n)
+            names = list(self.teams)
+        return pd.Series(rating, index=pd.Index(names, name="team"), name="rating")
+
+    def history(self, teams=None):
+        """Rating after each match day, one column per team (all teams by default), forward filled."""
+        with self._lock:
+            day = np.concatenate([self.column("day")] * 2)
+            team = np.concatenate([self.column("home"), self.column("away")])
+            delta = self.column("delta")
+            after = np.concatenate([self.column("home_before") + delta, self.column("away_before") - delta])
+            rows = np.concatenate([np.arange(self.n)] * 2)
+            names = np.asarray(self.teams, dtype=object)
+        df = pd.DataFrame({"row": rows, "date": day.astype("datetime64[D]"), "team": names[team], "rating": after})
+        if teams is not None:
+            df = df[df["team"].isin(teams)]
+        # In match order, so a team's last rating of a day is the one kept
+        df = df.sort_values("row", kind="stable")
+        return df.pivot_table(index="date", columns="team", values="rating", aggfunc="last").ffill()
+
+    def season_summary(self, season):
+        """Per team in ``season``: its ratings at the start and end, and its results against expectation."""
+        with self._lock:
+            rows = np.flatnonzero(self.column("season") == season)
+            home, away, h, a, rh, ra, delta = (self.column(c)[rows] for c in
+                                               ("home", "away", "h_score", "a_score", "home_before",
+                                                "away_before", "delta"))
+            names = list(self.teams)
+        n = len(names)
+        expected = expected_score(rh.astype(np.float64), ra)
+        result = np.where(h > a, 1.0, np.where(h == a, 0.5, 0.0))
+        team = np.concatenate([home, away])
+        before = np.concatenate([rh, ra]).astype(np.float64)
+        after = np.concatenate([rh + delta, ra - delta]).astype(np.float64)
+        opponent = np.concatenate([ra, rh]).astype(np.float64)
+        order = np.lexsort((np.concatenate([np.arange(len(rows))] * 2), team))
+        team_sorted = team[order]
+        starts = np.r_[True, team_sorted[1:] != team_sorted[:-1]] if len(team) else np.zeros(0, dtype=bool)
+        ends = np.r_[team_sorted[1:] != team_sorted[:-1], True] if len(team) else np.zeros(0, dtype=bool)
+        start_rating, end_rating = np.full(n, np.nan), np.full(n, np.nan)
+        start_rating[team_sorted[starts]] = before[order][starts]
+        end_rating[team_sorted[ends]] = after[order][ends]
+
+        played = np.bincount(team, minlength=n)
+        df = pd.DataFrame({
+            "team": names,
+            "played": played,
+            "start_rating": start_rating,
+            "end_rating": end_rating,
+            "rating_change": end_rating - start_rating,
+            "avg_opponent_rating": np.bincount(team, opponent, n) / np.maximum(played, 1),
+            "expected_score": np.bincount(team, np.concatenate([expected, 1 - expected]), n),
+            "actual_score": np.bincount(team, np.concatenate([result, 1 - result]), n),
+        })
+        df["above_expectation"] = df["actual_score"] - df["expected_score"]
+        return df[df["played"] > 0].sort_values(["above_expectation", "team"], ascending=[False, True],
+                                                ignore_index=True)
+
+
+def _day(date):
+    return np.datetime64(date, "D").astype(np.int64)
+
+
+_engine = RatingEngine()
+
+
+def get_engine():
+    """The RatingEngine, brought up to date whenever the cached head_to_head_matches result changes."""
+    _engine.refresh(run_query("head_to_head_matches"))
+    return _engine
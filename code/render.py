@@ -0,0 +1,162 @@
+"""Render every report to files, for analysts and for the app's cold start.
+
+    python code/render.py --out snapshots [--format parquet|csv] [--workers N] [--season 2021 ...]
+
+Runs every report for every parameter the pages offer, in each season:
+each city, each referee, each team on its own and all teams together, every
+set of field positions within each position, and every age from 15 to 45.
+The calls are spread over a process pool and each result is written to
+<out>/<season>/<report>/<parameters>.<format>, with manifest.json listing
+them all. Pointing snapshot_dir in the [app] section of database.ini at the
+directory lets the app serve them (see snapshots.py).
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cache
+import db
+import snapshots
+import warmup
+from queries import QUERIES, compute_query, run_query
+
+# The range of the age slider on the Players page
+AGES = range(15, 46)
+
+log = logging.getLogger(__name__)
+
+
+def _subsets(items):
+    return [list(c) for n in range(1, len(items) + 1) for c in itertools.combinations(items, n)]
+
+
+def jobs(seasons):
+    """Every (report, params) the pages can ask for in ``seasons``."""
+    result = [(name, {}) for name, query in QUERIES.items() if not query.params]
+    positions = {p: run_query("position_names", position=p)["pos"].tolist() for p in warmup.POSITIONS}
+    result += [("position_names", {"position": p}) for p in warmup.POSITIONS]
+    for season in seasons:
+        result += [(name, {"season": season}) for name, query in QUERIES.items()
+                   if query.params == ("season",)]
+        result += [(name, {"season": season, "age": age})
+                   for name in ("scorers_above_age", "scorers_below_age") for age in AGES]
+        result += [("top_scoring_teams_in_city", {"season": season, "city": city})
+                   for city in run_query("season_cities", season=season)["city"].tolist()]
+        result += [("referee_home_teams", {"season": season, "referee": referee})
+                   for referee in run_query("season_referee_names", season=season)["name"].tolist()]
+        teams = run_query("season_team_names", season=season)["name"].tolist()
+        result += [("top_goal_scorers", {"season": season, "teams": t}) for t in [teams] + [[t] for t in teams]]
+        result += [("scorers_by_position_and_nationality", {"season": season, "position": p, "positions": names})
+                   for p, all_names in positions.items() for names in _subsets(all_names)]
+    return result
+
+
+def snapshot_path(name, params, fmt):
+    """Where a report call's file goes, relative to the output directory."""
+    season = params.get("season", "all")
+    scalars = [str(v) for k, v in params.items() if k != "season" and not isinstance(v, list)]
+    stem = re.sub(r"[^\w.-]+", "_", "-".join(scalars)) or "all"
+    if any(isinstance(v, list) for v in params.values()):
+        digest = hashlib.sha1(json.dumps(cache.freeze(params)).encode()).hexdigest()[:12]
+        stem = f"{stem}-{digest}" if scalars else digest
+    return os.path.join(str(season), name, f"{stem}.{fmt}")
+
+
+def _render(name, params, out_dir, fmt):
+    start = time.perf_counter()
+    df = compute_query(name, **params)
+    path = snapshot_path(name, params, fmt)
+    os.makedirs(os.path.dirname(os.path.join(out_dir, path)), exist_ok=True)
+    snapshots.write_frame(df, os.path.join(out_dir, path), fmt)
+    return {"report": name, "params": params, "values": [params[p] for p in QUERIES[name].params],
+            "path": path, "rows": len(df), "bytes": os.path.getsize(os.path.join(out_dir, path)),
+            "seconds": time.perf_counter() - start}
+
+
+def _remove_rendering(out_dir):
+    """Delete the files an earlier manifest in ``out_dir`` lists, and the directories they leave empty.
+
+    Anything else in ``out_dir`` is kept.
+    """
+    path = os.path.join(out_dir, snapshots.MANIFEST)
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        entries = json.load(f)["reports"]
+    root = os.path.realpath(out_dir)
+    directories = set()
+    for entry in entries:
+        file = os.path.realpath(os.path.join(root, entry["path"]))
+        if os.path.commonpath([root, file]) != root:
+            log.warning("not removing %s, which is outside %s", entry["path"], out_dir)
+            continue
+        try:
+            os.remove(file)
+        except FileNotFoundError:
+            pass
+        directory = os.path.dirname(file)
+        while directory != root and directory not in directories:
+            directories.add(directory)
+            directory = os.path.dirname(directory)
+    os.remove(path)
+    # Deepest first, so a season's directory is tried after its reports'
+    for directory in sorted(directories, key=len, reverse=True):
+        try:
+            os.rmdir(directory)
+        except OSError:
+            pass
+
+
+def render(out_dir, fmt="parquet", workers=None, seasons=None):
+    """Render every report into ``out_dir`` and write its manifest, returning the manifest."""
+    start = time.perf_counter()
+    backend = db.get_backend()
+    # Stamp before rendering, so a change made meanwhile makes the affected snapshots stale
+    version = db.data_version() if backend == "postgres" else None
+    if seasons is None:
+        seasons = run_query("seasons")["season"].tolist()
+    todo = jobs(seasons)
+
+    # Replace any earlier rendering, whose files the new manifest wouldn't list
+    _remove_rendering(out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    # spawn, so no worker inherits the pool's connections
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = [executor.submit(_render, name, params, out_dir, fmt) for name, params in todo]
+        entries = []
+        for (name, params), future in zip(todo, futures):
+            try:
+                entries.append(future.result())
+            except Exception:
+                log.exception("rendering %s %s failed", name, params)
+
+    manifest = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "backend": backend, "format": fmt,
+                "data_version": snapshots.encode_version(version), "seasons": seasons, "reports": entries}
+    snapshots.write_manifest(out_dir, manifest)
+    log.info("rendered %d of %d reports (%d rows, %.1f MB) in %.1fs", len(entries), len(todo),
+             sum(e["rows"] for e in entries), sum(e["bytes"] for e in entries) / 2**20,
+             time.perf_counter() - start)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--format", choices=snapshots.FORMATS, default=snapshots.FORMATS[0])
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--season", type=int, action="append", help="default: every season")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    render(args.out, args.format, args.workers, args.season)
+
+
+if __name__ == "__main__":
+    main()
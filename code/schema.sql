@@ -1,3 +1,4 @@
+DROP TABLE IF EXISTS Seasons CASCADE;
 DROP TABLE IF EXISTS Managers CASCADE;
 DROP TABLE IF EXISTS Referees CASCADE;
 DROP TABLE IF EXISTS Positions CASCADE;
@@ -5,11 +6,25 @@ DROP TABLE IF EXISTS Stadiums CASCADE;
 DROP TABLE IF EXISTS Teams_Owner_Managed_Located CASCADE;
 DROP TABLE IF EXISTS Standings_Pertain_to CASCADE;
 DROP TABLE IF EXISTS Players_Plays_In_Plays_for CASCADE;
+DROP TABLE IF EXISTS Player_Season_Team CASCADE;
 DROP TABLE IF EXISTS Matches_Held_at CASCADE;
 DROP TABLE IF EXISTS Officiated_by CASCADE;
 DROP TABLE IF EXISTS Teams_Play_Matches CASCADE;
 DROP TABLE IF EXISTS Goals_Scored CASCADE;
+DROP TABLE IF EXISTS Team_Match CASCADE;
+DROP TABLE IF EXISTS team_season_stats CASCADE;
+DROP TABLE IF EXISTS player_season_stats CASCADE;
+DROP TABLE IF EXISTS referee_stats CASCADE;
+DROP TABLE IF EXISTS stadium_stats CASCADE;
 
+DROP FUNCTION IF EXISTS create_season(integer);
+
+
+-- Seasons are keyed by the year they start in, e.g. 2021 for 2021-22
+create table Seasons (
+	season integer primary key,
+	label varchar(16) not null
+);
 
 create table Managers (
     id integer primary key,
@@ -54,6 +69,7 @@ create table Teams_Owner_Managed_Located (
 );
 
 create table Standings_Pertain_to (
+	season integer not null,
 	id integer,
 	pld integer,
 	wins integer,
@@ -63,7 +79,8 @@ create table Standings_Pertain_to (
 	ga integer,
 	points integer,
 	T_id integer,
-	primary key (T_id, id),
+	primary key (season, T_id, id),
+	foreign key (season) references Seasons(season) on delete cascade,
 	foreign key (T_id) references Teams_Owner_Managed_Located(id) on delete cascade
 );
 
@@ -87,8 +104,25 @@ create table Players_Plays_In_Plays_for (
 	foreign key (T_id) references Teams_Owner_Managed_Located(id)
 );
 
+-- The team each player played for in each season. Players_Plays_In_Plays_for
+-- is upserted by every load, so its T_id is the team in the latest season
+-- loaded; per-season reports attribute a player's goals through this table.
+create table Player_Season_Team (
+	season integer not null,
+	player_id integer not null,
+	team_id integer not null,
+	primary key (season, player_id),
+	foreign key (season) references Seasons(season) on delete cascade,
+	foreign key (player_id) references Players_Plays_In_Plays_for(id) on delete cascade,
+	foreign key (team_id) references Teams_Owner_Managed_Located(id)
+);
+
+-- Match-grain tables are list-partitioned by season (one partition per
+-- season, created by create_season() below), so per-season reports only
+-- touch that season's partition. Ids are unique within a season.
 create table Matches_Held_at (
-	id integer primary key,
+	season integer not null,
+	id integer not null,
 	team1_id integer,
 	team2_id integer,
 	h_score integer,
@@ -97,31 +131,36 @@ create table Matches_Held_at (
 	captain1_id integer not null,
 	captain2_id integer not null,
 	stadium_id integer not null,
+	primary key (season, id),
+	foreign key (season) references Seasons(season),
 	foreign key (stadium_id) references Stadiums(id),
 	foreign key (captain1_id) references Players_Plays_In_Plays_for(id),
 	foreign key (captain2_id) references Players_Plays_In_Plays_for(id)
-);
+) partition by list (season);
 
 create table Officiated_by (
+	season integer not null,
 	match_id integer,
 	referee_id integer,
-	primary key (match_id, referee_id),
-	foreign key (match_id) references Matches_held_at(id),
+	primary key (season, match_id, referee_id),
+	foreign key (season, match_id) references Matches_held_at(season, id),
 	foreign key (referee_id) references Referees(id)
-);
+) partition by list (season);
 
 create table Teams_Play_Matches (
+	season integer not null,
 	match_id integer,
 	team1_id integer,
 	team2_id integer,
-	primary key (match_id, team1_id, team2_id),
-	foreign key (match_id) references Matches_Held_at(id),
+	primary key (season, match_id, team1_id, team2_id),
+	foreign key (season, match_id) references Matches_Held_at(season, id),
 	foreign key (team1_id) references Teams_Owner_Managed_Located(id),
 	foreign key (team2_id) references Teams_Owner_Managed_Located(id)
-);
+) partition by list (season);
 
 create table Goals_Scored (
-	id integer primary key,
+	season integer not null,
+	id integer not null,
 	pen boolean,
 	goal_time integer,
 	winner boolean,
@@ -129,6 +168,155 @@ create table Goals_Scored (
 	own_goal boolean,
 	player_id integer not null,
 	match_id integer not null,
+	primary key (season, id),
 	foreign key (player_id) references Players_Plays_In_Plays_for(id),
-	foreign key (match_id) references Matches_Held_at(id)
-);
\ No newline at end of file
+	foreign key (season, match_id) references Matches_Held_at(season, id)
+) partition by list (season);
+
+-- Both sides of every match, one row per team, so team-level reports are a
+-- single pass instead of a union of the home and away columns of
+-- Matches_Held_at. Result is W, D or L from the team's point of view.
+-- Maintained by code/aggregates.py.
+create table Team_Match (
+	season integer not null,
+	match_id integer not null,
+	team_id integer not null,
+	opponent_id integer not null,
+	is_home boolean not null,
+	goals_for integer,
+	goals_against integer,
+	result char(1),
+	stadium_id integer,
+	referee_id integer,
+	match_date date,
+	primary key (season, match_id, team_id),
+	foreign key (season, match_id) references Matches_Held_at(season, id)
+) partition by list (season);
+
+-- Register a season and create its partition of every match-grain table
+create function create_season(s integer) returns void as $$
+declare t text;
+begin
+	insert into Seasons (season, label)
+	values (s, s || '-' || lpad(((s + 1) % 100)::text, 2, '0'))
+	on conflict (season) do nothing;
+	foreach t in array array['matches_held_at', 'officiated_by', 'teams_play_matches', 'goals_scored',
+	                         'team_match'] loop
+		execute format('create table if not exists %I partition of %I for values in (%s)',
+		               t || '_' || s, t, s);
+	end loop;
+end;
+$$ language plpgsql;
+
+-- Summary tables the report pages read instead of re-aggregating the base
+-- tables. Maintained by code/aggregates.py.
+create table team_season_stats (
+	season integer,
+	team_id integer,
+	matches integer,
+	wins integer,
+	draws integer,
+	losses integer,
+	home_wins integer,
+	away_wins integer,
+	goals_for integer,
+	goals_against integer,
+	clean_sheets integer,
+	player_goals integer,
+	player_penalties integer,
+	primary key (season, team_id),
+	foreign key (team_id) references Teams_Owner_Managed_Located(id) on delete cascade
+);
+
+create table player_season_stats (
+	season integer,
+	player_id integer,
+	team_id integer,
+	goals integer,
+	penalties integer,
+	winners integer,
+	equalizers integer,
+	own_goals integer,
+	hattricks integer,
+	primary key (season, player_id),
+	foreign key (player_id) references Players_Plays_In_Plays_for(id) on delete cascade
+);
+
+create table referee_stats (
+	season integer,
+	referee_id integer,
+	home_team_id integer,
+	matches integer,
+	home_wins integer,
+	home_losses integer,
+	home_draws integer,
+	penalties integer,
+	primary key (season, referee_id, home_team_id),
+	foreign key (referee_id) references Referees(id) on delete cascade
+);
+
+create table stadium_stats (
+	season integer,
+	stadium_id integer,
+	home_team_id integer,
+	matches integer,
+	home_goals integer,
+	away_goals integer,
+	home_wins integer,
+	away_wins integer,
+	draws integer,
+	primary key (season, stadium_id, home_team_id),
+	foreign key (stadium_id) references Stadiums(id) on delete cascade
+);
+
+-- Per-table change counters. Every statement that modifies a table bumps its
+-- row, so the app's result cache can tell when cached reports are stale. Kept
+-- across schema reloads so the stamp never moves backwards. A writer that only
+-- touches one season says so with set_config('app.season', ...) and its bumps
+-- are counted against that season, so the cache keeps every other season's
+-- reports; season 0 means any season.
+create table if not exists Data_Version (
+	table_name varchar(128) not null,
+	season integer not null default 0,
+	version bigint not null default 0,
+	updated_at timestamp not null default now(),
+	primary key (table_name, season)
+);
+
+-- Counters kept from before they were split by season
+do $$
+begin
+	if not exists (select 1 from information_schema.columns
+	               where table_name = 'data_version' and column_name = 'season') then
+		alter table Data_Version add column season integer not null default 0;
+		alter table Data_Version drop constraint data_version_pkey, add primary key (table_name, season);
+	end if;
+end;
+$$;
+
+create or replace function bump_data_version() returns trigger as $$
+begin
+	insert into Data_Version (table_name, season, version, updated_at)
+	values (lower(TG_TABLE_NAME), coalesce(nullif(current_setting('app.season', true), '')::integer, 0),
+	        1, now())
+	on conflict (table_name, season)
+	do update set version = Data_Version.version + 1, updated_at = now();
+	return null;
+end;
+$$ language plpgsql;
+
+do $$
+declare t text;
+begin
+	foreach t in array array['seasons', 'managers', 'referees', 'positions', 'stadiums',
+	                         'teams_owner_managed_located', 'standings_pertain_to',
+	                         'players_plays_in_plays_for', 'player_season_team', 'matches_held_at',
+	                         'officiated_by', 'teams_play_matches', 'goals_scored',
+	                         'team_match', 'team_season_stats', 'player_season_stats',
+	                         'referee_stats', 'stadium_stats'] loop
+		execute format('create trigger %I after insert or update or delete or truncate on %I
+		                for each statement execute function bump_data_version()',
+		               t || '_data_version', t);
+	end loop;
+end;
+$$;
@@ -0,0 +1,131 @@
+"""Name search over players, teams and referees.
+
+The names from the search_names query are indexed in memory: a sorted word
+list for prefix lookups, and a trigram posting list per distinct word for
+typo-tolerant ones. Each query word is scored against every indexed word,
+1 for a prefix and otherwise pg_trgm's trigram similarity (shared trigrams
+over distinct trigrams of the two), and a name scores the mean over the
+query's words of its best-matching word. The work is proportional to the
+number of distinct words plus the names holding a word that matches at all.
+"""
+import bisect
+import re
+import threading
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from queries import run_query
+
+# pg_trgm's default similarity threshold
+MIN_SCORE = 0.3
+
+
+def normalize(text):
+    """Lower-case ``text`` without accents or punctuation, e.g. "Ødegaard" -> "odegaard"."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c)).casefold()
+    return " ".join(re.findall(r"\w+", text.replace("ø", "o").replace("ß", "ss")))
+
+
+def trigrams(word):
+    # Padded as pg_trgm does, so short words and word starts still have trigrams
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """Prefix and trigram index over a frame of kind, id, name, detail."""
+
+    def __init__(self, entries):
+        self.entries = entries.reset_index(drop=True)
+        names = [normalize(name) for name in self.entries["name"]]
+        self._kinds = self.entries["kind"].to_numpy()
+        self._names = self.entries["name"].to_numpy()
+        self._lengths = np.array([len(name) for name in names])
+
+        self.words = sorted({word for name in names for word in name.split()})
+        word_id = {word: i for i, word in enumerate(self.words)}
+        # The rows each word appears in, as one array sliced at _word_start
+        rows, words = [], []
+        for row, name in enumerate(names):
+            for word in dict.fromkeys(name.split()):
+                rows.append(row)
+                words.append(word_id[word])
+        order = np.argsort(np.array(words, dtype=np.int64), kind="stable")
+        self._word_rows = np.array(rows, dtype=np.int64)[order]
+        self._word_start = np.searchsorted(np.array(words, dtype=np.int64)[order], np.arange(len(self.words) + 1))
+
+        postings = {}
+        self._gram_counts = np.zeros(len(self.words), dtype=np.float64)
+        for i, word in enumerate(self.words):
+            grams = trigrams(word)
+            self._gram_counts[i] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(i)
+        self._postings = {gram: np.array(ids, dtype=np.int64) for gram, ids in postings.items()}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _word_scores(self, token):
+        """Score of ``token`` against every indexed word."""
+        grams = trigrams(token)
+        shared = np.zeros(len(self.words))
+        for gram in grams:
+            ids = self._postings.get(gram)
+            if ids is not None:
+                shared[ids] += 1
+        scores = shared / (len(grams) + self._gram_counts - shared)
+        lo = bisect.bisect_left(self.words, token)
+        hi = bisect.bisect_left(self.words, token + "\U0010ffff")
+        scores[lo:hi] = 1.0
+        return scores
+
+    def search(self, query, kinds=None, limit=10, min_score=MIN_SCORE):
+        """The best ``limit`` entries for ``query``, best first, with a score column.
+
+        ``kinds`` restricts the results to some of "player", "team" and "referee".
+        """
+        tokens = normalize(query).split()
+        if not tokens or not self.words:
+            return self.entries.iloc[:0].assign(score=pd.Series(dtype=float))
+        total = np.zeros(len(self.entries))
+        for token in tokens:
+            # Only the rows holding a word that shares something with the token
+            scores = self._word_scores(token)
+            candidates = np.flatnonzero(scores)
+            starts = self._word_start[candidates]
+            counts = self._word_start[candidates + 1] - starts
+            offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            best = np.zeros(len(self.entries))
+            np.maximum.at(best, self._word_rows[np.repeat(starts, counts) + offsets],
+                          np.repeat(scores[candidates], counts))
+            total += best
+        total /= len(tokens)
+
+        keep = total >= min_score
+        if kinds is not None:
+            keep &= np.isin(self._kinds, list(kinds))
+        rows = np.flatnonzero(keep)
+        # Best score first, then shorter names (closer to the query), then alphabetical
+        order = np.lexsort((self._names[rows], self._lengths[rows], -total[rows]))[:limit]
+        return self.entries.iloc[rows[order]].assign(score=total[rows[order]]).reset_index(drop=True)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """The SearchIndex, rebuilt whenever the cached search_names result changes."""
+    global _index
+    entries = run_query("search_names")
+    with _index_lock:
+        if _index is not None and _index[0] is entries:
+            return _index[1]
+    index = SearchIndex(entries)
+    with _index_lock:
+        _index = (entries, index)
+    return index
@@ -0,0 +1,122 @@
+"""Report results rendered to disk ahead of time by render.py.
+
+A snapshot directory holds one file per report and parameter set, plus a
+manifest.json listing them with the backend and data-version stamp they
+were rendered at. With snapshot_dir set in the [app] section of
+database.ini, run_query answers a cache miss from the snapshot file when
+there is one and no data it depends on has changed since, so a freshly
+started app can fill its cache without running the queries.
+"""
+import json
+import logging
+import os
+import threading
+
+import pandas as pd
+
+import cache
+import db
+
+MANIFEST = "manifest.json"
+FORMATS = ("parquet", "csv")
+
+log = logging.getLogger(__name__)
+
+
+def snapshot_key(name, values):
+    """Cache-style key of a report call, with list parameters in sorted order.
+
+    The list parameters are matched with ANY(), so their order doesn't matter.
+    """
+    return name, cache.freeze([sorted(v) if isinstance(v, (list, tuple)) else v for v in values])
+
+
+def read_frame(path):
+    return pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+
+
+def write_frame(df, path, fmt):
+    if fmt == "parquet":
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+def encode_version(version):
+    # JSON has no tuple keys, so the (table, season) stamp is stored as rows
+    if isinstance(version, dict):
+        return [[table, season, counter] for (table, season), counter in sorted(version.items())]
+    return version
+
+
+def decode_version(version):
+    if isinstance(version, list):
+        return {(table, season): counter for table, season, counter in version}
+    return version
+
+
+def write_manifest(directory, manifest):
+    path = os.path.join(directory, MANIFEST)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(path + ".tmp", path)
+
+
+class SnapshotStore:
+    """Lookup of the snapshots listed in a directory's manifest."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST)) as f:
+            manifest = json.load(f)
+        self.backend = manifest["backend"]
+        self.version = decode_version(manifest["data_version"])
+        self.created = manifest["created"]
+        self._entries = {snapshot_key(e["report"], e["values"]): e for e in manifest["reports"]}
+        self.hits = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, name, values, scope, version):
+        """The snapshot of ``name`` called with ``values``, or None if there is none or it is stale.
+
+        ``version`` is the current data-version stamp, and ``scope`` the
+        call's result cache scope.
+        """
+        entry = self._entries.get(snapshot_key(name, values))
+        if entry is None or cache.changed(scope, self.version, version):
+            return None
+        try:
+            df = read_frame(os.path.join(self.directory, entry["path"]))
+        except Exception:
+            log.exception("reading snapshot %s failed", entry["path"])
+            return None
+        self.hits += 1
+        return df
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """The configured SnapshotStore, or None if there is none for this backend."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = False
+                directory = db.get_config(section="app", optional=True).get("snapshot_dir")
+                if directory:
+                    try:
+                        store = SnapshotStore(directory)
+                    except (OSError, ValueError, KeyError):
+                        log.exception("no usable snapshots in %s", directory)
+                    else:
+                        if store.backend == db.get_backend():
+                            _store = store
+                        else:
+                            log.warning("snapshots in %s are from the %s backend, ignoring them",
+                                        directory, store.backend)
+    return _store or None
@@ -0,0 +1,178 @@
+"""League table on any date of a season, from the match results.
+
+Standings_Pertain_to only holds the final table. Timeline walks a season's
+matches in date order and keeps every team's played, won, drawn, lost,
+goals and points as cumulative arrays with one row per match day. The table
+on any date is then a single row lookup, and league positions are ranked
+once per match day. When matches are added or rescored, only the match
+days from the first one affected are updated.
+"""
+import copy
+import threading
+
+import numpy as np
+import pandas as pd
+
+from queries import run_query
+
+COLUMNS = ["pld", "wins", "draws", "losses", "gf", "ga", "points"]
+PLD, WINS, DRAWS, LOSSES, GF, GA, POINTS = range(len(COLUMNS))
+
+
+class Timeline:
+    """Cumulative standings after every match day of one season.
+
+    ``totals[d, t]`` holds team ``t``'s COLUMNS after all matches on or
+    before ``dates[d]``, and ``positions[d, t]`` its league position then
+    (ranked on points, goal difference, goals scored, then name).
+    """
+
+    def __init__(self, teams, dates):
+        self.teams = np.asarray(sorted(teams), dtype=object)
+        self.dates = np.asarray(sorted(set(dates)), dtype="datetime64[D]")
+        self._team_index = {team: i for i, team in enumerate(self.teams)}
+        self.totals = np.zeros((len(self.dates), len(self.teams), len(COLUMNS)), dtype=np.int64)
+        self.positions = np.zeros((len(self.dates), len(self.teams)), dtype=np.int64)
+
+    @classmethod
+    def from_matches(cls, matches, teams=None):
+        """Build from a frame of match_date, home_team, away_team, h_score, a_score."""
+        if teams is None:
+            teams = set(matches["home_team"]) | set(matches["away_team"])
+        timeline = cls(teams, [])
+        timeline.apply(matches)
+        return timeline
+
+    def apply(self, matches, sign=1):
+        """Add the results in ``matches`` (take them away with ``sign`` -1), re-ranking from their first day on."""
+        if not len(matches):
+            return
+        dates = _dates(matches)
+        new = np.setdiff1d(dates, self.dates)
+        if len(new):
+            at = np.searchsorted(self.dates, new)
+            # A new match day starts from the totals of the day before it
+            before = np.zeros((len(new),) + self.totals.shape[1:], dtype=np.int64)
+            before[at > 0] = self.totals[at[at > 0] - 1]
+            self.dates = np.insert(self.dates, at, new)
+            self.totals = np.insert(self.totals, at, before, axis=0)
+            self.positions = np.insert(self.positions, at, 0, axis=0)
+        day = np.searchsorted(self.dates, dates)
+        home = np.array([self._team_index[t] for t in matches["home_team"]], dtype=np.int64)
+        away = np.array([self._team_index[t] for t in matches["away_team"]], dtype=np.int64)
+        h = matches["h_score"].to_numpy(dtype=np.int64)
+        a = matches["a_score"].to_numpy(dtype=np.int64)
+
+        # Each match's effect on both teams, summed per match day and accumulated
+        changes = np.zeros_like(self.totals)
+        for team, gf, ga in ((home, h, a), (away, a, h)):
+            np.add.at(changes, (day, team), sign * _deltas(gf, ga))
+        self.totals += np.cumsum(changes, axis=0)
+        self._rank(int(day.min()))
+
+    def updated(self, old, new):
+        """A copy brought from the matches in ``old`` to those in ``new``, or None if it must be rebuilt.
+
+        Both are in date order, so the old rows from the first one that
+        differs on are taken away and the new rows from there added: a new
+        match day only applies its own matches. A rebuild is needed when a
+        row names a team the timeline doesn't have, or when a match day
+        would be left without matches.
+        """
+        common = min(len(old), len(new))
+        differs = np.zeros(common, dtype=bool)
+        for column in new.columns:
+            differs |= old[column].to_numpy()[:common] != new[column].to_numpy()[:common]
+        first = int(np.argmax(differs)) if differs.any() else common
+        removed, added = old.iloc[first:], new.iloc[first:]
+        if not (set(added["home_team"]) | set(added["away_team"])) <= set(self._team_index):
+            return None
+        if len(np.setdiff1d(_dates(removed), _dates(new))):
+            return None
+        timeline = copy.copy(self)
+        timeline.totals, timeline.positions = self.totals.copy(), self.positions.copy()
+        timeline.apply(removed, -1)
+        timeline.apply(added)
+        return timeline
+
+    def _rank(self, start):
+        totals = self.totals[start:]
+        gd = totals[..., GF] - totals[..., GA]
+        name_rank = np.arange(len(self.teams))  # teams are sorted by name
+        for d in range(len(totals)):
+            order = np.lexsort((name_rank, -totals[d, :, GF], -gd[d], -totals[d, :, POINTS]))
+            self.positions[start + d, order] = np.arange(1, len(self.teams) + 1)
+
+    def _zeros(self):
+        return np.zeros((len(self.teams), len(COLUMNS)), dtype=np.int64)
+
+    def day(self, date):
+        """Index of the last match day on or before ``date``, or -1 before the first."""
+        return int(np.searchsorted(self.dates, np.datetime64(date, "D"), side="right")) - 1
+
+    def table_on(self, date):
+        """The league table as it stood at the end of ``date``."""
+        d = self.day(date)
+        totals = self.totals[d] if d >= 0 else self._zeros()
+        positions = self.positions[d] if d >= 0 else np.arange(1, len(self.teams) + 1)
+        df = pd.DataFrame(totals, columns=COLUMNS)
+        df.insert(0, "team", self.teams)
+        df.insert(0, "position", positions)
+        df.insert(len(df.columns) - 1, "gd", df["gf"] - df["ga"])
+        return df.sort_values("position", ignore_index=True)
+
+    def position_history(self):
+        """League position of every team after each match day, one column per team."""
+        return pd.DataFrame(self.positions, index=pd.DatetimeIndex(self.dates, name="date"),
+                            columns=self.teams)
+
+    def cross_check(self, final):
+        """Rows where the last match day disagrees with ``final`` (the final_standings query)."""
+        ours = self.table_on(self.dates[-1]).set_index("team")[COLUMNS] if len(self.dates) else None
+        mismatches = []
+        for row in final.itertuples(index=False):
+            for column in COLUMNS:
+                expected = getattr(row, column)
+                actual = ours.at[row.team, column] if ours is not None and row.team in ours.index else None
+                if actual != expected:
+                    mismatches.append({"team": row.team, "column": column,
+                                       "timeline": actual, "standings": expected})
+        return pd.DataFrame(mismatches, columns=["team", "column", "timeline", "standings"])
+
+
+def _dates(matches):
+    return pd.to_datetime(matches["match_date"]).to_numpy().astype("datetime64[D]")
+
+
+def _deltas(gf, ga):
+    """Each match's change to COLUMNS for the team that scored ``gf`` and conceded ``ga``."""
+    gf, ga = np.asarray(gf), np.asarray(ga)
+    win, draw, loss = gf > ga, gf == ga, gf < ga
+    return np.stack([np.ones_like(gf), win, draw, loss, gf, ga, 3 * win + draw], axis=-1).astype(np.int64)
+
+
+_timelines = {}
+_timelines_lock = threading.Lock()
+
+
+def get_timeline(season):
+    """The season's Timeline, brought up to date whenever the cached season_matches result changes.
+
+    Matches added or rescored since the last call are applied to the
+    previous Timeline; it is only rebuilt when the season's teams change.
+    """
+    matches = run_query("season_matches", season=season)
+    with _timelines_lock:
+        cached = _timelines.get(season)
+        if cached is not None and cached[0] is matches:
+            return cached[1]
+    teams = set(run_query("final_standings", season=season)["team"]) | set(matches["home_team"]) | \
+        set(matches["away_team"])
+    timeline = None
+    if cached is not None and set(cached[1].teams) == teams:
+        timeline = cached[1].updated(cached[0], matches)
+    if timeline is None:
+        timeline = Timeline.from_matches(matches, teams)
+    with _timelines_lock:
+        _timelines[season] = (matches, timeline)
+    return timeline
@@ -0,0 +1,279 @@
+"""Generate synthetic data sets in the layout of data/*.csv.
+
+    python code/synth.py --out synth [--seasons 2] [--teams 20] [--players 30]
+                         [--referees 22] [--goals-per-match 2.8] [--seed 0]
+
+Writes one directory per season (synth/2021, synth/2022, ...) that
+load_data.py can load, the first without --append and the rest with it.
+Attributes are sampled from the reference data (data/ by default): names,
+ages, nationalities, positions and squad sizes from its rows, goal times
+and the penalty and own-goal rates from its goal log, home and away goals
+per match from its results, and each position's share of the goals. Each
+season is a double round robin, and scores, standings and the winner and
+equalizer flags are consistent with the generated goals.
+"""
+import argparse
+import csv
+import datetime
+import os
+from collections import Counter
+
+import numpy as np
+
+CODE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(os.path.dirname(CODE_DIR), "data")
+
+FILES = ["Managers.csv", "Referees.csv", "Positions.csv", "Stadiums.csv",
+         "Teams_Owner_Managed_Located.csv", "Standings_Pertain_To.csv",
+         "Players_Plays_In_Plays_for.csv", "Matches_Held_At.csv", "Officiated_by.csv",
+         "Teams_Play_Matches.csv", "Goals_Scored.csv"]
+
+# Days from the first match day to the last, as in a Premier League season
+SEASON_DAYS = 280
+
+
+def _read(data_dir, filename):
+    with open(os.path.join(data_dir, filename), newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        return header, [dict(zip(header, row)) for row in reader]
+
+
+def _write(path, header, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(header)
+        writer.writerows([row[c] for c in header] for row in rows)
+
+
+def _copy_name(name, copy):
+    return name if copy == 1 else f"{name} {copy}"
+
+
+def _fixtures(n_teams):
+    """Double round robin by the circle method, as a list of rounds of (home, away) indexes."""
+    teams = list(range(n_teams)) + ([None] if n_teams % 2 else [])
+    half = []
+    for r in range(len(teams) - 1):
+        pairs = [(teams[i], teams[-1 - i]) for i in range(len(teams) // 2)]
+        # Alternate venues so nobody is at home every week
+        half.append([(a, b) if (r + i) % 2 else (b, a) for i, (a, b) in enumerate(pairs)
+                     if a is not None and b is not None])
+        teams = [teams[0], teams[-1]] + teams[1:-1]
+    return half + [[(b, a) for a, b in matches] for matches in half]
+
+
+class Generator:
+    """Samples every table from the rows of a reference data set."""
+
+    def __init__(self, reference_dir=DATA_DIR, seed=0):
+        self.rng = np.random.default_rng(seed)
+        self.headers = {}
+        self.ref = {}
+        for filename in FILES:
+            self.headers[filename], self.ref[filename] = _read(reference_dir, filename)
+
+        positions = {r["pos"]: r["pos_type"] for r in self.ref["Positions.csv"]}
+        players = self.ref["Players_Plays_In_Plays_for.csv"]
+        goals = self.ref["Goals_Scored.csv"]
+        matches = self.ref["Matches_Held_At.csv"]
+        player_type = {p["id"]: positions[p["pos"]] for p in players}
+
+        # How much more often than its share of the squad each position type scores
+        squad = Counter(player_type.values())
+        scored = Counter(player_type[g["player_id"]] for g in goals if g["own_goal"] == "0")
+        self.scoring_weight = {t: (scored[t] + 1) / (sum(scored.values()) + 1) / (n / len(players))
+                               for t, n in squad.items()}
+        self.position_type = positions
+        self.squad_sizes = list(Counter(p["T_id"] for p in players).values())
+        self.goal_times = [int(g["goal_time"]) for g in goals]
+        self.pen_rate = np.mean([g["pen"] == "1" for g in goals])
+        self.own_goal_rate = np.mean([g["own_goal"] == "1" for g in goals])
+        self.home_goals = np.mean([int(m["h_score"]) for m in matches])
+        self.away_goals = np.mean([int(m["a_score"]) for m in matches])
+
+    def _pick(self, rows):
+        return rows[self.rng.integers(len(rows))]
+
+    def shared(self, teams, players, referees):
+        """Managers, referees, positions, stadiums, teams and players, keyed by file name."""
+        ref = self.ref
+        ref_teams = ref["Teams_Owner_Managed_Located.csv"]
+        ref_stadiums = {s["id"]: s for s in ref["Stadiums.csv"]}
+        tables = {"Positions.csv": ref["Positions.csv"], "Managers.csv": [], "Stadiums.csv": [],
+                  "Teams_Owner_Managed_Located.csv": [], "Referees.csv": []}
+
+        for i in range(1, teams + 1):
+            base = ref_teams[(i - 1) % len(ref_teams)]
+            copy = (i - 1) // len(ref_teams) + 1
+            stadium = ref_stadiums[base["stadium_id"]]
+            manager = self._pick(ref["Managers.csv"])
+            tables["Managers.csv"].append({**manager, "id": i, "name": _copy_name(manager["name"], copy)})
+            tables["Stadiums.csv"].append({**stadium, "id": i, "name": _copy_name(stadium["name"], copy)})
+            tables["Teams_Owner_Managed_Located.csv"].append({
+                **base, "id": i, "name": _copy_name(base["name"], copy),
+                "owner_id": i, "owner_name": _copy_name(base["owner_name"], copy),
+                "manager_id": i, "stadium_id": i,
+            })
+
+        ref_referees = ref["Referees.csv"]
+        for i in range(1, referees + 1):
+            base = ref_referees[(i - 1) % len(ref_referees)]
+            copy = (i - 1) // len(ref_referees) + 1
+            tables["Referees.csv"].append({**base, "id": i, "name": _copy_name(base["name"], copy)})
+
+        ref_players = ref["Players_Plays_In_Plays_for.csv"]
+        first_names = [p["name"].split()[0] for p in ref_players]
+        last_names = [p["name"].split()[-1] for p in ref_players]
+        names = set()
+        squad = []
+        for team in range(1, teams + 1):
+            size = players or int(self.rng.choice(self.squad_sizes))
+            jerseys = self.rng.permutation(np.arange(1, 100))[:size]
+            captain = self.rng.integers(size)
+            for n in range(size):
+                base = self._pick(ref_players)
+                name = f"{self._pick(first_names)} {self._pick(last_names)}"
+                while name in names:
+                    name = f"{self._pick(first_names)} {self._pick(last_names)}"
+                names.add(name)
+                squad.append({**base, "id": len(squad) + 1, "name": name, "jersey_number": int(jerseys[n]),
+                              "captain": int(n == captain), "T_id": team, "goals": 0, "penalties": 0})
+        tables["Players_Plays_In_Plays_for.csv"] = squad
+        return tables
+
+    def season(self, season, shared, goals_per_match=None):
+        """The season-grain tables for one season played by ``shared``'s teams."""
+        rng = self.rng
+        teams = shared["Teams_Owner_Managed_Located.csv"]
+        referees = shared["Referees.csv"]
+        squads = {}
+        for p in shared["Players_Plays_In_Plays_for.csv"]:
+            squads.setdefault(p["T_id"], []).append(p)
+        weights = {}
+        for team_id, squad in squads.items():
+            w = np.array([self.scoring_weight.get(self.position_type[p["pos"]], 0) for p in squad])
+            weights[team_id] = w / w.sum()
+        captains = {team_id: next(p["id"] for p in squad if p["captain"]) for team_id, squad in squads.items()}
+
+        scale = 1.0 if goals_per_match is None else goals_per_match / (self.home_goals + self.away_goals)
+        rounds = _fixtures(len(teams))
+        start = datetime.date(season, 8, 13)
+        matches, officials, pairings, goals = [], [], [], []
+        for r, fixtures in enumerate(rounds):
+            day = start + datetime.timedelta(days=r * SEASON_DAYS // max(len(rounds) - 1, 1))
+            for home, away in fixtures:
+                home, away = teams[home], teams[away]
+                match_id = len(matches) + 1
+                h, a = rng.poisson(self.home_goals * scale), rng.poisson(self.away_goals * scale)
+                matches.append({"id": match_id, "team_id1": home["id"], "team_id2": away["id"],
+                                "h_score": h, "a_score": a,
+                                "match_date": (day + datetime.timedelta(days=int(rng.integers(3)))).isoformat(),
+                                "captain1_id": captains[home["id"]], "captain2_id": captains[away["id"]],
+                                "stadium_id": home["stadium_id"]})
+                officials.append({"match_id": match_id, "referee_id": self._pick(referees)["id"]})
+                pairings.append({"match_id": match_id, "team1_id": home["id"], "team2_id": away["id"]})
+                goals += self._goals(match_id, home["id"], away["id"], h, a, squads, weights, len(goals))
+
+        return {"Matches_Held_At.csv": matches, "Officiated_by.csv": officials,
+                "Teams_Play_Matches.csv": pairings, "Goals_Scored.csv": goals,
+                "Standings_Pertain_To.csv": _standings(teams, matches)}
+
+    def _goals(self, match_id, home, away, h, a, squads, weights, first_id):
+        rng = self.rng
+        sides = np.array([0] * h + [1] * a)
+        rng.shuffle(sides)
+        times = np.sort(rng.choice(self.goal_times, len(sides)))
+        goals = []
+        score = [0, 0]
+        # The winner is the goal that put the eventual winner ahead for good
+        winner = (0, a + 1) if h > a else (1, h + 1) if a > h else None
+        for side, minute in zip(sides, times):
+            scoring, conceding = (home, away) if side == 0 else (away, home)
+            score[side] += 1
+            own_goal = rng.random() < self.own_goal_rate
+            if own_goal:
+                player = self._pick(squads[conceding])
+            else:
+                player = squads[scoring][rng.choice(len(squads[scoring]), p=weights[scoring])]
+            goals.append({"id": first_id + len(goals) + 1,
+                          "pen": int(not own_goal and rng.random() < self.pen_rate),
+                          "goal_time": int(minute),
+                          "winner": int(winner == (side, score[side])),
+                          "equalizer": int(score[0] == score[1]),
+                          "own_goal": int(own_goal), "player_id": player["id"], "match_id": match_id})
+        return goals
+
+    def write(self, out_dir, seasons=1, teams=20, players=None, referees=22, goals_per_match=None,
+              first_season=2021):
+        """Write every season's directory, returning [(season, path), ...]."""
+        shared = self.shared(teams, players, referees)
+        by_id = {p["id"]: p for p in shared["Players_Plays_In_Plays_for.csv"]}
+        generated = []
+        for season in range(first_season, first_season + seasons):
+            tables = self.season(season, shared, goals_per_match)
+            # The players table holds one season's totals, so give it the last season's
+            for player in by_id.values():
+                player["goals"] = player["penalties"] = 0
+            for goal in tables["Goals_Scored.csv"]:
+                if goal["own_goal"] == 0:
+                    by_id[goal["player_id"]]["goals"] += 1
+                    by_id[goal["player_id"]]["penalties"] += goal["pen"]
+            generated.append((season, tables))
+
+        paths = []
+        for season, tables in generated:
+            path = os.path.join(out_dir, str(season))
+            os.makedirs(path, exist_ok=True)
+            for filename in FILES:
+                _write(os.path.join(path, filename), self.headers[filename],
+                       tables[filename] if filename in tables else shared[filename])
+            paths.append((season, path))
+        return paths
+
+
+def _standings(teams, matches):
+    table = {t["id"]: {"T_id": t["id"], "name": t["name"], "pld": 0, "wins": 0, "draws": 0,
+                       "losses": 0, "gf": 0, "ga": 0, "points": 0} for t in teams}
+    for m in matches:
+        for team, gf, ga in ((m["team_id1"], m["h_score"], m["a_score"]),
+                             (m["team_id2"], m["a_score"], m["h_score"])):
+            row = table[team]
+            row["pld"] += 1
+            row["gf"] += gf
+            row["ga"] += ga
+            result = "wins" if gf > ga else "draws" if gf == ga else "losses"
+            row[result] += 1
+            row["points"] += {"wins": 3, "draws": 1, "losses": 0}[result]
+    ranked = sorted(table.values(), key=lambda r: (-r["points"], r["ga"] - r["gf"], -r["gf"], r["name"]))
+    return [{**row, "id": rank} for rank, row in enumerate(ranked, 1)]
+
+
+def generate(out_dir, seasons=1, teams=20, players=None, referees=22, goals_per_match=None,
+             first_season=2021, seed=0, reference_dir=DATA_DIR):
+    """Generate a data set into ``out_dir``, returning [(season, path), ...] in load order."""
+    return Generator(reference_dir, seed).write(out_dir, seasons, teams, players, referees,
+                                                goals_per_match, first_season)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--seasons", type=int, default=1)
+    parser.add_argument("--teams", type=int, default=20)
+    parser.add_argument("--players", type=int, help="players per team (default: sampled squad sizes)")
+    parser.add_argument("--referees", type=int, default=22)
+    parser.add_argument("--goals-per-match", type=float,
+                        help="mean goals per match (default: the reference data's)")
+    parser.add_argument("--first-season", type=int, default=2021)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--reference", default=DATA_DIR, help="data set to sample from")
+    args = parser.parse_args()
+
+    for season, path in generate(args.out, args.seasons, args.teams, args.players, args.referees,
+                                 args.goals_per_match, args.first_season, args.seed, args.reference):
+        print(season, path)
+
+
+if __name__ == "__main__":
+    main()
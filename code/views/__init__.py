@@ -0,0 +1,77 @@
+"""The app's pages, one module each, imported the first time they are shown.
+
+project.py only draws the sidebar and hands the chosen page to render(), so
+a session pays for the modules (and what they import) of the pages it
+visits, and a rerun executes just the one page. Each page runs as a
+Streamlit fragment: a widget on it reruns the page alone, not the sidebar
+and title around it. Import and render times are kept per page for the
+Admin page.
+"""
+import functools
+import importlib
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+
+# Menu label -> module in this package
+PAGES = {
+    "Home": "home",
+    "Teams": "teams",
+    "Players": "players",
+    "Managers": "managers",
+    "Stadiums": "stadiums",
+    "Referees": "referees",
+    "Admin": "admin",
+}
+
+_pages = {}
+_stats = {}
+_lock = threading.Lock()
+
+
+def _record(name, key, seconds):
+    with _lock:
+        stats = _stats.setdefault(name, {"import_ms": 0.0, "renders": 0, "total_ms": 0.0, "last_ms": 0.0})
+        if key == "import":
+            stats["import_ms"] = 1000 * seconds
+        else:
+            stats["renders"] += 1
+            stats["total_ms"] += 1000 * seconds
+            stats["last_ms"] = 1000 * seconds
+
+
+def _timed(name, render):
+    @functools.wraps(render)
+    def run(season):
+        start = time.perf_counter()
+        try:
+            render(season)
+        finally:
+            _record(name, "render", time.perf_counter() - start)
+    return st.fragment(run)
+
+
+def load(name):
+    """The render function of the page labelled ``name``, importing its module on first use."""
+    page = _pages.get(name)
+    if page is None:
+        start = time.perf_counter()
+        module = importlib.import_module(f"{__name__}.{PAGES[name]}")
+        _record(name, "import", time.perf_counter() - start)
+        page = _pages.setdefault(name, _timed(name, module.render))
+    return page
+
+
+def render(name, season):
+    load(name)(season)
+
+
+def timings():
+    """Per page: the import time, and the number and mean and last times of its renders."""
+    with _lock:
+        rows = [{"page": name, "import_ms": s["import_ms"], "renders": s["renders"],
+                 "mean_ms": s["total_ms"] / s["renders"] if s["renders"] else 0.0, "last_ms": s["last_ms"]}
+                for name, s in _stats.items()]
+    return pd.DataFrame(rows, columns=["page", "import_ms", "renders", "mean_ms", "last_ms"])
@@ -0,0 +1,38 @@
+"""The Admin page: report metrics, the result cache and sampled query plans."""
+import streamlit as st
+
+import cache
+import metrics
+import snapshots
+import views
+
+
+def render(season):
+    st.subheader("Admin")
+    report_metrics = metrics.get_metrics()
+
+    with st.expander("Report Queries",expanded=True):
+        summary = report_metrics.summary()
+        st.dataframe(summary.style.format({"hit_ratio": "{:.2%}", "mean_ms": "{:.1f}", "p50_ms": "{:.1f}",
+                                           "p95_ms": "{:.1f}", "max_ms": "{:.1f}"}))
+        col1, col2, col3 = st.columns(3)
+        col1.download_button("Export CSV", summary.to_csv(index=False), "report_metrics.csv", "text/csv")
+        col2.download_button("Export JSON", report_metrics.to_json(), "report_metrics.json", "application/json")
+        col3.button("Reset", on_click=report_metrics.reset)
+
+    with st.expander("Result Cache",expanded=True):
+        st.table(cache.get_cache().stats())
+        store = snapshots.get_store()
+        if store is not None:
+            st.caption(f"{len(store)} snapshots rendered at {store.created} in {store.directory}, "
+                       f"{store.hits} served.")
+
+    with st.expander("Pages",expanded=True):
+        st.dataframe(views.timings().style.format({"import_ms": "{:.1f}", "mean_ms": "{:.1f}", "last_ms": "{:.1f}"}))
+
+    with st.expander("Sampled Query Plans",expanded=True):
+        report_metrics.explain_sample = st.slider(
+            "Fraction of cache misses to EXPLAIN (ANALYZE, BUFFERS)", 0.0, 1.0, report_metrics.explain_sample)
+        for plan in list(report_metrics.plans):
+            st.markdown(f"**{plan['report']}** {plan['params']} at {plan['captured_at']}")
+            st.code(plan["plan"])
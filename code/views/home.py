@@ -0,0 +1,75 @@
+"""The Home page: a table browser and name search."""
+import logging
+
+import streamlit as st
+
+import browser
+import search
+from queries import run_query
+
+log = logging.getLogger(__name__)
+
+
+def render(season):
+    st.subheader("Home")
+
+    with st.expander("Tables"):
+        try:
+            all_table_names = run_query("table_names")["relname"].tolist()
+            table_name = st.selectbox("Choose a table", all_table_names)
+        except Exception:
+            log.exception("query on the Home page failed")
+            st.write("Sorry! Something went wrong with your query, please try again.")
+            table_name = None
+
+        if table_name:
+            st.write("Display the table")
+
+            try:
+                columns = browser.table_columns(table_name)
+                st.caption(f"About {browser.estimated_rows(table_name):,} rows")
+                shown = st.multiselect("Columns", columns, default=columns)
+                col1, col2, col3 = st.columns(3)
+                filter_column = col1.selectbox("Filter on", ["(none)"] + columns)
+                filter_op = col2.selectbox("Operator", browser.FILTER_OPERATORS)
+                filter_value = col3.text_input("Value")
+                filters = []
+                if filter_column != "(none)" and filter_value:
+                    filters.append((filter_column, filter_op, filter_value))
+                page_size = st.select_slider("Rows per page", [25, 50, 100, 250, 500], value=100)
+
+                # Keys each visited page started after; reset when the view changes
+                view = (table_name, tuple(filters), page_size)
+                if st.session_state.get("browser_view") != view:
+                    st.session_state["browser_view"] = view
+                    st.session_state["browser_pages"] = [None]
+                pages = st.session_state["browser_pages"]
+
+                df, next_after = browser.fetch_page(table_name, shown, filters, pages[-1], page_size)
+                st.dataframe(df[[c for c in df.columns if c in shown]])
+
+                col1, col2, col3 = st.columns([1, 1, 4])
+                col1.button("Previous", disabled=len(pages) == 1, on_click=pages.pop)
+                col2.button("Next", disabled=next_after is None, on_click=pages.append, args=(next_after,))
+                col3.caption(f"Page {len(pages)}")
+            except Exception:
+                log.exception("query on the Home page failed")
+                st.write("Sorry! Something went wrong with your query, please try again.")
+
+    with st.expander("Search Players, Teams And Referees"):
+        name_query = st.text_input("Name", key="home_search")
+        if name_query:
+            try:
+                found = search.get_index().search(name_query)
+                if found.empty:
+                    st.write("No matches.")
+                else:
+                    st.dataframe(found[["kind", "name", "detail", "score"]].style.format({"score": "{:.2f}"}))
+            except Exception:
+                log.exception("query on the Home page failed")
+                st.write("Sorry! Something went wrong with your query, please try again.")
+
+    st.markdown("## Principles of Database Systems Project")
+    st.markdown("##### - By -")
+    st.markdown("### Sourabh Kumar Bhattacharjee (skb5275)")
+    st.markdown("### Gautam Suresh Nambiar (gsn2012)")
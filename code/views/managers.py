@@ -0,0 +1,42 @@
+"""The Managers page."""
+import streamlit as st
+
+import ratings
+from queries import run_query
+
+
+def render(season):
+    st.subheader("Managers")
+    menuManagers = [
+                'Manager Wins By Nationality',
+                'Managers With Highest Percentage Of Players Of Their Own Nationalities',
+                'Managers with most home wins / away wins',
+                'Rating-Adjusted Manager Results'
+            ]
+    choiceManagers = st.selectbox("Menu", menuManagers)
+    choiceManagers_num = menuManagers.index(choiceManagers)
+
+    if choiceManagers_num == 0:                           
+        with st.expander("Manager Wins By Nationality",expanded=True):
+            result = run_query("manager_wins_by_nationality", season=season)
+            st.dataframe(result.style.format({"average_win_percentage": "{:.2f}"}))
+
+    if choiceManagers_num == 1:                           
+        with st.expander("Managers With Highest Percentage Of Players Of Their Own Nationalities",expanded=True):
+            result = run_query("manager_compatriots")
+            st.dataframe(result.style.format({"compatriot_player_percentage": "{:.2f}"}))
+
+    if choiceManagers_num == 2:                           
+        with st.expander("Managers with most home wins / away wins",expanded=True):
+            result = run_query("manager_home_away_wins", season=season)
+            st.dataframe(result)
+
+    if choiceManagers_num == 3:
+        with st.expander("Rating-Adjusted Manager Results",expanded=True):
+            managers = run_query("manager_home_away_wins", season=season)[["manager_name", "team"]]
+            result = managers.merge(ratings.get_engine().season_summary(season), on="team")
+            result = result.sort_values(["above_expectation", "manager_name"], ascending=[False, True])
+            st.dataframe(result.set_index("manager_name").style.format(
+                {"start_rating": "{:.1f}", "end_rating": "{:.1f}", "rating_change": "{:+.1f}",
+                 "avg_opponent_rating": "{:.1f}", "expected_score": "{:.2f}", "actual_score": "{:.1f}",
+                 "above_expectation": "{:+.2f}"}))
@@ -0,0 +1,126 @@
+"""The Players page."""
+import logging
+
+import streamlit as st
+
+import goal_timing
+import search
+from queries import run_query
+
+log = logging.getLogger(__name__)
+
+
+def render(season):
+    st.subheader("Players")
+
+    menuPlayers = [
+                'Top Goal Scorers',
+                'Players With Most Hattricks',
+                'Goal Scorers By Position And Nationality',
+                'Players With Maximum Winners',
+                'Players With Maximum Equalizers',
+                'Goalscorers Above Certain Age',
+                'Goalscorers Below Certain Age',
+                'Captains With The Most Goals',
+                'Career Top Goal Scorers (All Seasons)',
+                'Player Profile',
+                'Late Winners'
+            ]
+    choicePlayers = st.selectbox("Menu", menuPlayers)
+    choicePlayers_num = menuPlayers.index(choicePlayers)
+
+    if choicePlayers_num == 0:                           
+        try:
+            all_team_names = run_query("season_team_names", season=season)["name"].tolist()
+            team_name = st.multiselect("Select Team(s):", all_team_names)
+            if len(team_name) == 0:
+                team_name = all_team_names
+        except Exception:
+            log.exception("query on the Players page failed")
+            st.write("Sorry! Something went wrong with your query, please try again.")
+            st.stop()
+
+        with st.expander("Top Goalscorers",expanded=True):
+            st.dataframe(run_query("top_goal_scorers", season=season, teams=team_name))
+
+    if choicePlayers_num == 1:                           
+        with st.expander("Players With Most Hattricks",expanded=True):
+            st.table(run_query("hattricks", season=season))
+
+    if choicePlayers_num == 2:
+        position = st.radio("Choose a position", ("Forward", "Midfielder", "Defender"))                           
+
+        try:
+            pos_names = run_query("position_names", position=position)["pos"].tolist()
+            pos_name = st.multiselect("Select Field Position(s):", pos_names)
+            if len(pos_name) == 0:
+                pos_name = pos_names
+        except Exception:
+            log.exception("query on the Players page failed")
+            st.write("Sorry! Something went wrong with your query, please try again.")
+            st.stop()
+
+        with st.expander("Goal Scorers By Position And Nationality",expanded=True):
+            st.table(run_query("scorers_by_position_and_nationality", season=season, position=position, positions=pos_name))
+
+    if choicePlayers_num == 3:                           
+        with st.expander("Players With Maximum Winners",expanded=True):
+            result = run_query("most_winners", season=season)
+            st.dataframe(result.style.format({"winnerPercentage": "{:.2f}"}))
+
+    if choicePlayers_num == 4:                     
+        with st.expander("Players With Maximum Equalizers",expanded=True):
+            result = run_query("most_equalizers", season=season)
+            st.dataframe(result.style.format({"equalizerPercentage": "{:.2f}"}))
+
+    if choicePlayers_num == 5: 
+        age = st.slider('Enter Minumum Age: ', 15, 45, 30)                          
+        with st.expander("Goalscorers Above Certain Age",expanded=True):
+            st.dataframe(run_query("scorers_above_age", season=season, age=age))
+
+    if choicePlayers_num == 6:                           
+        age = st.number_input('Enter Maximum Age: ', value = 20)
+        with st.expander("Goalscorers Below Certain Age",expanded=True):    
+            st.dataframe(run_query("scorers_below_age", season=season, age=age))
+
+    if choicePlayers_num == 7:                           
+        with st.expander("Captains With The Most Goals",expanded=True):
+            st.dataframe(run_query("captain_goals", season=season))
+
+    if choicePlayers_num == 8:
+        with st.expander("Career Top Goal Scorers (All Seasons)",expanded=True):
+            st.dataframe(run_query("career_top_scorers"))
+
+    if choicePlayers_num == 9:
+        name_query = st.text_input("Search for a player", key="player_search")
+        player = None
+        if name_query:
+            try:
+                found = search.get_index().search(name_query, kinds=["player"])
+                labels = {row.id: f"{row.name} ({row.detail})" for row in found.itertuples()}
+                player = st.selectbox("Player", list(labels), format_func=labels.get)
+                if player is None:
+                    st.write("No matching players.")
+            except Exception:
+                log.exception("query on the Players page failed")
+                st.write("Sorry! Something went wrong with your query, please try again.")
+                st.stop()
+
+        if player is not None:
+            with st.expander("Profile",expanded=True):
+                st.table(run_query("player_profile", player=player).T.rename(columns={0: ""}).astype(str))
+            with st.expander("Goals By Season",expanded=True):
+                st.dataframe(run_query("player_seasons", player=player))
+            with st.expander("Goals",expanded=True):
+                st.dataframe(run_query("player_goals", player=player))
+
+    if choicePlayers_num == 10:
+        timing = goal_timing.get_timing(season)
+        first = st.slider('Scored From Minute: ', 0, goal_timing.MAX_MINUTE, 80)
+        window = {"late_winners": (first, goal_timing.MAX_MINUTE)}
+        with st.expander("Players With The Most Late Winners",expanded=True):
+            result = timing.windows("player", window, kind="winner")
+            result = result[result["late_winners"] > 0].sort_values(["late_winners", "player"], ascending=[False, True])
+            st.dataframe(result.drop(columns="player_id").reset_index(drop=True))
+            matches = (timing.counts("match", first, goal_timing.MAX_MINUTE, "winner") > 0).sum()
+            st.caption(f"{matches} matches were won by a goal scored from minute {first} on.")
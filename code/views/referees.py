@@ -0,0 +1,42 @@
+"""The Referees page."""
+import logging
+
+import streamlit as st
+
+from queries import run_query
+
+log = logging.getLogger(__name__)
+
+
+def render(season):
+    st.subheader("Referees")
+    menuReferees = [
+                'Referees With Most Home Win Percentage',
+                'Referees With Most Penalties Awarded',
+                'Distribution of Home Teams Officiated By Referees'
+            ]
+    choiceReferees = st.selectbox("Menu", menuReferees)
+    choiceReferees_num = menuReferees.index(choiceReferees)
+
+    if choiceReferees_num == 0:                           
+        with st.expander("Referees With Most Home Win Percentage",expanded=True):
+            result = run_query("referee_home_wins", season=season)
+            st.dataframe(result.style.format({"homeWinPercentage": "{:.2f}", "homeLossPercentage": "{:.2f}", "homeDrawPercentage": "{:.2f}"}))
+
+    if choiceReferees_num == 1:                           
+        with st.expander("Referees With Most Penalties Awarded",expanded=True):
+            result = run_query("referee_penalties", season=season)
+            st.table(result.style.format({"numPenaltiesPercentage": "{:.2f}"}))
+
+    if choiceReferees_num == 2:
+        try:
+            all_referee_names = run_query("season_referee_names", season=season)["name"].tolist()
+            referee_name = st.selectbox("Select A Referee", all_referee_names)
+        except Exception:
+            log.exception("query on the Referees page failed")
+            st.write("Sorry! Something went wrong with your query, please try again.")
+            st.stop()
+
+        with st.expander("Distribution of Home Teams Officiated By Referees",expanded=True):
+            result = run_query("referee_home_teams", season=season, referee=referee_name)
+            st.table(result)
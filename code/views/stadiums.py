@@ -0,0 +1,29 @@
+"""The Stadiums page."""
+import streamlit as st
+
+from queries import run_query
+
+
+def render(season):
+    st.subheader("Stadiums")
+    menuStadiums = [
+                'Stadiums With Most Goals Scored',
+                'Stadiums With Max Home Wins',
+                'Stadiums With Max Away Wins'
+            ]
+    choiceStadiums = st.selectbox("Menu", menuStadiums)
+    choiceStadiums_num = menuStadiums.index(choiceStadiums)
+
+    if choiceStadiums_num == 0:                           
+        with st.expander("Stadiums With Most Goals Scored",expanded=True):
+            st.dataframe(run_query("stadium_goals", season=season))
+
+    if choiceStadiums_num == 1:                           
+        with st.expander("Stadiums With Max Home Wins",expanded=True):
+            result = run_query("stadium_home_wins", season=season)
+            st.dataframe(result.style.format({"homeWinPercentage": "{:.2f}", "homeLossPercentage": "{:.2f}", "homeDrawPercentage": "{:.2f}"}))
+
+    if choiceStadiums_num == 2:                           
+        with st.expander("Stadiums With Max Away Wins",expanded=True):
+            result = run_query("stadium_away_wins", season=season)
+            st.dataframe(result.style.format({"awayWinPercentage": "{:.2f}", "awayLossPercentage": "{:.2f}", "awayDrawPercentage": "{:.2f}"}))
@@ -0,0 +1,198 @@
+"""The Teams page."""
+import pandas as pd
+import streamlit as st
+
+import forecast
+import goal_timing
+import head_to_head
+import ratings
+import standings
+from queries import run_query
+
+
+def render(season):
+    st.subheader("Teams")
+    menuTeams = [
+                'Goals Scored By Teams',
+                'Goals Conceded By Teams',
+                'Teams With Fewest Losses',
+                'Top GoalScoring Teams From A Given City',
+                'Avg Goals Scored - Derby Matches vs Non Derby Matches',
+                'Top Teams By Number Of Penalties Awarded',
+                'Teams With Most Clean Sheets',
+                'League Table On A Date',
+                'League Positions Over Time',
+                'Goals Conceded By Time Window',
+                'Winner And Equalizer Timing',
+                'Head To Head',
+                'Season Forecast',
+                'Team Ratings Over Time',
+                'Rating-Adjusted Results'
+            ]
+    choiceTeams = st.selectbox("Menu", menuTeams)
+    choiceTeams_num = menuTeams.index(choiceTeams)
+
+    if choiceTeams_num == 0:                           
+        with st.expander("Goals Scored By Teams",expanded=True):
+            result = run_query("goals_scored_by_teams", season=season)
+            st.dataframe(result)
+            result = result.set_index('team')
+            st.bar_chart(result)
+
+    if choiceTeams_num == 1:                           
+        with st.expander("Goals Conceded By Teams",expanded=True):
+            result = run_query("goals_conceded_by_teams", season=season)
+            st.dataframe(result)
+            result = result.set_index('team')
+            st.bar_chart(result)
+
+    if choiceTeams_num == 2:                           
+        with st.expander("Teams With Fewest Losses",expanded=True):
+            result = run_query("teams_with_fewest_losses", season=season)
+            st.dataframe(result)
+            result = result.set_index('team')
+            st.bar_chart(result)
+
+    if choiceTeams_num == 3:
+        city = run_query("season_cities", season=season)["city"].tolist()
+        choiceCity = st.selectbox("Select A City", city)                 
+        with st.expander("Top GoalScoring Teams",expanded=True):
+            result = run_query("top_scoring_teams_in_city", season=season, city=choiceCity)
+            st.table(result)
+            result = result.set_index('team')
+            st.bar_chart(result)
+
+    if choiceTeams_num == 4:                           
+        with st.expander("Avg Goals Scored - Derby Matches vs Non Derby Matches",expanded=True):
+            result = run_query("derby_goals", season=season)
+            st.dataframe(result.style.format({"D.Derby_Goals_per_match": "{:.2f}", "ND.Non_Derby_Goals_per_match": "{:.2f}"}))
+
+    if choiceTeams_num == 5:                           
+        with st.expander("Top Teams By Number Of Penalties Awarded",expanded=True):
+            result = run_query("team_penalties", season=season)
+            st.table(result.style.format({"percentage_Penalties": "{:.2f}"}))
+
+    if choiceTeams_num == 6:                           
+        with st.expander("Teams With Most Clean Sheets",expanded=True):
+            result = run_query("clean_sheets", season=season)
+            st.table(result.style.format({"CleanSheetPercentage": "{:.2f}"}))
+
+    if choiceTeams_num == 7:
+        timeline = standings.get_timeline(season)
+        if len(timeline.dates) == 0:
+            st.write("No matches have been played this season.")
+            st.stop()
+        first, last = timeline.dates[0].item(), timeline.dates[-1].item()
+        date = st.date_input("Table as it stood on", value=last, min_value=first, max_value=last)
+        with st.expander("League Table",expanded=True):
+            st.dataframe(timeline.table_on(date).set_index("position"))
+            mismatches = timeline.cross_check(run_query("final_standings", season=season))
+            if len(mismatches):
+                st.warning("The final table computed from the match results differs from Standings_Pertain_to:")
+                st.dataframe(mismatches)
+            else:
+                st.caption("The final table computed from the match results matches Standings_Pertain_to.")
+
+    if choiceTeams_num == 8:
+        timeline = standings.get_timeline(season)
+        history = timeline.position_history()
+        final = timeline.table_on(timeline.dates[-1])["team"].tolist() if len(timeline.dates) else []
+        teams = st.multiselect("Select Team(s):", list(timeline.teams), default=final[:4])
+        with st.expander("League Position After Each Match Day",expanded=True):
+            st.line_chart(history[teams])
+
+    if choiceTeams_num == 9:
+        timing = goal_timing.get_timing(season)
+        first, last = st.slider("Custom window (minutes)", 0, goal_timing.MAX_MINUTE, (76, goal_timing.MAX_MINUTE))
+        custom = f"{first}-{last}{'+' if last == goal_timing.MAX_MINUTE else ''}"
+        windows = {**goal_timing.WINDOWS, custom: (first, last)}
+        with st.expander("Goals Conceded By Time Window",expanded=True):
+            result = timing.windows("conceded", windows).sort_values([custom, "team"], ascending=[False, True])
+            st.dataframe(result.set_index("team"))
+            st.bar_chart(result.set_index("team")[custom])
+
+    if choiceTeams_num == 10:
+        timing = goal_timing.get_timing(season)
+        with st.expander("Winners And Equalizers By Time Window",expanded=True):
+            result = pd.DataFrame({kind: timing.windows("team", kind=kind).drop(columns="team").sum()
+                                   for kind in ("winner", "equalizer")})
+            st.bar_chart(result)
+        first, last = st.slider("Window (minutes)", 0, goal_timing.MAX_MINUTE, (76, goal_timing.MAX_MINUTE))
+        with st.expander("Winners And Equalizers Scored By Teams",expanded=True):
+            result = pd.DataFrame({"team": timing.teams,
+                                   "winners": timing.counts("team", first, last, "winner"),
+                                   "equalizers": timing.counts("team", first, last, "equalizer"),
+                                   "goals": timing.counts("team", first, last)})
+            st.dataframe(result.sort_values(["winners", "equalizers", "team"], ascending=[False, False, True])
+                         .set_index("team"))
+
+    if choiceTeams_num == 11:
+        records = head_to_head.get_head_to_head()
+        all_team_names = run_query("season_team_names", season=season)["name"].tolist()
+        col1, col2 = st.columns(2)
+        team = col1.selectbox("Team", all_team_names)
+        opponent = col2.selectbox("Opponent", [t for t in all_team_names if t != team])
+        with st.expander("Head To Head Record (All Seasons)",expanded=True):
+            try:
+                record = records.pair(team, opponent)
+            except KeyError:
+                st.write("These teams have no matches on record.")
+            else:
+                st.table(pd.DataFrame([{k: v for k, v in record.items() if not k.startswith("last_")}],
+                                      index=[team]))
+                if record["last_date"] is not None:
+                    venue = "at home" if record["last_home"] else "away"
+                    st.caption(f"Last met on {record['last_date']} at {record['last_stadium']}: "
+                               f"{team} {record['last_score']} {opponent} ({venue}).")
+        stat = st.selectbox("Statistic", head_to_head.STATS, index=head_to_head.STATS.index("points"))
+        with st.expander("Head To Head Matrix (All Seasons)",expanded=True):
+            st.caption("Each row is a team's record against the column's team.")
+            st.dataframe(records.matrix(stat, all_team_names))
+
+    if choiceTeams_num == 12:
+        timeline = standings.get_timeline(season)
+        if len(timeline.dates) == 0:
+            st.write("No matches have been played this season.")
+            st.stop()
+        first, last = timeline.dates[0].item(), timeline.dates[-1].item()
+        # A finished season has nothing left to forecast, so start from its midpoint
+        n = len(timeline.teams)
+        finished = len(run_query("season_matches", season=season)) >= n * (n - 1)
+        default = timeline.dates[len(timeline.dates) // 2].item() if finished else last
+        col1, col2 = st.columns(2)
+        as_of = col1.date_input("Forecast from the results up to", value=default, min_value=first, max_value=last)
+        simulations = col2.select_slider("Simulated seasons", [5000, 10000, 20000, 50000, 100000],
+                                         value=forecast.get_options()["simulations"])
+        with st.expander("Season Forecast",expanded=True):
+            result = forecast.get_forecast(season, as_of, simulations)
+            st.dataframe(result.set_index("team").style.format(
+                {"attack": "{:.2f}", "defence": "{:.2f}", "expected_points": "{:.1f}", "expected_position": "{:.1f}",
+                 "title": "{:.1f}%", "top_4": "{:.1f}%", "relegation": "{:.1f}%"}))
+            st.caption(f"{result.attrs['simulations']:,} simulations of the {result.attrs['remaining']} remaining "
+                       f"fixtures in {result.attrs['seconds']:.2f}s.")
+
+    if choiceTeams_num == 13:
+        engine = ratings.get_engine()
+        all_team_names = run_query("season_team_names", season=season)["name"].tolist()
+        summary = engine.season_summary(season).sort_values(["end_rating", "team"], ascending=[False, True])
+        teams = st.multiselect("Select Team(s):", all_team_names, default=summary["team"].tolist()[:4])
+        all_seasons = st.checkbox("All seasons")
+        with st.expander("Rating After Each Match Day",expanded=True):
+            history = engine.history(teams)
+            if not all_seasons:
+                days = engine.column("day")[engine.column("season") == season].astype("datetime64[D]")
+                history = history.loc[days.min():days.max()] if len(days) else history.iloc[:0]
+            st.line_chart(history)
+        with st.expander("Ratings At The End Of The Season",expanded=True):
+            st.dataframe(summary[["team", "start_rating", "end_rating", "rating_change"]].set_index("team")
+                         .style.format("{:.1f}"))
+
+    if choiceTeams_num == 14:
+        with st.expander("Rating-Adjusted Results",expanded=True):
+            st.caption("Points-equivalent score (1 a win, 0.5 a draw) against what each match's pre-match ratings "
+                       "expected, home advantage included.")
+            result = ratings.get_engine().season_summary(season)
+            st.dataframe(result.set_index("team").style.format(
+                {"start_rating": "{:.1f}", "end_rating": "{:.1f}", "rating_change": "{:+.1f}",
+                 "avg_opponent_rating": "{:.1f}", "expected_score": "{:.2f}", "actual_score": "{:.1f}",
+                 "above_expectation": "{:+.2f}"}))
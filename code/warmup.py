@@ -0,0 +1,147 @@
+"""Warm the result cache with the queries behind every report page.
+
+    python code/warmup.py [--workers N]
+
+Runs every report in every season, the parameterless ones and those whose
+parameters come from a list on the page (each city, team list, position
+and referee) or a widget default (the ages), concurrently on a thread
+pool, and logs how long each took. The app calls start() so this happens
+once at startup and again whenever a data load moves the data version.
+
+From the command line it fills the shared SQLite tier ([cache]
+shared_path), which app processes read on a miss. Without one it would
+only fill its own cache, which is gone when it exits, so it refuses to run.
+"""
+import argparse
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cache
+import db
+from queries import QUERIES, run_query
+
+POSITIONS = ("Forward", "Midfielder", "Defender")
+
+# The initial values of the age widgets on the Players page
+DEFAULT_AGES = {"scorers_above_age": 30, "scorers_below_age": 20}
+
+log = logging.getLogger(__name__)
+
+
+def _timed(name, params):
+    start = time.perf_counter()
+    try:
+        df = run_query(name, **params)
+    except Exception:
+        log.exception("warm-up of %s %s failed", name, params)
+        return None
+    log.info("%-36s %-40s %6d rows  %.3fs", name, ", ".join(map(str, params.values())),
+             len(df), time.perf_counter() - start)
+    return df
+
+
+def _first_wave(seasons):
+    # Reports that need nothing but the season, including the lists the others draw on
+    jobs = [(name, {}) for name, query in QUERIES.items() if not query.params]
+    jobs += [("position_names", {"position": position}) for position in POSITIONS]
+    for season in seasons:
+        jobs += [(name, {"season": season}) for name, query in QUERIES.items()
+                 if query.params == ("season",)]
+        jobs += [(name, {"season": season, "age": age}) for name, age in DEFAULT_AGES.items()]
+    return jobs
+
+
+def _second_wave(seasons, lists):
+    jobs = []
+    positions = {p: lists.get(("position_names", p)) for p in POSITIONS}
+    for season in seasons:
+        cities = lists.get(("season_cities", season))
+        if cities is not None:
+            jobs += [("top_scoring_teams_in_city", {"season": season, "city": city})
+                     for city in cities["city"].tolist()]
+        teams = lists.get(("season_team_names", season))
+        if teams is not None:
+            jobs.append(("top_goal_scorers", {"season": season, "teams": teams["name"].tolist()}))
+        referees = lists.get(("season_referee_names", season))
+        if referees is not None:
+            jobs += [("referee_home_teams", {"season": season, "referee": referee})
+                     for referee in referees["name"].tolist()]
+        for position, names in positions.items():
+            if names is not None:
+                jobs.append(("scorers_by_position_and_nationality",
+                             {"season": season, "position": position, "positions": names["pos"].tolist()}))
+    return jobs
+
+
+def warmup_workers():
+    """[cache] warmup_workers, by default half the connection pool, so page queries still get connections."""
+    pool_maxconn = int(db.get_config(optional=True).get("pool_maxconn", db.POOL_OPTIONS["pool_maxconn"]))
+    return int(db.get_config(section="cache", optional=True).get("warmup_workers", max(1, pool_maxconn // 2)))
+
+
+def warm(workers=None):
+    """Run every warm-up query once, returning how many succeeded."""
+    start = time.perf_counter()
+    if workers is None:
+        workers = warmup_workers()
+
+    seasons = _timed("seasons", {})
+    seasons = [] if seasons is None else seasons["season"].tolist()
+    with ThreadPoolExecutor(workers, thread_name_prefix="warmup") as executor:
+        first = _first_wave(seasons)
+        results = list(executor.map(lambda job: _timed(*job), first))
+        # Keyed by the list query's only argument, the season or the position
+        lists = {(name, *params.values()): df for (name, params), df in zip(first, results)}
+        second = _second_wave(seasons, lists)
+        results += executor.map(lambda job: _timed(*job), second)
+
+    done = sum(df is not None for df in results)
+    log.info("warmed %d of %d queries in %.3fs", done, len(results), time.perf_counter() - start)
+    return done
+
+
+def _watch():
+    result_cache = cache.get_cache()
+    warmed = object()
+    while True:
+        try:
+            # Drops the stale entries now rather than at the next page's lookup
+            result_cache.check_version(force=True)
+            version = result_cache.stats()["data_version"]
+            if version != warmed:
+                warm()
+                warmed = version
+        except Exception:
+            log.exception("cache warm-up failed")
+        time.sleep(result_cache.version_check)
+
+
+_thread = None
+_thread_lock = threading.Lock()
+
+
+def start():
+    """Warm the cache in a background thread, now and after every data change."""
+    global _thread
+    with _thread_lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_watch, name="warmup-watch", daemon=True)
+            _thread.start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+    if cache.get_cache().shared is None:
+        parser.error("no shared cache is configured ([cache] shared_path), so there is nothing to warm "
+                     "outside the app, which warms its own cache at startup")
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    warm(args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Appending a season in which a player has changed clubs.
+
+These tests reload the database named by the PREMIER_LEAGUE_TEST_DSN
+environment variable (a libpq connection string), so point it at a scratch
+database. They are skipped when it isn't set.
+"""
+import csv
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "code"))
+
+import db  # noqa: E402
+import load_data  # noqa: E402
+from queries import compute_query  # noqa: E402
+
+DSN = os.environ.get("PREMIER_LEAGUE_TEST_DSN")
+pytestmark = pytest.mark.skipif(not DSN, reason="PREMIER_LEAGUE_TEST_DSN is not set")
+
+SALAH, ARSENAL, LIVERPOOL = 342, 1, 11
+
+
+def _team_player_goals(season, team_id):
+    return int(db.query_db("SELECT player_goals FROM team_season_stats WHERE season = %s AND team_id = %s;",
+                           (season, team_id))["player_goals"][0])
+
+
+def _move_player(src, dst, player_id, team_id):
+    """Copy the data directory ``src`` to ``dst`` with ``player_id`` playing for ``team_id``."""
+    shutil.copytree(src, dst)
+    path = os.path.join(dst, "Players_Plays_In_Plays_for.csv")
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        rows = list(csv.reader(f))
+    t_id = rows[0].index("T_id")
+    for row in rows[1:]:
+        if int(row[0]) == player_id:
+            row[t_id] = str(team_id)
+    with open(path, "w", newline="") as f:
+        csv.writer(f).writerows(rows)
+
+
+@pytest.fixture(scope="module")
+def loaded(tmp_path_factory):
+    work = tmp_path_factory.mktemp("append")
+    (work / "database.ini").write_text(f"[postgresql]\ndsn={DSN}\n")
+    cwd = os.getcwd()
+    os.chdir(work)
+    db._read_config.cache_clear()
+    try:
+        schema = os.path.join(load_data.CODE_DIR, "schema.sql")
+        indexes = os.path.join(load_data.CODE_DIR, "indexes.sql")
+        data_dir = os.path.join(load_data.ROOT_DIR, "data")
+        load_data.load(data_dir, 2021, False, schema, indexes)
+        before = _team_player_goals(2021, LIVERPOOL)
+        _move_player(data_dir, work / "2022", SALAH, ARSENAL)
+        load_data.load(work / "2022", 2022, True, schema, indexes)
+        yield before
+    finally:
+        os.chdir(cwd)
+        db._read_config.cache_clear()
+
+
+def test_scorers_keep_each_seasons_team(loaded):
+    # The data spells it with a non-breaking space
+    name = compute_query("player_profile", player=SALAH)["name"][0]
+    for season, team in ((2021, "Liverpool"), (2022, "Arsenal")):
+        result = compute_query("top_goal_scorers", season=season, teams=["Liverpool", "Arsenal"])
+        assert result[result["player"] == name]["team"].tolist() == [team]
+
+
+def test_goals_stay_with_the_team_they_were_scored_for(loaded):
+    assert _team_player_goals(2021, LIVERPOOL) == loaded
+    goals = compute_query("player_seasons", player=SALAH).set_index("season")["goals"]
+    season_goals = compute_query("season_goals", season=2021)
+    assert (season_goals["player_id"] == SALAH).sum() == goals[2021]
+    assert set(season_goals[season_goals["player_id"] == SALAH]["team"]) == {"Liverpool"}
+    player_goals = compute_query("player_goals", player=SALAH)
+    assert (player_goals["season"] == 2021).sum() == goals[2021]